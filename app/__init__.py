@@ -1,8 +1,14 @@
 import os
 
-from flask import Flask, render_template
+from flask import Flask, render_template, request
 from app.webhook.routes import webhook
-from .extensions import mongo
+from .extensions import (
+    breaker, compressor, deliveries, event_hub, events_cache, generation, recent_events, spool, store,
+    write_buffer,
+)
+from .jsoncodec import CodecJSONProvider
+from .timefmt import parse_timezones, set_display_timezones
+from app.api.cache import make_etag
 from app.api.routes import api
 
 # Try to import CORS, make it optional
@@ -22,43 +28,129 @@ def create_app():
 
     app = Flask(__name__, template_folder=templates_dir)
 
-    # MongoDB configuration
-    # MUST be set via MONGO_URI environment variable in production
+    # Event store: EVENT_STORE_URI (mongodb://, sqlite:///path or memory://), else MONGO_URI
+    # MUST be set via the environment in production
     # For local development, create a .env file (see .env.example)
-    mongo_uri = os.environ.get("MONGO_URI")
-    if not mongo_uri:
+    store_uri = os.environ.get("EVENT_STORE_URI") or os.environ.get("MONGO_URI")
+    if not store_uri:
         raise ValueError(
-            "MONGO_URI environment variable is required. "
+            "EVENT_STORE_URI or MONGO_URI environment variable is required. "
             "Set it in your environment or create a .env file for local development."
         )
-    app.config["MONGO_URI"] = mongo_uri
+    app.config["EVENT_STORE_URI"] = store_uri
+
+    # Keep MongoDB calls well inside GitHub's 10 s delivery timeout
+    # (PyMongo's default server selection timeout is 30 s)
+    app.config["MONGO_CONNECT_TIMEOUT_MS"] = int(os.environ.get("MONGO_CONNECT_TIMEOUT_MS", 2000))
+    app.config["MONGO_SERVER_SELECTION_TIMEOUT_MS"] = int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", 3000))
+    app.config["MONGO_SOCKET_TIMEOUT_MS"] = int(os.environ.get("MONGO_SOCKET_TIMEOUT_MS", 5000))
+
+    # Circuit breaker on the webhook write path
+    app.config["MONGO_BREAKER_FAILURES"] = int(os.environ.get("MONGO_BREAKER_FAILURES", 5))
+    app.config["MONGO_BREAKER_RESET_MS"] = int(os.environ.get("MONGO_BREAKER_RESET_MS", 30000))
+
+    # Write-behind buffer for webhook inserts (WRITE_BUFFER_ENABLED=0 writes synchronously)
+    app.config["WRITE_BUFFER_ENABLED"] = os.environ.get("WRITE_BUFFER_ENABLED", "1") != "0"
+    app.config["WRITE_BUFFER_MAX_BATCH"] = int(os.environ.get("WRITE_BUFFER_MAX_BATCH", 200))
+    app.config["WRITE_BUFFER_MAX_DELAY_MS"] = int(os.environ.get("WRITE_BUFFER_MAX_DELAY_MS", 50))
+    app.config["WRITE_BUFFER_QUEUE_SIZE"] = int(os.environ.get("WRITE_BUFFER_QUEUE_SIZE", 10000))
+
+    # Per-worker cache of seen X-GitHub-Delivery IDs (unique index is the backstop)
+    app.config["DELIVERY_CACHE_SIZE"] = int(os.environ.get("DELIVERY_CACHE_SIZE", 10000))
+    app.config["DELIVERY_CACHE_TTL_S"] = int(os.environ.get("DELIVERY_CACHE_TTL_S", 3600))
+
+    # Local spool for events that could not be written (defaults to instance/spool)
+    app.config["SPOOL_DIR"] = os.environ.get("SPOOL_DIR")
+    app.config["SPOOL_FSYNC_INTERVAL_MS"] = int(os.environ.get("SPOOL_FSYNC_INTERVAL_MS", 0))
+    app.config["SPOOL_REPLAY_INTERVAL_MS"] = int(os.environ.get("SPOOL_REPLAY_INTERVAL_MS", 5000))
+
+    # Write generation shared by workers (mmap file) and hosts (MongoDB `meta` doc)
+    app.config["GENERATION_FILE"] = os.environ.get("GENERATION_FILE")
+    app.config["GENERATION_POLL_MS"] = int(os.environ.get("GENERATION_POLL_MS", 2000))
+    app.config["GENERATION_CHANGE_STREAM"] = os.environ.get("GENERATION_CHANGE_STREAM", "1") != "0"
+
+    # Cached /api/events responses per worker (0 disables)
+    app.config["EVENTS_CACHE_SIZE"] = int(os.environ.get("EVENTS_CACHE_SIZE", 128))
+
+    # Newest events kept in memory per worker for /api/events (0 disables)
+    app.config["RECENT_EVENTS_SIZE"] = int(os.environ.get("RECENT_EVENTS_SIZE", 100))
+    app.config["RECENT_EVENTS_RETRY_MS"] = int(os.environ.get("RECENT_EVENTS_RETRY_MS", 5000))
+
+    # /api/events/stream (Server-Sent Events)
+    app.config["STREAM_POLL_MS"] = int(os.environ.get("STREAM_POLL_MS", 200))
+    app.config["STREAM_LOOKBACK_S"] = int(os.environ.get("STREAM_LOOKBACK_S", 5))
+    app.config["STREAM_CLIENT_QUEUE"] = int(os.environ.get("STREAM_CLIENT_QUEUE", 256))
+    app.config["STREAM_HEARTBEAT_S"] = int(os.environ.get("STREAM_HEARTBEAT_S", 15))
+    app.config["STREAM_MAX_S"] = int(os.environ.get("STREAM_MAX_S", 300))
+
+    # Events per MongoDB round trip in /api/events/export
+    app.config["EXPORT_BATCH_SIZE"] = int(os.environ.get("EXPORT_BATCH_SIZE", 1000))
+
+    # Retention: TTL deletion of old events (0 = keep) and archive_events.py's default age
+    app.config["EVENT_TTL_DAYS"] = int(os.environ.get("EVENT_TTL_DAYS", 0))
+    app.config["EVENT_ARCHIVE_DAYS"] = int(os.environ.get("EVENT_ARCHIVE_DAYS", 90))
+    # Storage layout: one `events` collection ("none") or events_YYYYMM partitions ("monthly")
+    app.config["EVENT_PARTITIONS"] = os.environ.get("EVENT_PARTITIONS", "none").strip().lower()
+
+    # Zones shown next to UTC in event timestamps (IANA names, comma-separated; empty = UTC only)
+    app.config["DISPLAY_TIMEZONES"] = parse_timezones(os.environ.get("DISPLAY_TIMEZONES", "Asia/Kolkata"))
+
+    # Compress responses of at least this many bytes (gzip, or brotli if installed)
+    app.config["COMPRESS_MIN_BYTES"] = int(os.environ.get("COMPRESS_MIN_BYTES", 1024))
+    app.config["COMPRESS_GZIP_LEVEL"] = int(os.environ.get("COMPRESS_GZIP_LEVEL", 6))
+    app.config["COMPRESS_BROTLI_QUALITY"] = int(os.environ.get("COMPRESS_BROTLI_QUALITY", 5))
 
     # Allow cross-origin requests (if CORS is available)
     if CORS_AVAILABLE:
-        CORS(app)
+        CORS(app, expose_headers=["X-Next-Cursor", "ETag"])
     else:
         # Manual CORS headers if flask-cors is not available
         @app.after_request
         def after_request(response):
             response.headers.add("Access-Control-Allow-Origin", "*")
             response.headers.add(
-                "Access-Control-Allow-Headers", "Content-Type,Authorization"
+                "Access-Control-Allow-Headers", "Content-Type,Authorization,If-None-Match"
             )
             response.headers.add(
                 "Access-Control-Allow-Methods", "GET,PUT,POST,DELETE,OPTIONS"
             )
+            response.headers.add("Access-Control-Expose-Headers", "X-Next-Cursor,ETag")
             return response
 
-    # Initialize Mongo with app
-    mongo.init_app(app)
+    set_display_timezones(app.config["DISPLAY_TIMEZONES"])
+    # Open the event store (for MongoDB: PyMongo, indexes and the partition router)
+    store.init_app(app)
+    # jsonify through orjson when installed (PyMongo.init_app installs its own provider)
+    app.json = CodecJSONProvider(app)
+    generation.init_app(app)
+    breaker.init_app(app)
+    deliveries.init_app(app)
+    spool.init_app(app)
+    write_buffer.init_app(app)
+    events_cache.init_app(app)
+    event_hub.init_app(app)
+    recent_events.init_app(app)
+    compressor.init_app(app)
 
     # registering all the blueprints
     app.register_blueprint(webhook)
     app.register_blueprint(api)
 
+    # The dashboard is static HTML: render it once and precompress every encoding
+    with app.app_context():
+        index_body = render_template("index.html").encode("utf-8")
+    index_etag = make_etag(index_body)
+    index_variants = compressor.precompress(index_body)
+
     # Route to serve the UI
     @app.route("/")
     def index():
-        return render_template("index.html")
+        if app.debug:
+            # Pick up template edits while developing
+            return render_template("index.html")
+        response = app.response_class(mimetype="text/html")
+        compressor.apply(response, index_body, index_etag, index_variants)
+        response.headers["Cache-Control"] = "no-cache"
+        return response.make_conditional(request)
 
     return app
@@ -0,0 +1,76 @@
+"""
+In-process cache of serialized /api/events responses.
+
+Entries are keyed by the request's query parameters and tagged with the
+write generation current when the underlying query ran; an entry from an
+older generation is a miss. A hit costs neither a MongoDB query nor JSON
+serialization, and the stored ETag lets unchanged polls be answered with
+304 Not Modified.
+"""
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+
+# `variants` holds compressed copies of `body` by content coding, filled on first use
+CachedResponse = namedtuple("CachedResponse", ["generation", "body", "etag", "headers", "variants"])
+
+
+def make_etag(body):
+    """Strong ETag for a response body (the same bytes give the same tag in every worker)."""
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def cache_key(args):
+    """Canonical key for a query string, independent of parameter order."""
+    return tuple(sorted(args.items(multi=True)))
+
+
+class ResponseCache:
+    """Small LRU of CachedResponse entries, invalidated by write generation."""
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def init_app(self, app):
+        self.maxsize = max(0, app.config.get("EVENTS_CACHE_SIZE", 128))
+        app.extensions["events_cache"] = self
+
+    def get(self, key, generation):
+        """Return the entry for `key` if it was built at `generation`, else None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.generation != generation:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry
+
+    def put(self, key, generation, body, headers=None, store=True):
+        """Store a serialized body built at `generation` (unless `store` is false); returns the entry."""
+        entry = CachedResponse(generation, body, make_etag(body), headers or {}, {})
+        if not store or self.maxsize <= 0:
+            return entry
+        with self._lock:
+            current = self._entries.get(key)
+            # A slower request must not replace an entry built from newer data
+            # (generations are (local, remote) tuples of ints, compared in order)
+            if current is None or current.generation <= generation:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return entry
+
+    def status(self):
+        """Counters for /api/health."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+            }
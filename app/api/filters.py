@@ -0,0 +1,67 @@
+"""
+Query-string filters for GET /api/events, translated into MongoDB queries.
+
+Every equality filter has a matching `{field: 1, _id: -1}` index (see
+app/indexes.py), and the time window is expressed as an `_id` range
+(ObjectIds embed their creation time, i.e. when the event was received), so
+a single filter is an index scan in `_id` order rather than a collection
+scan. Combined filters scan one of those indexes and check the remaining
+fields on the fetched documents. `python check_indexes.py` reports both
+with explain(), including documents examined per document returned.
+"""
+from datetime import datetime, timezone
+
+from bson import ObjectId
+
+# Query parameter -> stored field
+FILTER_FIELDS = {
+    "action": "action",
+    "to_branch": "to_branch",
+    "from_branch": "from_branch",
+    "author": "author",
+    "repository": "repository",
+}
+
+# Time window parameters (ISO 8601; naive values are taken as UTC)
+TIME_PARAMS = ("start", "end")
+
+
+def parse_time(name, value):
+    try:
+        dt = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"{name} must be an ISO 8601 date or datetime")
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+def build_query(args, before=None, since=None):
+    """
+    Build the events query from request args (raises ValueError on bad input).
+
+    `before` is the pagination cursor; it narrows the `_id` upper bound
+    together with `end`. `since` (the newest id a client already has) narrows
+    the lower bound together with `start`.
+    """
+    query = {}
+    for param, field in FILTER_FIELDS.items():
+        value = (args.get(param) or "").strip()
+        if value:
+            query[field] = value.upper() if field == "action" else value
+
+    id_range = {}
+    start = (args.get("start") or "").strip()
+    end = (args.get("end") or "").strip()
+    if start:
+        id_range["$gte"] = ObjectId.from_datetime(parse_time("start", start))
+    if end:
+        id_range["$lt"] = ObjectId.from_datetime(parse_time("end", end))
+    if before is not None and ("$lt" not in id_range or before < id_range["$lt"]):
+        id_range["$lt"] = before
+    if since is not None and ("$gte" not in id_range or since >= id_range["$gte"]):
+        id_range.pop("$gte", None)
+        id_range["$gt"] = since
+    if id_range:
+        query["_id"] = id_range
+    return query
@@ -0,0 +1,139 @@
+"""
+Per-worker buffer of the newest formatted events.
+
+Almost every /api/events read is for the newest page, so each worker keeps
+the last RECENT_EVENTS_SIZE formatted events in memory. The buffer is
+warmed when the worker boots and gets this worker's flushed events added
+as soon as they are stored, together with the generation bump they caused.
+It reloads from the event store only when the write generation has moved
+for another reason, i.e. when some other worker (or a migration) changed
+the events. Reads of the default page, and of ?since= deltas within it, then
+need no database round trip.
+
+If a reload fails, reads keep getting the last known events (flagged as
+stale, so they are not cached) and the reload is retried after
+RECENT_EVENTS_RETRY_MS rather than on every request.
+"""
+import logging
+import threading
+import time
+
+from app.render import EVENT_PROJECTION, format_events
+
+logger = logging.getLogger(__name__)
+
+
+class RecentEvents:
+    """Newest-first snapshot of formatted events, refreshed per write generation."""
+
+    def __init__(self, get_store, generation, size=100):
+        self._get_store = get_store
+        self._generation = generation
+        self.size = size
+        self.retry_interval = 5.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        # Tuple of (ObjectId, formatted event), newest first; replaced, never mutated
+        self._events = ()
+        self._warm = False
+        self._seen_generation = None
+        self._retry_at = 0.0
+        self._stats = {"reloads": 0, "reload_failures": 0, "served": 0, "served_stale": 0}
+
+    def init_app(self, app):
+        self.size = max(0, app.config.get("RECENT_EVENTS_SIZE", 100))
+        self.retry_interval = max(0, app.config.get("RECENT_EVENTS_RETRY_MS", 5000)) / 1000.0
+        app.extensions["recent_events"] = self
+
+    @property
+    def enabled(self):
+        return self.size > 0
+
+    def warm(self):
+        """Load the newest events now (called at worker boot)."""
+        if self.enabled:
+            self._reload(self._generation.value)
+
+    def add(self, docs, before=None, after=None):
+        """
+        Add events this worker has just stored (documents with their `_id`).
+
+        `before` and `after` are the write generation around the bump for
+        this write. If the buffer was current at `before` and nobody else
+        bumped in between, it is current at `after` too and needs no reload.
+        """
+        if not self.enabled or not self._warm:
+            return
+        new = list(zip([doc["_id"] for doc in docs], format_events(docs)))
+        with self._lock:
+            known = {event_id for event_id, _ in self._events}
+            merged = [item for item in new if item[0] not in known] + list(self._events)
+            merged.sort(key=lambda item: item[0], reverse=True)
+            self._events = tuple(merged[:self.size])
+            if before is not None and self._seen_generation == before and _follows(before, after):
+                self._seen_generation = after
+
+    def page(self, limit, since=None):
+        """
+        Newest `limit` events (newer than `since` if given) as (events, fresh).
+
+        Returns None when the buffer cannot answer: disabled, never loaded,
+        `limit` beyond its size, or `since` older than everything it holds.
+        """
+        if not self.enabled or limit > self.size:
+            return None
+        current = self._generation.value
+        if current != self._seen_generation and time.monotonic() >= self._retry_at:
+            # One thread reloads; the others answer from the current snapshot meanwhile
+            if self._refresh_lock.acquire(blocking=not self._warm):
+                try:
+                    if current != self._seen_generation:
+                        self._reload(current)
+                finally:
+                    self._refresh_lock.release()
+        if not self._warm:
+            return None
+
+        events = self._events
+        fresh = current == self._seen_generation
+        if since is not None:
+            full = len(events) >= self.size
+            if full and events[-1][0] > since:
+                return None  # `since` is older than the buffer: ask the store
+            events = [item for item in events if item[0] > since]
+        with self._lock:
+            self._stats["served"] += 1
+            if not fresh:
+                self._stats["served_stale"] += 1
+        return [event for _, event in events[:limit]], fresh
+
+    def status(self):
+        """Counters for /api/health."""
+        with self._lock:
+            status = dict(self._stats)
+        status["size"] = self.size
+        status["events"] = len(self._events)
+        status["stale"] = self._warm and self._generation.value != self._seen_generation
+        return status
+
+    def _reload(self, current):
+        try:
+            docs = self._get_store().find({}, EVENT_PROJECTION, limit=self.size)
+            events = tuple(zip([doc["_id"] for doc in docs], format_events(docs)))
+        except Exception as e:
+            self._retry_at = time.monotonic() + self.retry_interval
+            with self._lock:
+                self._stats["reload_failures"] += 1
+            logger.warning("Could not reload recent events, serving the last known ones: %s", e)
+            return
+        with self._lock:
+            self._events = events
+            self._warm = True
+            self._seen_generation = current
+            self._stats["reloads"] += 1
+
+
+def _follows(before, after):
+    # One bump moves the local count by one, and the remote one by one unless
+    # there is no remote (or updating it failed; a later poll still moves it)
+    return after[0] == before[0] + 1 and after[1] in (before[1], before[1] + 1)
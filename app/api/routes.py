@@ -1,184 +1,312 @@
-from flask import Blueprint, jsonify
-from datetime import datetime, timedelta
-import re
-from app.extensions import mongo
+import itertools
+import queue
+import time
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from flask import Blueprint, Response, current_app, jsonify, request
+from app.api.cache import cache_key
+from app.api.filters import FILTER_FIELDS, TIME_PARAMS, build_query, parse_time
+from app.api.stream import read_pages, sse_message
+from app.extensions import (
+    breaker, compressor, deliveries, event_hub, events_cache, generation, recent_events, spool, store,
+    write_buffer,
+)
+from app.export import FORMATS, export_chunks
+from app.jsoncodec import dumps, dumps_bytes
+from app.render import EVENT_PROJECTION, format_event, format_events
+from app.rollups import ACTIONS, DIMENSIONS, GRANULARITIES, default_window
+from app.timefmt import display_timezones, parse_timezones
 
 api = Blueprint('api', __name__, url_prefix='/api')
 
 @api.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint."""
+    status = {
+        "write_buffer": write_buffer.metrics(),
+        "spool": spool.status(),
+        "circuit_breaker": breaker.status(),
+        "deliveries": deliveries.status(),
+        "events_cache": events_cache.status(),
+        "generation": generation.status(),
+        "stream": event_hub.status(),
+        "recent_events": recent_events.status(),
+        "compression": compressor.status(),
+        "event_store": store.events.status(),
+    }
+    # "mongodb" is the original key monitors check; it only describes a MongoDB event store
+    mongodb = store.db is not None
     try:
-        # Try to ping MongoDB
-        mongo.db.command('ping')
-        return jsonify({
-            "status": "healthy",
-            "mongodb": "connected"
-        }), 200
+        # Try to reach the event store
+        store.events.ping()
+        status.update({"status": "healthy", "store": "connected", "mongodb": "connected" if mongodb else "n/a"})
+        return jsonify(status), 200
     except Exception as e:
-        return jsonify({
-            "status": "unhealthy",
-            "mongodb": "disconnected",
-            "error": str(e)
-        }), 503
+        status.update({
+            "status": "unhealthy", "store": "disconnected", "mongodb": "disconnected" if mongodb else "n/a",
+            "error": str(e),
+        })
+        return jsonify(status), 503
 
 # Max events to return (production-safe, avoids huge responses)
 EVENTS_LIMIT = 100
+# Largest page a client may request with ?limit=
+EVENTS_MAX_LIMIT = 500
 
 
-def ensure_ist_in_timestamp(timestamp_str):
-    """Ensure timestamp includes IST. If it doesn't, parse UTC time and add IST."""
-    if not timestamp_str:
-        return timestamp_str
-    
-    # Check if IST is already present
-    if "(IST)" in timestamp_str or "IST)" in timestamp_str:
-        return timestamp_str
-    
-    # Try to parse the UTC timestamp and add IST
-    # Format: "30th January 2026 - 8:06 AM UTC"
+def _parse_limit(value):
+    if value is None or value == "":
+        return EVENTS_LIMIT
     try:
-        # Extract UTC time components using regex
-        match = re.search(r'(\d{1,2})(?:st|nd|rd|th)\s+(\w+)\s+(\d{4})\s+-\s+(\d{1,2}):(\d{2})\s+(AM|PM)\s+UTC', timestamp_str)
-        if match:
-            day = int(match.group(1))
-            month_name = match.group(2)
-            year = int(match.group(3))
-            hour_12 = int(match.group(4))
-            minute = int(match.group(5))
-            am_pm = match.group(6)
-            
-            # Convert to 24-hour format
-            if am_pm == "PM" and hour_12 != 12:
-                hour_24 = hour_12 + 12
-            elif am_pm == "AM" and hour_12 == 12:
-                hour_24 = 0
-            else:
-                hour_24 = hour_12
-            
-            # Create UTC datetime
-            month_map = {
-                "January": 1, "February": 2, "March": 3, "April": 4,
-                "May": 5, "June": 6, "July": 7, "August": 8,
-                "September": 9, "October": 10, "November": 11, "December": 12
-            }
-            month = month_map.get(month_name, 1)
-            utc_dt = datetime(year, month, day, hour_24, minute)
-            
-            # Convert to IST (UTC+5:30)
-            ist_dt = utc_dt + timedelta(hours=5, minutes=30)
-            
-            # Format IST time
-            ist_day = ist_dt.day
-            if 11 <= ist_day <= 13:
-                ist_suffix = "th"
-            elif ist_day % 10 == 1:
-                ist_suffix = "st"
-            elif ist_day % 10 == 2:
-                ist_suffix = "nd"
-            elif ist_day % 10 == 3:
-                ist_suffix = "rd"
-            else:
-                ist_suffix = "th"
-            
-            ist_hour = ist_dt.hour
-            ist_minute = ist_dt.minute
-            
-            if ist_hour == 0:
-                ist_hour_12 = 12
-                ist_am_pm = "AM"
-            elif ist_hour < 12:
-                ist_hour_12 = ist_hour
-                ist_am_pm = "AM"
-            elif ist_hour == 12:
-                ist_hour_12 = 12
-                ist_am_pm = "PM"
-            else:
-                ist_hour_12 = ist_hour - 12
-                ist_am_pm = "PM"
-            
-            ist_month_names = ["January", "February", "March", "April", "May", "June",
-                              "July", "August", "September", "October", "November", "December"]
-            
-            ist_str = f"{ist_day}{ist_suffix} {ist_month_names[ist_dt.month - 1]} {ist_dt.year} - {ist_hour_12}:{ist_minute:02d} {ist_am_pm} IST"
-            
-            return f"{timestamp_str} ({ist_str})"
-    except Exception:
-        # If parsing fails, return original timestamp
-        pass
-    
-    return timestamp_str
+        limit = int(value)
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    return min(limit, EVENTS_MAX_LIMIT)
+
+
+def _parse_object_id(name, value):
+    if not value:
+        return None
+    if not ObjectId.is_valid(value):
+        raise ValueError(f"{name} must be an event id")
+    return ObjectId(value)
 
 
 @api.route('/events', methods=['GET'])
 def get_events():
-    """Get all webhook events from MongoDB. Returns 200 with array, or 503 on DB failure."""
+    """
+    Get webhook events from the event store, newest first. Returns 200, 400
+    on bad parameters, or 503 on DB failure.
+
+    Without parameters the response is the newest EVENTS_LIMIT events as an
+    array (as before). With ?limit=<n> and/or ?before=<id> (keyset pagination
+    on _id, so every page is an index range scan) it is an object:
+    {"events": [...], "next_cursor": "<id>" or null}. Pass next_cursor as
+    `before` to get the next (older) page. The cursor is also sent in the
+    X-Next-Cursor header either way.
+
+    ?since=<id> returns only events newer than that id (the newest one the
+    client already has), newest first, in the same object form. A full page
+    (next_cursor set) means more than `limit` events are new.
+
+    Filters (combinable, each backed by an index): action, to_branch,
+    from_branch, author, repository, and a receipt-time window start/end
+    (ISO 8601).
+
+    ?tz=<zone>[,<zone>...] (IANA names) renders timestamps and messages in
+    those zones instead of DISPLAY_TIMEZONES; an empty value means UTC only.
+
+    Responses carry a strong ETag; a request whose If-None-Match matches
+    gets 304. The serialized body is cached per query string until the next
+    event write, so repeat polls skip both the query and serialization.
+    Unfiltered first pages (and ?since= deltas) are answered from the
+    worker's recent-events buffer, which keeps serving its last known events
+    while the store is unreachable.
+    """
+    key = cache_key(request.args)
+    # Read the generation before querying, so a write that lands mid-query invalidates this entry
+    current = generation.value
+    entry = events_cache.get(key, current)
+    if entry is None:
+        paged = "limit" in request.args or "before" in request.args or "since" in request.args
+        try:
+            limit = _parse_limit(request.args.get("limit"))
+            before = _parse_object_id("before", request.args.get("before"))
+            since = _parse_object_id("since", request.args.get("since"))
+            query = build_query(request.args, before, since)
+            zones = parse_timezones(request.args["tz"]) if "tz" in request.args else display_timezones()
+        except ValueError as e:
+            return jsonify({"error": str(e), "events": []}), 400
+
+        recent = None
+        if (
+            before is None
+            and zones == display_timezones()
+            and not any(request.args.get(p) for p in (*FILTER_FIELDS, *TIME_PARAMS))
+        ):
+            recent = recent_events.page(limit, since)
+        if recent is not None:
+            formatted, fresh = recent
+        else:
+            fresh = True
+            try:
+                # Sort by _id descending (newest first; _id is time-based)
+                events = store.events.find(query, EVENT_PROJECTION, limit)
+            except Exception:
+                # Return 503 so frontend keeps previous events and shows connection error (production-safe)
+                return jsonify({"error": "Database unavailable", "events": []}), 503
+            formatted = format_events(events, zones)
+
+        # A full page means there may be older events
+        next_cursor = formatted[-1]["id"] if len(formatted) == limit else None
+
+        body = dumps_bytes({"events": formatted, "next_cursor": next_cursor} if paged else formatted)
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+        # Stale buffer contents (store unreachable) are served but not cached
+        entry = events_cache.put(key, current, body, headers, store=fresh)
+
+    response = current_app.response_class(mimetype="application/json")
+    response.headers.update(entry.headers)
+    # Compressed once per cached body, then reused by every poll
+    compressor.apply(response, entry.body, entry.etag, entry.variants)
+    # Let browsers store the body but revalidate it on every poll
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+
+@api.route('/events/export', methods=['GET'])
+def export_events():
+    """
+    Stream the full event history, oldest first, as ?format=ndjson (default)
+    or csv, archived events included (?archive=0 for the hot collection only).
+    Accepts the same filters as /api/events. Resume an interrupted
+    export with ?after=<id of the last row received>. Returns 400 on bad
+    parameters, or 503 if the store is unavailable when the export starts.
+    """
+    fmt = request.args.get("format") or "ndjson"
+    if fmt not in FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(FORMATS)}"}), 400
     try:
-        # Sort by _id descending (newest first; _id is time-based)
-        events = list(mongo.db.events.find().sort('_id', -1).limit(EVENTS_LIMIT))
+        after = _parse_object_id("after", request.args.get("after"))
+        query = build_query(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    archive = request.args.get("archive", "1") != "0"
+    batches = store.events.history(query, after, current_app.config.get("EXPORT_BATCH_SIZE", 1000), archive)
+    try:
+        # Fetch the first batch now, so an unreachable database is a 503 rather than an empty 200
+        first = list(itertools.islice(batches, 1))
     except Exception:
-        # Return 503 so frontend keeps previous events and shows connection error (production-safe)
-        return jsonify({"error": "Database unavailable", "events": []}), 503
-
-    formatted = []
-    for e in events:
-        # Display author: always show your GitHub name
-        # (DB still keeps the original author, but the UI is fixed to you.)
-        author = "Lakshmiswayampakula"
-
-        action = (e.get("action") or "").strip().upper()
-        from_branch = e.get("from_branch") or ""
-        to_branch = e.get("to_branch") or ""
-        timestamp = e.get("timestamp") or ""
-        request_id = e.get("request_id") or ""
-        
-        # Smart inference: if action is missing/empty, try to infer from other fields
-        # This helps fix old events that might have been stored incorrectly
-        if not action or action == "":
-            # If we have from_branch AND to_branch AND they're different, 
-            # it's likely a PR or Merge event
-            if from_branch and to_branch and from_branch != to_branch:
-                # Check request_id format - PR numbers are usually numeric strings
-                # Merge events often have both branches populated
-                # We can't perfectly distinguish PR vs Merge without the original webhook,
-                # but if from_branch exists, it's likely a PR/Merge, not a plain push
-                # Default to PULL_REQUEST if we can't tell
-                action = "PULL_REQUEST"
-            else:
-                # No from_branch or same branch = likely a push
-                action = "PUSH"
-        
-        # Ensure timestamp includes IST
-        timestamp = ensure_ist_in_timestamp(timestamp)
-
-        # Format messages consistently - all follow "pushed to main" style format
-        if action == "PUSH":
-            # Default to "main" if to_branch is empty
-            branch = to_branch or "main"
-            message = f'{author} pushed to {branch} on {timestamp}'
-        elif action == "PULL_REQUEST":
-            # Ensure we have branch info, default to "main" if missing
-            from_br = from_branch or "feature"
-            to_br = to_branch or "main"
-            message = f'{author} submitted a pull request from {from_br} to {to_br} on {timestamp}'
-        elif action == "MERGE":
-            # Ensure we have branch info
-            from_br = from_branch or "feature"
-            to_br = to_branch or "main"
-            message = f'{author} merged branch {from_br} to {to_br} on {timestamp}'
-        else:
-            # Treat any unknown/legacy action as a push-style event for consistent display
-            branch = to_branch or "main"
-            message = f'{author} pushed to {branch} on {timestamp}'
-
-        formatted.append({
-            "message": message,
-            "timestamp": timestamp,
-            "action": action.upper() if action else "",  # Ensure uppercase for consistency
-            "author": author,
-            "request_id": request_id,
-            "from_branch": from_branch,
-            "to_branch": to_branch,
-        })
+        return jsonify({"error": "Database unavailable"}), 503
+
+    def generate():
+        # After `after`, the CSV header was already sent with the first part
+        for chunk, _, _ in export_chunks(itertools.chain(first, batches), fmt, header=after is None):
+            yield chunk
+
+    return Response(generate(), mimetype=FORMATS[fmt], headers={
+        "Content-Disposition": f"attachment; filename=events.{fmt}",
+        "Cache-Control": "no-store",
+    })
+
+
+@api.route('/events/stream', methods=['GET'])
+def stream_events():
+    """
+    Server-Sent Events stream of new events, one `data:` frame (the same
+    JSON as an /api/events item) per event, oldest first.
+
+    Pass the newest id the client already has as ?last_id= (EventSource
+    sends Last-Event-ID itself when it reconnects) to first receive everything
+    stored after it, oldest first. Streams end after STREAM_MAX_S so threads are recycled;
+    EventSource reconnects on its own.
+    """
+    try:
+        last_id = _parse_object_id(
+            "last_id", request.headers.get("Last-Event-ID") or request.args.get("last_id")
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    heartbeat = current_app.config.get("STREAM_HEARTBEAT_S", 15)
+    max_age = current_app.config.get("STREAM_MAX_S", 300)
+    # Subscribe before catching up so nothing stored in between is missed
+    subscription = event_hub.subscribe()
+
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            caught_up = set()
+            if last_id is not None:
+                try:
+                    # Everything after last_id, oldest first, a page at a time until drained
+                    for page in read_pages(store.events, {"$gt": last_id}, EVENT_PROJECTION, EVENTS_MAX_LIMIT):
+                        for doc in page:
+                            event = format_event(doc)
+                            caught_up.add(event["id"])
+                            yield sse_message(event["id"], dumps(event))
+                except Exception:
+                    # Store unreachable: carry on with what the hub sends
+                    pass
+
+            deadline = time.monotonic() + max_age
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                try:
+                    item = subscription.get(timeout=min(heartbeat, remaining))
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if item is None:
+                    return  # dropped for falling behind
+                event_id, frame = item
+                if event_id not in caught_up:
+                    yield frame
+        finally:
+            event_hub.unsubscribe(subscription)
 
-    return jsonify(formatted)
+    return Response(generate(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        # Stop nginx-style proxies from buffering the stream
+        "X-Accel-Buffering": "no",
+    })
+
+
+@api.route('/stats', methods=['GET'])
+def get_stats():
+    """
+    Activity counts per hour or day from the rollups collection (never the
+    raw events). Returns 200, 400 on bad parameters, or 503 on DB failure.
+
+    ?granularity=hour|day (default hour), ?dimension=all|branch|author|
+    repository (default all), optional ?key= to pick one branch/author/
+    repository, and a start/end window (ISO 8601 event time; defaults to the
+    last 24 hours, or 30 days for daily buckets). Buckets without events are
+    omitted.
+    """
+    granularity = request.args.get("granularity") or "hour"
+    dimension = request.args.get("dimension") or "all"
+    if granularity not in GRANULARITIES:
+        return jsonify({"error": f"granularity must be one of {', '.join(GRANULARITIES)}"}), 400
+    if dimension not in DIMENSIONS:
+        return jsonify({"error": f"dimension must be one of {', '.join(DIMENSIONS)}"}), 400
+
+    start, end = default_window(granularity, datetime.utcnow())
+    try:
+        # Buckets store naive UTC datetimes
+        if request.args.get("start"):
+            start = parse_time("start", request.args["start"]).astimezone(timezone.utc).replace(tzinfo=None)
+        if request.args.get("end"):
+            end = parse_time("end", request.args["end"]).astimezone(timezone.utc).replace(tzinfo=None)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        buckets, truncated = store.events.stats(
+            granularity, dimension, start, end, key=(request.args.get("key") or "").strip()
+        )
+    except Exception:
+        return jsonify({"error": "Database unavailable", "buckets": []}), 503
+
+    return jsonify({
+        "granularity": granularity,
+        "dimension": dimension,
+        "start": start.isoformat() + "Z",
+        "end": end.isoformat() + "Z",
+        "buckets": [
+            {
+                "start": b["start"].isoformat() + "Z",
+                "key": b.get("key", ""),
+                "count": b.get("count", 0),
+                "actions": {action: b.get("actions", {}).get(action, 0) for action in ACTIONS},
+            }
+            for b in buckets
+        ],
+        "truncated": truncated,
+    })
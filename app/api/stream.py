@@ -0,0 +1,203 @@
+"""
+Fan-out hub behind the /api/events/stream Server-Sent Events endpoint.
+
+Each worker runs a single tail thread, however many dashboards are
+connected to it. The thread watches the write generation (a memory read,
+see app/generation.py) every STREAM_POLL_MS and only queries the store when
+it has moved, i.e. when this or another worker stored events. New events
+are formatted and serialized once and put on every subscriber's queue.
+
+Each tail reads everything after the newest id it has sent, a page at a
+time until a short page comes back, so a burst is never cut off. ObjectIds
+are assigned when a worker flushes, so two workers can commit slightly out
+of _id order: each tail also re-reads the _ids (only) of the last
+STREAM_LOOKBACK_S seconds below that id, and fetches and sends the few it
+has not sent yet. The ids sent are remembered for that window.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+
+from app.jsoncodec import dumps
+from app.render import EVENT_PROJECTION, format_event
+
+logger = logging.getLogger(__name__)
+
+# Events fetched per tail query (page)
+TAIL_BATCH = 500
+
+
+def sse_message(event_id, data):
+    """One SSE frame; `id` lets EventSource resume with Last-Event-ID."""
+    return f"id: {event_id}\ndata: {data}\n\n"
+
+
+def read_pages(store, id_range, projection, batch=TAIL_BATCH):
+    """Yield pages of the documents in an `_id` range, oldest first, until a short page comes back."""
+    query = {"_id": dict(id_range)}
+    while True:
+        page = store.find(query, projection, batch, ascending=True)
+        if page:
+            yield page
+        if len(page) < batch:
+            return
+        query = {"_id": dict(id_range, **{"$gt": page[-1]["_id"]})}
+
+
+class EventHub:
+    """One tail per worker, broadcasting new events to subscriber queues."""
+
+    def __init__(self, get_store, generation):
+        self._get_store = get_store
+        self._generation = generation
+        self.poll_interval = 0.2
+        self.lookback = timedelta(seconds=5)
+        self.queue_size = 256
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._sent = OrderedDict()
+        self._last_id = None
+        self._pid = None
+        self._thread = None
+        self._stats = {"broadcasts": 0, "events_sent": 0, "dropped_subscribers": 0}
+
+    def init_app(self, app):
+        self.poll_interval = max(10, app.config.get("STREAM_POLL_MS", 200)) / 1000.0
+        self.lookback = timedelta(seconds=max(0, app.config.get("STREAM_LOOKBACK_S", 5)))
+        self.queue_size = max(1, app.config.get("STREAM_CLIENT_QUEUE", 256))
+        app.extensions["event_hub"] = self
+
+    def subscribe(self):
+        """Register a client; returns the queue its (event id, SSE frame) pairs arrive on."""
+        self._ensure_started()
+        q = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def status(self):
+        """Subscriber and broadcast counters for /api/health."""
+        with self._lock:
+            status = dict(self._stats)
+            status["subscribers"] = len(self._subscribers)
+        return status
+
+    def _ensure_started(self):
+        # Started on the first subscriber so each gunicorn worker gets its own after fork
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None:
+            return
+        with self._lock:
+            if self._pid == pid and self._thread is not None:
+                return
+            if self._pid != pid:
+                self._subscribers = set()
+                self._sent = OrderedDict()
+                self._last_id = None
+            self._pid = pid
+            self._thread = threading.Thread(target=self._run, name="events-stream-tail", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        seen_generation = None
+        while True:
+            try:
+                current = self._generation.value
+                with self._lock:
+                    idle = not self._subscribers
+                if idle:
+                    # Nothing to send; start afresh when the next client subscribes
+                    self._last_id = None
+                    self._sent.clear()
+                elif self._last_id is None:
+                    self._prime()
+                    seen_generation = current
+                elif current != seen_generation:
+                    seen_generation = current
+                    self._tail()
+            except Exception as e:
+                # Store unreachable: retry on the next tick, clients keep their connection
+                logger.debug("Event stream tail failed: %s", e)
+                seen_generation = None
+            time.sleep(self.poll_interval)
+
+    def _prime(self):
+        # Events already stored when the tail starts are not news; mark the lookback window as sent
+        since = ObjectId.from_datetime(datetime.now(timezone.utc) - self.lookback)
+        for page in read_pages(self._get_store(), {"$gt": since}, {"_id": 1}):
+            for doc in page:
+                self._remember(doc["_id"])
+        if self._last_id is None:
+            self._last_id = since
+
+    def _tail(self):
+        store = self._get_store()
+        newest = self._last_id
+        floor = ObjectId.from_datetime(newest.generation_time - self.lookback)
+        # Committed late by another worker, below the newest id already sent
+        late = []
+        for page in read_pages(store, {"$gt": floor, "$lte": newest}, {"_id": 1}):
+            late += [doc["_id"] for doc in page if doc["_id"] not in self._sent]
+        if late:
+            docs = []
+            for event_id in late:
+                docs += store.find({"_id": {"$gte": event_id, "$lte": event_id}}, EVENT_PROJECTION, 1)
+            self._broadcast(docs)
+        for page in read_pages(store, {"$gt": newest}, EVENT_PROJECTION):
+            self._broadcast(page)
+        self._forget(floor)
+
+    def _broadcast(self, docs):
+        frames = []
+        for doc in docs:
+            if doc["_id"] in self._sent:
+                continue
+            self._remember(doc["_id"])
+            event = format_event(doc)
+            frames.append((event["id"], sse_message(event["id"], dumps(event))))
+        if not frames:
+            return
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self._stats["broadcasts"] += 1
+            self._stats["events_sent"] += len(frames)
+        for q in subscribers:
+            try:
+                for frame in frames:
+                    q.put_nowait(frame)
+            except queue.Full:
+                # A client this far behind reconnects and catches up from Last-Event-ID
+                self.unsubscribe(q)
+                _close(q)
+                with self._lock:
+                    self._stats["dropped_subscribers"] += 1
+
+    def _remember(self, event_id):
+        self._sent[event_id] = True
+        if self._last_id is None or event_id > self._last_id:
+            self._last_id = event_id
+
+    def _forget(self, floor):
+        # Ids at or below the lookback floor are never re-read, so the window is all that is kept
+        while self._sent and next(iter(self._sent)) <= floor:
+            self._sent.popitem(last=False)
+
+
+def _close(q):
+    """Replace whatever is queued with the end-of-stream marker (None)."""
+    try:
+        while True:
+            q.get_nowait()
+    except queue.Empty:
+        pass
+    q.put_nowait(None)
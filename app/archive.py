@@ -0,0 +1,77 @@
+"""
+Tiered retention: old events move from `events` (or its monthly
+partitions, see app/partitions.py) to `events_archive`.
+
+Events are archived by receipt time (`_id`), oldest first, so every
+archived `_id` is lower than every `_id` still in `events`. Reading the
+archive and then the hot collection in `_id` order is therefore the whole
+history in order, and one `after` cursor works across both
+(see export.iter_history). The hot collection, its indexes and the caches
+warmed from it stay the size of the retention window.
+
+The archive only has the `_id` index and, where the server supports it,
+zstd block compression. `python archive_events.py` does the moving.
+"""
+import logging
+from datetime import timedelta
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, CollectionInvalid, OperationFailure
+
+from app.timefmt import utcnow
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_COLLECTION = "events_archive"
+
+# MongoDB error code for a duplicate key
+DUPLICATE_KEY = 11000
+
+
+def archive_cutoff(days, now=None):
+    """Lowest `_id` that stays hot: events received more than `days` days ago are archived."""
+    return ObjectId.from_datetime((now or utcnow()) - timedelta(days=days))
+
+
+def ensure_archive(db):
+    """Create the archive collection (zstd-compressed where supported) if it does not exist."""
+    if ARCHIVE_COLLECTION in db.list_collection_names():
+        return db[ARCHIVE_COLLECTION]
+    try:
+        db.create_collection(
+            ARCHIVE_COLLECTION,
+            storageEngine={"wiredTiger": {"configString": "block_compressor=zstd"}},
+        )
+    except CollectionInvalid:
+        pass
+    except OperationFailure as e:
+        # No zstd (or no WiredTiger): the default compression will do
+        logger.info("Creating %s without zstd: %s", ARCHIVE_COLLECTION, e)
+        try:
+            db.create_collection(ARCHIVE_COLLECTION)
+        except CollectionInvalid:
+            pass
+    return db[ARCHIVE_COLLECTION]
+
+
+def archive_batch(db, cutoff, batch_size=1000, source=None):
+    """
+    Move up to `batch_size` of the oldest events with `_id` < `cutoff` from
+    `source` (default: db.events) to the archive; returns how many were moved.
+
+    Copies first and deletes second, so an interruption leaves a document in
+    both collections (harmless, the next run deletes it) but never in neither.
+    """
+    source = db.events if source is None else source
+    docs = list(source.find({"_id": {"$lt": cutoff}}).sort("_id", 1).limit(batch_size))
+    if not docs:
+        return 0
+    try:
+        db[ARCHIVE_COLLECTION].insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        # Already archived by an earlier, interrupted run
+        errors = [err for err in (e.details or {}).get("writeErrors") or [] if err.get("code") != DUPLICATE_KEY]
+        if errors:
+            raise
+    source.delete_many({"_id": {"$in": [doc["_id"] for doc in docs]}})
+    return len(docs)
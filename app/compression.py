@@ -0,0 +1,120 @@
+"""
+Content-Encoding negotiation for API responses and the dashboard page.
+
+Responses of at least COMPRESS_MIN_BYTES are compressed with brotli when
+the client accepts it and the brotli package is installed, otherwise with
+gzip. Bodies that are served repeatedly (cached /api/events responses, the
+dashboard HTML) keep their compressed variants next to the plain bytes, so
+each variant is compressed once rather than on every request; everything
+else is compressed on the way out by an after_request hook. Streams (SSE)
+are never compressed.
+
+Each variant gets its own strong ETag ("<tag>-br", "<tag>-gzip"), as a
+strong validator has to change with the content coding.
+"""
+import gzip
+import threading
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+class Compressor:
+    """Negotiates and applies gzip/brotli, with per-body variant caching."""
+
+    def __init__(self):
+        self.min_bytes = 1024
+        self.gzip_level = 6
+        self.brotli_quality = 5
+        self._stats_lock = threading.Lock()
+        self._stats = {"compressed": 0, "variant_hits": 0, "bytes_in": 0, "bytes_out": 0}
+
+    def init_app(self, app):
+        self.min_bytes = max(0, app.config.get("COMPRESS_MIN_BYTES", 1024))
+        self.gzip_level = app.config.get("COMPRESS_GZIP_LEVEL", 6)
+        self.brotli_quality = app.config.get("COMPRESS_BROTLI_QUALITY", 5)
+        app.extensions["compressor"] = self
+        app.after_request(self.after_request)
+
+    def negotiate(self, body_size):
+        """Encoding to use for a body of `body_size` bytes in this request, or None."""
+        if body_size < self.min_bytes:
+            return None
+        accepted = request.accept_encodings
+        best = None
+        for encoding in ENCODINGS:
+            quality = accepted[encoding]
+            if quality > 0 and (best is None or quality > best[1]):
+                best = (encoding, quality)
+        return best[0] if best else None
+
+    def compress(self, body, encoding, best=False):
+        """Compress `body`; `best` trades CPU for size (for bodies compressed only once)."""
+        if encoding == "br":
+            out = brotli.compress(body, quality=11 if best else self.brotli_quality)
+        else:
+            # mtime=0 keeps the output (and so its ETag) identical across workers
+            out = gzip.compress(body, compresslevel=9 if best else self.gzip_level, mtime=0)
+        with self._stats_lock:
+            self._stats["compressed"] += 1
+            self._stats["bytes_in"] += len(body)
+            self._stats["bytes_out"] += len(out)
+        return out
+
+    def precompress(self, body):
+        """Variants dict with `body` compressed as small as possible in every supported encoding."""
+        return {encoding: self.compress(body, encoding, best=True) for encoding in ENCODINGS}
+
+    def variant(self, variants, body, encoding):
+        """Compressed `body` from the `variants` dict, compressing it on first use."""
+        out = variants.get(encoding)
+        if out is None:
+            out = variants[encoding] = self.compress(body, encoding)
+        else:
+            with self._stats_lock:
+                self._stats["variant_hits"] += 1
+        return out
+
+    def apply(self, response, body, etag, variants):
+        """Set `response` to the negotiated variant of `body`, with a matching ETag."""
+        response.vary.add("Accept-Encoding")
+        encoding = self.negotiate(len(body))
+        if encoding is None:
+            response.set_data(body)
+            response.set_etag(etag)
+            return response
+        response.set_data(self.variant(variants, body, encoding))
+        response.headers["Content-Encoding"] = encoding
+        response.set_etag(f"{etag}-{encoding}")
+        return response
+
+    def after_request(self, response):
+        """Compress any other large enough, non-streamed response."""
+        if (
+            response.direct_passthrough
+            or response.is_streamed
+            or "Content-Encoding" in response.headers
+            or response.status_code < 200
+            or response.status_code in (204, 206, 304)
+        ):
+            return response
+        body = response.get_data()
+        response.vary.add("Accept-Encoding")
+        encoding = self.negotiate(len(body))
+        if encoding is not None:
+            response.set_data(self.compress(body, encoding))
+            response.headers["Content-Encoding"] = encoding
+        return response
+
+    def status(self):
+        """Counters for /api/health."""
+        with self._stats_lock:
+            status = dict(self._stats)
+        status["encodings"] = list(ENCODINGS)
+        return status
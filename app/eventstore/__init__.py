@@ -0,0 +1,55 @@
+"""
+Pluggable storage for webhook events, chosen by URI scheme:
+
+    mongodb://..., mongodb+srv://...   MongoEventStore (the default)
+    sqlite:///events.db                SQLiteEventStore (one file, WAL mode)
+    memory://                          MemoryEventStore (per process, for tests and benchmarks)
+
+EVENT_STORE_URI selects the store and falls back to MONGO_URI. The rest of
+the app goes through `store.events` (app/extensions.py), which implements
+EventStore (app/eventstore/base.py).
+"""
+from .base import EventStore
+from .memory import MemoryEventStore
+from .mongo import MongoEventStore
+from .sqlite import SQLiteEventStore, sqlite_path
+
+SCHEMES = ("mongodb", "mongodb+srv", "sqlite", "memory")
+
+
+def scheme_of(uri):
+    return uri.split("://", 1)[0].lower() if "://" in uri else ""
+
+
+class EventStores:
+    """Flask extension holding the configured EventStore as `events`."""
+
+    def __init__(self, mongo, partitions):
+        self._mongo = mongo
+        self._partitions = partitions
+        self.events = None
+
+    def init_app(self, app):
+        uri = app.config["EVENT_STORE_URI"]
+        scheme = scheme_of(uri)
+        if scheme in ("mongodb", "mongodb+srv"):
+            events = MongoEventStore(self._mongo, self._partitions)
+            events.init_app(app)
+        elif scheme == "sqlite":
+            events = SQLiteEventStore(sqlite_path(uri))
+        elif scheme == "memory":
+            events = MemoryEventStore()
+        else:
+            raise ValueError(f"EVENT_STORE_URI scheme must be one of {', '.join(SCHEMES)}, got {uri!r}")
+        self.events = events
+        app.extensions["event_store"] = self
+
+    @property
+    def db(self):
+        """MongoDB database of the configured store, or None."""
+        return self.events.db if self.events is not None else None
+
+
+__all__ = [
+    "EventStore", "EventStores", "MemoryEventStore", "MongoEventStore", "SQLiteEventStore", "SCHEMES",
+]
@@ -0,0 +1,108 @@
+"""
+The EventStore interface, and query helpers for the non-MongoDB stores.
+
+Queries use the MongoDB shape the rest of the app already builds (see
+app/api/filters.py): equality on stored fields plus an `_id` range with
+$gt / $gte / $lt / $lte. Every store returns documents as dicts with an
+ObjectId `_id`, so callers do not care which store they talk to.
+"""
+from bson import ObjectId
+
+_RANGE_OPERATORS = ("$gt", "$gte", "$lt", "$lte")
+
+
+class EventStore:
+    """Where webhook events and their rollups are stored."""
+
+    # Name reported by /api/health
+    backend = None
+
+    # The MongoDB database, for features that need one (cross-host write
+    # generation, maintenance scripts); None for the other stores
+    db = None
+
+    def insert(self, doc):
+        """Store one event; returns an InsertResult."""
+        return self.insert_many([doc])
+
+    def insert_many(self, docs):
+        """
+        Store a batch of events and return InsertResult(inserted, duplicates).
+
+        Assigns `_id` to documents that have none. A document whose
+        `delivery_id` is already stored is a duplicate and is not stored
+        again; new documents are counted into the rollups.
+        """
+        raise NotImplementedError
+
+    def find(self, query=None, projection=None, limit=0, ascending=False):
+        """Documents matching `query` in `_id` order (newest first unless `ascending`), up to `limit`."""
+        raise NotImplementedError
+
+    def history(self, query=None, after=None, batch_size=1000, archive=True):
+        """Yield lists of documents matching `query` with `_id` > `after`, oldest first (for exports)."""
+        while True:
+            batch = self.find(_after(query, after), None, batch_size, ascending=True)
+            if not batch:
+                return
+            yield batch
+            if len(batch) < batch_size:
+                return
+            after = batch[-1]["_id"]
+
+    def stats(self, granularity, dimension, start, end, key=None, limit=5000):
+        """Rollup buckets for [start, end), oldest first. Returns (buckets, truncated)."""
+        raise NotImplementedError
+
+    def ping(self):
+        """Raise if the store is unreachable."""
+
+    def status(self):
+        """Backend details for /api/health."""
+        return {"backend": self.backend}
+
+
+def split_query(query):
+    """(equality filters, `_id` range) of a query; raises ValueError for anything else."""
+    equals = {}
+    id_range = {}
+    for field, value in (query or {}).items():
+        if field == "_id":
+            if isinstance(value, ObjectId):
+                id_range = {"$gte": value, "$lte": value}
+                continue
+            for op, bound in value.items():
+                if op not in _RANGE_OPERATORS:
+                    raise ValueError(f"Unsupported _id operator {op}")
+                id_range[op] = bound
+        elif isinstance(value, dict):
+            raise ValueError(f"Unsupported query on {field}")
+        else:
+            equals[field] = value
+    return equals, id_range
+
+
+def project(doc, projection):
+    """Copy of `doc` restricted to an inclusion projection (`_id` kept unless `_id: 0`)."""
+    if not projection:
+        return dict(doc)
+    fields = [f for f, keep in projection.items() if keep and f != "_id"]
+    out = {f: doc[f] for f in fields if f in doc}
+    if projection.get("_id", 1) and "_id" in doc:
+        out["_id"] = doc["_id"]
+    return out
+
+
+def _after(query, after):
+    """`query` narrowed to `_id` > `after`."""
+    if after is None:
+        return query
+    query = dict(query or {})
+    id_range = dict(query.get("_id") or {})
+    if id_range.get("$gt") is not None and id_range["$gt"] >= after:
+        return query
+    if "$gte" not in id_range or after >= id_range["$gte"]:
+        id_range.pop("$gte", None)
+        id_range["$gt"] = after
+    query["_id"] = id_range
+    return query
@@ -0,0 +1,94 @@
+"""
+In-memory event store (memory://), for tests, benchmarks and trying the
+dashboard without a database. Contents live in the process and are lost
+on restart; every gunicorn worker has its own, so run a single worker.
+"""
+import bisect
+import copy
+import threading
+
+from bson import ObjectId
+
+from app.rollups import accumulate, merge
+from app.webhook.store import InsertResult
+
+from .base import EventStore, project, split_query
+
+
+class MemoryEventStore(EventStore):
+    """Thread-safe dict of events plus a sorted `_id` list and in-memory rollups."""
+
+    backend = "memory"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._docs = {}
+        self._ids = []
+        self._deliveries = {}
+        self._rollups = {}
+
+    def insert_many(self, docs):
+        inserted = []
+        duplicates = 0
+        with self._lock:
+            for doc in docs:
+                doc.setdefault("_id", ObjectId())
+                delivery_id = doc.get("delivery_id")
+                if doc["_id"] in self._docs or (delivery_id and delivery_id in self._deliveries):
+                    duplicates += 1
+                    continue
+                stored = copy.deepcopy(doc)
+                self._docs[stored["_id"]] = stored
+                bisect.insort(self._ids, stored["_id"])
+                if delivery_id:
+                    self._deliveries[delivery_id] = stored["_id"]
+                inserted.append(stored)
+            buckets = {}
+            for doc in inserted:
+                accumulate(buckets, doc)
+            merge(self._rollups, buckets)
+        return InsertResult(len(inserted), duplicates)
+
+    def find(self, query=None, projection=None, limit=0, ascending=False):
+        equals, id_range = split_query(query)
+        with self._lock:
+            lo = 0
+            hi = len(self._ids)
+            if "$gt" in id_range:
+                lo = max(lo, bisect.bisect_right(self._ids, id_range["$gt"]))
+            if "$gte" in id_range:
+                lo = max(lo, bisect.bisect_left(self._ids, id_range["$gte"]))
+            if "$lt" in id_range:
+                hi = min(hi, bisect.bisect_left(self._ids, id_range["$lt"]))
+            if "$lte" in id_range:
+                hi = min(hi, bisect.bisect_right(self._ids, id_range["$lte"]))
+            out = []
+            for i in range(lo, hi) if ascending else range(hi - 1, lo - 1, -1):
+                oid = self._ids[i]
+                doc = self._docs[oid]
+                if any(doc.get(field) != value for field, value in equals.items()):
+                    continue
+                out.append(copy.deepcopy(project(doc, projection)))
+                if limit and len(out) >= limit:
+                    break
+        return out
+
+    def stats(self, granularity, dimension, start, end, key=None, limit=5000):
+        with self._lock:
+            buckets = [
+                b for b in self._rollups.values()
+                if b["granularity"] == granularity
+                and b["dimension"] == dimension
+                and start <= b["start"] < end
+                and (not key or b["key"] == key)
+            ]
+            buckets.sort(key=lambda b: (b["start"], b["key"]))
+            out = [
+                {"start": b["start"], "key": b["key"], "count": b["count"], "actions": dict(b["actions"])}
+                for b in buckets[:limit + 1]
+            ]
+        return out[:limit], len(out) > limit
+
+    def status(self):
+        with self._lock:
+            return {"backend": self.backend, "events": len(self._ids)}
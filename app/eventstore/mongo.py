@@ -0,0 +1,55 @@
+"""
+MongoDB event store: the `events` collection (or its monthly partitions,
+see app/partitions.py), the archive tier and the `rollups` collection.
+"""
+from app.export import iter_history
+from app.indexes import ensure_indexes
+from app.rollups import query_stats
+
+from .base import EventStore
+
+
+class MongoEventStore(EventStore):
+    """Events in MongoDB through Flask-PyMongo and the partition router."""
+
+    backend = "mongodb"
+
+    def __init__(self, mongo, partitions):
+        self._mongo = mongo
+        self._partitions = partitions
+
+    def init_app(self, app):
+        # PyMongo reads the URI from MONGO_URI
+        app.config["MONGO_URI"] = app.config["EVENT_STORE_URI"]
+        self._mongo.init_app(
+            app,
+            connectTimeoutMS=app.config["MONGO_CONNECT_TIMEOUT_MS"],
+            serverSelectionTimeoutMS=app.config["MONGO_SERVER_SELECTION_TIMEOUT_MS"],
+            socketTimeoutMS=app.config["MONGO_SOCKET_TIMEOUT_MS"],
+        )
+        ensure_indexes(self._mongo.db, app.config.get("EVENT_TTL_DAYS", 0))
+        self._partitions.init_app(app)
+
+    @property
+    def db(self):
+        return self._mongo.db
+
+    def insert_many(self, docs):
+        return self._partitions.insert(docs)
+
+    def find(self, query=None, projection=None, limit=0, ascending=False):
+        return self._partitions.find(query, projection, limit, ascending)
+
+    def history(self, query=None, after=None, batch_size=1000, archive=True):
+        return iter_history(self._partitions, query, after, batch_size, archive)
+
+    def stats(self, granularity, dimension, start, end, key=None, limit=5000):
+        return query_stats(self._mongo.db, granularity, dimension, start, end, key=key, limit=limit)
+
+    def ping(self):
+        self._mongo.db.command("ping")
+
+    def status(self):
+        status = {"backend": self.backend}
+        status.update(self._partitions.status())
+        return status
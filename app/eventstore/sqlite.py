@@ -0,0 +1,192 @@
+"""
+SQLite event store (sqlite:///relative/path.db or sqlite:////absolute/path.db).
+
+For single-host deployments that would rather not run a database server.
+The file is opened in WAL mode, so readers never wait for the writer and
+every gunicorn worker can share it. Each batch from the write buffer is one
+`BEGIN IMMEDIATE` transaction. Events are stored as BSON blobs (datetimes
+and ObjectIds survive the round trip) keyed by the hex `_id`, which sorts
+like the ObjectId itself. The filter fields are columns with
+`(field, id)` indexes, mirroring the MongoDB ones. Rollups are kept in two
+tables that are updated in the same transaction as the events.
+"""
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import bson
+from bson import ObjectId
+
+from app.api.filters import FILTER_FIELDS
+from app.rollups import accumulate
+from app.webhook.store import InsertResult
+
+from .base import EventStore, project, split_query
+
+# Event fields stored in their own column (queries may filter on these)
+COLUMNS = tuple(FILTER_FIELDS.values()) + ("delivery_id",)
+
+_RANGE_SQL = {"$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS events ("
+    " id TEXT PRIMARY KEY,"
+    " delivery_id TEXT UNIQUE,"
+    " action TEXT, to_branch TEXT, from_branch TEXT, author TEXT, repository TEXT,"
+    " doc BLOB NOT NULL"
+    ") WITHOUT ROWID",
+    *[
+        f"CREATE INDEX IF NOT EXISTS events_{field}_id ON events ({field}, id)"
+        for field in FILTER_FIELDS.values()
+    ],
+    "CREATE TABLE IF NOT EXISTS rollups ("
+    " id TEXT PRIMARY KEY, granularity TEXT, start TEXT, dimension TEXT, key TEXT, count INTEGER"
+    ") WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS rollups_granularity_dimension_start ON rollups (granularity, dimension, start, key)",
+    "CREATE TABLE IF NOT EXISTS rollup_actions ("
+    " bucket_id TEXT, action TEXT, n INTEGER, PRIMARY KEY (bucket_id, action)"
+    ") WITHOUT ROWID",
+]
+
+
+def sqlite_path(uri):
+    """File path of a sqlite:/// URI."""
+    path = uri[len("sqlite://"):]
+    # sqlite:///events.db -> events.db, sqlite:////var/data/events.db -> /var/data/events.db
+    path = path[1:] if path.startswith("/") else path
+    if not path or path == ":memory:":
+        raise ValueError("sqlite:// needs a file path (use memory:// for an in-memory store)")
+    return path
+
+
+class SQLiteEventStore(EventStore):
+    """Events in one SQLite file, one connection per thread."""
+
+    backend = "sqlite"
+
+    def __init__(self, path, timeout=5.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        for statement in SCHEMA:
+            conn.execute(statement)
+
+    def insert_many(self, docs):
+        if not docs:
+            return InsertResult(0, 0)
+        conn = self._conn()
+        inserted = []
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for doc in docs:
+                doc.setdefault("_id", ObjectId())
+                row = [str(doc["_id"])] + [_column(doc, field) for field in COLUMNS] + [bson.encode(doc)]
+                cursor = conn.execute(
+                    f"INSERT OR IGNORE INTO events (id, {', '.join(COLUMNS)}, doc) "
+                    f"VALUES ({', '.join('?' * (len(COLUMNS) + 2))})",
+                    row,
+                )
+                if cursor.rowcount:
+                    inserted.append(doc)
+            self._write_rollups(conn, inserted)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return InsertResult(len(inserted), len(docs) - len(inserted))
+
+    def find(self, query=None, projection=None, limit=0, ascending=False):
+        equals, id_range = split_query(query)
+        where = []
+        params = []
+        for field, value in equals.items():
+            if field not in COLUMNS:
+                raise ValueError(f"Cannot filter on {field}")
+            where.append(f"{field} = ?")
+            params.append(value)
+        for op, bound in id_range.items():
+            where.append(f"id {_RANGE_SQL[op]} ?")
+            params.append(str(bound))
+        sql = "SELECT doc FROM events"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY id " + ("ASC" if ascending else "DESC")
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        rows = self._conn().execute(sql, params).fetchall()
+        return [project(bson.decode(row[0]), projection) for row in rows]
+
+    def stats(self, granularity, dimension, start, end, key=None, limit=5000):
+        sql = "SELECT id, start, key, count FROM rollups WHERE granularity = ? AND dimension = ? AND start >= ? AND start < ?"
+        params = [granularity, dimension, start.isoformat(), end.isoformat()]
+        if key:
+            sql += " AND key = ?"
+            params.append(key)
+        sql += " ORDER BY start, key LIMIT ?"
+        params.append(limit + 1)
+        conn = self._conn()
+        rows = conn.execute(sql, params).fetchall()
+        buckets = {}
+        for bucket_id, bucket_start, bucket_key, count in rows[:limit]:
+            buckets[bucket_id] = {
+                "start": datetime.fromisoformat(bucket_start), "key": bucket_key, "count": count, "actions": {},
+            }
+        ids = list(buckets)
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            for bucket_id, action, n in conn.execute(
+                f"SELECT bucket_id, action, n FROM rollup_actions WHERE bucket_id IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            ):
+                buckets[bucket_id]["actions"][action] = n
+        return list(buckets.values()), len(rows) > limit
+
+    def ping(self):
+        self._conn().execute("SELECT 1").fetchone()
+
+    def status(self):
+        return {"backend": self.backend, "path": self.path}
+
+    def _write_rollups(self, conn, docs):
+        buckets = {}
+        for doc in docs:
+            accumulate(buckets, doc)
+        conn.executemany(
+            "INSERT INTO rollups (id, granularity, start, dimension, key, count) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET count = count + excluded.count",
+            [
+                (bucket_id, b["granularity"], b["start"].isoformat(), b["dimension"], b["key"], b["count"])
+                for bucket_id, b in buckets.items()
+            ],
+        )
+        conn.executemany(
+            "INSERT INTO rollup_actions (bucket_id, action, n) VALUES (?, ?, ?) "
+            "ON CONFLICT (bucket_id, action) DO UPDATE SET n = n + excluded.n",
+            [(bucket_id, action, n) for bucket_id, b in buckets.items() for action, n in b["actions"].items()],
+        )
+
+    def _conn(self):
+        # One connection per thread, reopened after a fork
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+
+def _column(doc, field):
+    value = doc.get(field)
+    if field == "delivery_id":
+        # NULLs never collide in the UNIQUE index; empty strings would
+        return value or None
+    return value if value is None or isinstance(value, (str, int, float)) else str(value)
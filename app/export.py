@@ -0,0 +1,125 @@
+"""
+Streaming export of the full event history as NDJSON or CSV.
+
+Events are read in `_id` order, one batch at a time (`_id > last` with a
+limit, so each batch is an index range scan and no server cursor has to
+live for the whole export), and every batch is serialized into a single
+chunk. Memory use is one batch, whatever the size of the collection, and
+the `id` of the last row written is all that is needed to resume.
+Archived events (app/archive.py) come first, then the hot collection.
+
+Used by GET /api/events/export and export_events.py.
+"""
+import csv
+import io
+from datetime import datetime
+
+from app import jsoncodec
+from app.archive import ARCHIVE_COLLECTION
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+# Exported columns, in order (`id` is the document _id)
+EXPORT_FIELDS = (
+    "id",
+    "delivery_id",
+    "request_id",
+    "action",
+    "author",
+    "from_branch",
+    "to_branch",
+    "repository",
+    "occurred_at",
+    "received_at",
+    "timestamp",
+    "message",
+)
+
+EXPORT_PROJECTION = {field: 1 for field in EXPORT_FIELDS if field != "id"}
+
+
+def iter_batches(collection, query=None, after=None, batch_size=1000):
+    """Yield lists of documents matching `query` with `_id` > `after`, in `_id` order."""
+    query = dict(query or {})
+    id_range = dict(query.get("_id") or {})
+    while True:
+        if after is not None and ("$gte" not in id_range or after >= id_range["$gte"]):
+            id_range["$gt"] = after
+            id_range.pop("$gte", None)
+        if id_range:
+            query["_id"] = id_range
+        batch = list(collection.find(query, EXPORT_PROJECTION).sort("_id", 1).limit(batch_size))
+        if not batch:
+            return
+        yield batch
+        if len(batch) < batch_size:
+            return
+        after = batch[-1]["_id"]
+
+
+def iter_history(partitions, query=None, after=None, batch_size=1000, archive=True):
+    """
+    iter_batches over the archive and then the hot events (every partition,
+    oldest first): the full history in `_id` order. With `archive` false
+    only the hot events are read.
+    """
+    if archive:
+        archived = dict(query or {})
+        first = partitions.find({}, {"_id": 1}, limit=1, ascending=True)
+        if first:
+            # Skip documents an interrupted archiver left in both collections
+            id_range = dict(archived.get("_id") or {})
+            if "$lt" not in id_range or first[0]["_id"] < id_range["$lt"]:
+                id_range["$lt"] = first[0]["_id"]
+            archived["_id"] = id_range
+        for batch in iter_batches(partitions.db[ARCHIVE_COLLECTION], archived, after, batch_size):
+            after = batch[-1]["_id"]
+            yield batch
+    for collection in partitions.route(query, ascending=True):
+        for batch in iter_batches(collection, query, after, batch_size):
+            after = batch[-1]["_id"]
+            yield batch
+
+
+def to_row(doc):
+    """Flat, JSON/CSV-friendly dict for one stored event."""
+    row = {}
+    for field in EXPORT_FIELDS:
+        value = doc.get("_id" if field == "id" else field)
+        if isinstance(value, datetime):
+            value = value.isoformat(timespec="milliseconds") + "Z"
+        elif value is None:
+            value = ""
+        elif not isinstance(value, (str, int, float, bool)):
+            value = str(value)
+        row[field] = value
+    return row
+
+
+def ndjson_chunk(batch):
+    """One NDJSON chunk (bytes) for a batch of documents."""
+    return b"".join(jsoncodec.dumps_bytes(to_row(doc)) + b"\n" for doc in batch)
+
+
+def csv_header():
+    return ",".join(EXPORT_FIELDS).encode("utf-8") + b"\r\n"
+
+
+def csv_chunk(batch):
+    """One CSV chunk (bytes, no header) for a batch of documents."""
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=EXPORT_FIELDS)
+    writer.writerows(to_row(doc) for doc in batch)
+    return out.getvalue().encode("utf-8")
+
+
+def export_chunks(batches, fmt, header=True):
+    """Yield (chunk bytes, last _id, rows) for each batch, after a CSV header if `header`."""
+    if fmt == "csv" and header:
+        yield csv_header(), None, 0
+    encode = csv_chunk if fmt == "csv" else ndjson_chunk
+    for batch in batches:
+        yield encode(batch), batch[-1]["_id"], len(batch)
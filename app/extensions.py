@@ -1,3 +1,50 @@
 from flask_pymongo import PyMongo
 
+from app.api.cache import ResponseCache
+from app.api.recent import RecentEvents
+from app.api.stream import EventHub
+from app.compression import Compressor
+from app.eventstore import EventStores
+from app.generation import WriteGeneration
+from app.partitions import EventPartitions
+from app.webhook.breaker import CircuitBreaker
+from app.webhook.buffer import WriteBuffer
+from app.webhook.dedup import DeliveryCache
+from app.webhook.spool import Spool
+
 mongo = PyMongo()
+
+# Routes event reads and writes to `events` or its monthly partitions
+partitions = EventPartitions(lambda: mongo.db)
+
+# Event storage picked by EVENT_STORE_URI: MongoDB, SQLite or in-memory (`store.events` is the EventStore)
+store = EventStores(mongo, partitions)
+
+# Bumped when new events are stored (shared across workers, and across hosts with MongoDB); invalidates cached /api/events responses
+generation = WriteGeneration(lambda: store.db)
+
+# gzip/brotli negotiation for responses and the dashboard page
+compressor = Compressor()
+
+# Serialized /api/events responses, keyed by query string
+events_cache = ResponseCache()
+
+# Newest formatted events per worker, for /api/events without a database round trip
+recent_events = RecentEvents(lambda: store.events, generation)
+
+# Per-worker tail that feeds /api/events/stream subscribers
+event_hub = EventHub(lambda: store.events, generation)
+
+# Local spool for events the store did not accept, replayed once it is reachable
+spool = Spool(lambda: store.events, generation=generation)
+
+# Recently accepted X-GitHub-Delivery IDs, to skip redeliveries cheaply
+deliveries = DeliveryCache()
+
+# Opens after repeated write failures so the receiver stops waiting on the store
+breaker = CircuitBreaker()
+
+# Per-worker write-behind buffer used by the webhook receiver
+write_buffer = WriteBuffer(
+    lambda: store.events, spool=spool, breaker=breaker, generation=generation, recent=recent_events
+)
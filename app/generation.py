@@ -0,0 +1,182 @@
+"""
+Write generation counter.
+
+Bumped whenever new events reach MongoDB (write buffer flushes, spool
+replays). Readers that cache anything derived from the events collection
+tag it with the generation they read and treat it as stale once it has
+moved on.
+
+A gunicorn worker only sees its own writes, so the generation has two
+shared parts besides the in-process count:
+
+- a counter in a small memory-mapped file (GENERATION_FILE, default
+  instance/events.generation) that every worker on the host maps, so a
+  bump is visible to the others on their next read with no syscall;
+- a document in the MongoDB `meta` collection, incremented on every bump
+  and followed by one background thread per worker, so writes on other
+  hosts are seen within GENERATION_POLL_MS. With a replica set the thread
+  follows a change stream instead of polling (GENERATION_CHANGE_STREAM=0
+  turns that off).
+
+Stores other than MongoDB have no `meta` collection (get_db returns None);
+the generation is then shared by the workers of one host only.
+"""
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+
+from pymongo import ReturnDocument
+from pymongo.errors import OperationFailure
+
+try:
+    import fcntl
+except ImportError:  # Windows: bumps from several processes may then collide
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+META_ID = "events_generation"
+
+_COUNTER = struct.Struct("<Q")
+
+
+class WriteGeneration:
+    """Generation shared by the workers of a host (mmap) and across hosts (MongoDB)."""
+
+    def __init__(self, get_db=None):
+        self._get_db = get_db
+        self.path = None
+        self.poll_interval = 2.0
+        self.change_stream = True
+        self._lock = threading.Lock()
+        self._local = 0
+        # 0 until a remote value is seen, so values stay ordered as (local, remote)
+        self._remote = 0
+        self._mode = "off"
+        self._fd = None
+        self._map = None
+        self._pid = None
+        self._thread = None
+
+    def init_app(self, app):
+        self.path = app.config.get("GENERATION_FILE") or os.path.join(app.instance_path, "events.generation")
+        self.poll_interval = max(0, app.config.get("GENERATION_POLL_MS", 2000)) / 1000.0
+        self.change_stream = app.config.get("GENERATION_CHANGE_STREAM", True)
+        app.extensions["generation"] = self
+
+    @property
+    def value(self):
+        """Opaque value that changes whenever any worker (on any host) stores events."""
+        self._ensure_started()
+        local = _COUNTER.unpack_from(self._map)[0] if self._map is not None else self._local
+        return (local, self._remote)
+
+    def bump(self):
+        """Record that events were stored; returns the new value."""
+        self._ensure_started()
+        with self._lock:
+            self._local += 1
+            if self._map is not None:
+                try:
+                    self._bump_file()
+                except Exception as e:
+                    logger.warning("Could not update shared generation file %s: %s", self.path, e)
+        db = self._db()
+        if db is not None:
+            try:
+                doc = db.meta.find_one_and_update(
+                    {"_id": META_ID},
+                    {"$inc": {"value": 1}},
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER,
+                )
+                self._remote = doc["value"]
+            except Exception as e:
+                # Other hosts pick the change up with the next successful bump
+                logger.warning("Could not update shared generation in MongoDB: %s", e)
+        return self.value
+
+    def status(self):
+        """Current value and how it is shared, for /api/health."""
+        local, remote = self.value
+        return {
+            "local": local,
+            "remote": remote,
+            "shared_file": self.path if self._map is not None else None,
+            "remote_mode": self._mode,
+        }
+
+    def _bump_file(self):
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            _COUNTER.pack_into(self._map, 0, _COUNTER.unpack_from(self._map)[0] + 1)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _ensure_started(self):
+        # Per process: flock() does not exclude a parent and child sharing one descriptor
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+            self._open_file()
+            if self._db() is not None and self.poll_interval > 0:
+                self._thread = threading.Thread(target=self._run, name="events-generation", daemon=True)
+                self._thread.start()
+
+    def _db(self):
+        return self._get_db() if self._get_db is not None else None
+
+    def _open_file(self):
+        self._fd = self._map = None
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            if os.fstat(fd).st_size < _COUNTER.size:
+                os.ftruncate(fd, _COUNTER.size)
+            self._map = mmap.mmap(fd, _COUNTER.size)
+            self._fd = fd
+        except Exception as e:
+            logger.warning("Shared generation file %s unavailable, caches see only this worker's writes: %s", self.path, e)
+
+    def _run(self):
+        while True:
+            if self.change_stream:
+                try:
+                    self._watch()
+                except (OperationFailure, NotImplementedError) as e:
+                    # Standalone servers have no change streams: poll from now on
+                    logger.info("Generation change stream unavailable, polling every %.1fs: %s", self.poll_interval, e)
+                    self.change_stream = False
+                except Exception:
+                    pass  # connection lost: poll once, then reopen the stream
+            self._mode = "poll"
+            try:
+                doc = self._get_db().meta.find_one({"_id": META_ID})
+                self._remote = doc["value"] if doc else 0
+            except Exception:
+                pass
+            time.sleep(self.poll_interval)
+
+    def _watch(self):
+        meta = self._get_db().meta
+        pipeline = [{"$match": {"documentKey._id": META_ID}}]
+        with meta.watch(pipeline, full_document="updateLookup") as stream:
+            self._mode = "change_stream"
+            # Changes before the stream opened are not replayed, so read the current value once
+            doc = meta.find_one({"_id": META_ID})
+            self._remote = doc["value"] if doc else 0
+            for change in stream:
+                doc = change.get("fullDocument")
+                if doc is not None:
+                    self._remote = doc.get("value", 0)
@@ -0,0 +1,79 @@
+"""
+Indexes on the events and rollups collections, created (idempotently) at
+startup. Monthly event partitions (app/partitions.py) get the event indexes
+when they are first written to.
+
+With EVENT_TTL_DAYS set, a TTL index on `received_at` also has MongoDB
+delete events that old (deleted, not archived: see app/archive.py for that).
+"""
+import logging
+
+from pymongo import ASCENDING, DESCENDING
+
+logger = logging.getLogger(__name__)
+
+EVENT_INDEXES = [
+    # Cross-worker backstop for redelivered webhooks. Partial, so legacy
+    # documents without a delivery_id don't collide with each other.
+    (
+        [("delivery_id", ASCENDING)],
+        {
+            "name": "delivery_id_unique",
+            "unique": True,
+            "partialFilterExpression": {"delivery_id": {"$type": "string"}},
+        },
+    ),
+    # Time-range scans and sorting by event time
+    ([("occurred_at", DESCENDING)], {"name": "occurred_at_desc"}),
+    # GET /api/events filters: equality on one field, newest first by _id
+    ([("action", ASCENDING), ("_id", DESCENDING)], {"name": "action_id"}),
+    ([("to_branch", ASCENDING), ("_id", DESCENDING)], {"name": "to_branch_id"}),
+    ([("from_branch", ASCENDING), ("_id", DESCENDING)], {"name": "from_branch_id"}),
+    ([("author", ASCENDING), ("_id", DESCENDING)], {"name": "author_id"}),
+    ([("repository", ASCENDING), ("_id", DESCENDING)], {"name": "repository_id"}),
+]
+
+
+ROLLUP_INDEXES = [
+    # /api/stats: one granularity and dimension over a time window
+    (
+        [("granularity", ASCENDING), ("dimension", ASCENDING), ("start", ASCENDING), ("key", ASCENDING)],
+        {"name": "granularity_dimension_start"},
+    ),
+]
+
+
+TTL_INDEX = "received_at_ttl"
+
+
+def ensure_ttl_index(collection, ttl_days):
+    """Create, update or (for ttl_days <= 0) drop the received_at TTL index."""
+    existing = collection.index_information().get(TTL_INDEX)
+    if ttl_days <= 0:
+        if existing is not None:
+            collection.drop_index(TTL_INDEX)
+        return
+    seconds = int(ttl_days * 86400)
+    if existing is None:
+        collection.create_index([("received_at", ASCENDING)], name=TTL_INDEX, expireAfterSeconds=seconds)
+    elif existing.get("expireAfterSeconds") != seconds:
+        collection.database.command(
+            "collMod", collection.name, index={"name": TTL_INDEX, "expireAfterSeconds": seconds}
+        )
+
+
+def ensure_event_indexes(collection, ttl_days=0):
+    """Create the event indexes on one events collection (or monthly partition)."""
+    for keys, options in EVENT_INDEXES:
+        collection.create_index(keys, **options)
+    ensure_ttl_index(collection, ttl_days)
+
+
+def ensure_indexes(db, ttl_days=0):
+    """Create any missing indexes; log and carry on if MongoDB is unreachable."""
+    try:
+        ensure_event_indexes(db.events, ttl_days)
+        for keys, options in ROLLUP_INDEXES:
+            db.rollups.create_index(keys, **options)
+    except Exception as e:
+        logger.warning("Could not ensure MongoDB indexes: %s", e)
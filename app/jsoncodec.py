@@ -0,0 +1,66 @@
+"""
+JSON codec for webhook parsing and API responses.
+
+Uses orjson when it is installed and the stdlib json module otherwise. Both
+backends give the same results: loads() falls back to json.loads() for
+anything orjson rejects (NaN, integers beyond 64 bits, malformed input, so
+errors are the stdlib's), and dumps() writes compact UTF-8 JSON with MongoDB
+types (ObjectId, datetime, ...) encoded as bson.json_util's relaxed Extended
+JSON, as Flask-PyMongo's provider does.
+"""
+import json
+
+from bson import json_util
+from bson.json_util import RELAXED_JSON_OPTIONS
+from flask_pymongo.helpers import BSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+if orjson is not None:
+    # Send datetimes through _default so both backends emit {"$date": ...}
+    _ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME
+
+
+def _default(obj):
+    return json_util.default(obj, json_options=RELAXED_JSON_OPTIONS)
+
+
+def loads(data):
+    """Parse JSON from `str` or UTF-8 `bytes`."""
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+
+def dumps_bytes(obj):
+    """Serialize `obj` to compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            pass  # e.g. integers beyond 64 bits: let the stdlib encoder handle (or reject) it
+    return json.dumps(obj, default=_default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def dumps(obj):
+    """Serialize `obj` to a compact JSON string."""
+    return dumps_bytes(obj).decode("utf-8")
+
+
+class CodecJSONProvider(BSONProvider):
+    """Flask JSON provider (used by jsonify) that serializes through this codec."""
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj), mimetype="application/json")
@@ -0,0 +1,242 @@
+"""
+Where hot events live: the `events` collection, or monthly partitions.
+
+With EVENT_PARTITIONS=monthly, each event is stored in `events_YYYYMM` for
+the month it was received (the month of its `_id`). Partitions are created,
+with the usual indexes, on their first write. Everything stored before the
+switch stays in `events`, which is then read as the oldest partition.
+
+Every partition covers a disjoint `_id` range, so the router only has to
+pick the partitions overlapping a query's `_id` bounds (/api/events
+filters express time windows as `_id` ranges) and read them one after the
+other, newest first, until the page is full. The default dashboard query
+reads only the current month, whose indexes stay small however many years
+of events there are.
+
+All reads and writes of hot events go through `partitions` (see
+app/extensions.py), so the default single-collection layout takes the same
+code path.
+"""
+import logging
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+from bson import ObjectId
+
+from app.indexes import ensure_event_indexes
+from app.webhook.store import InsertResult, insert_events
+
+logger = logging.getLogger(__name__)
+
+LAYOUTS = ("none", "monthly")
+
+BASE_COLLECTION = "events"
+
+_PARTITION_NAME = re.compile(r"^events_(\d{4})(\d{2})$")
+
+# How long the list of existing partitions is reused before asking MongoDB again
+LIST_TTL_S = 60
+
+
+def partition_name(oid):
+    """Monthly partition for an `_id`: events_YYYYMM of its receipt month (UTC)."""
+    return f"{BASE_COLLECTION}_{oid.generation_time:%Y%m}"
+
+
+def partition_bounds(name):
+    """[lo, hi) `_id` range of a monthly partition, or None for the base collection."""
+    match = _PARTITION_NAME.match(name)
+    if match is None:
+        return None
+    year, month = int(match.group(1)), int(match.group(2))
+    start = datetime(year, month, 1, tzinfo=timezone.utc)
+    end = datetime(year + month // 12, month % 12 + 1, 1, tzinfo=timezone.utc)
+    return ObjectId.from_datetime(start), ObjectId.from_datetime(end)
+
+
+def previous_partition(name):
+    """Name of the partition for the month before `name`'s."""
+    match = _PARTITION_NAME.match(name)
+    year, month = int(match.group(1)), int(match.group(2))
+    if month == 1:
+        year, month = year - 1, 12
+    else:
+        month -= 1
+    return f"{BASE_COLLECTION}_{year:04d}{month:02d}"
+
+
+def _overlaps(lo, hi, id_range):
+    """Whether [lo, hi) (None: unbounded) intersects a query's `_id` range."""
+    upper = id_range.get("$lt")
+    if upper is not None and lo is not None and upper <= lo:
+        return False
+    lower = id_range.get("$gt", id_range.get("$gte"))
+    if lower is not None and hi is not None and lower >= hi:
+        return False
+    return True
+
+
+class EventPartitions:
+    """Routes event writes and `_id`-ordered reads to the right collection(s)."""
+
+    def __init__(self, get_db):
+        self._get_db = get_db
+        self.layout = "none"
+        self.ttl_days = 0
+        self._lock = threading.Lock()
+        self._names = None
+        self._listed_at = 0.0
+        self._indexed = set()
+        self._base_newest = None
+        self._base_checked_at = None
+
+    def init_app(self, app):
+        layout = app.config.get("EVENT_PARTITIONS", "none")
+        if layout not in LAYOUTS:
+            raise ValueError(f"EVENT_PARTITIONS must be one of {', '.join(LAYOUTS)}")
+        self.layout = layout
+        self.ttl_days = app.config.get("EVENT_TTL_DAYS", 0)
+        app.extensions["event_partitions"] = self
+
+    @property
+    def db(self):
+        return self._get_db()
+
+    @property
+    def monthly(self):
+        return self.layout == "monthly"
+
+    def name_for(self, oid):
+        return partition_name(oid) if self.monthly else BASE_COLLECTION
+
+    def names(self):
+        """Hot collections, oldest first (the current month's partition is always included)."""
+        if not self.monthly:
+            return [BASE_COLLECTION]
+        now = time.monotonic()
+        with self._lock:
+            names = self._names
+            if names is None or now - self._listed_at > LIST_TTL_S:
+                names = None
+        if names is None:
+            listed = [n for n in self._get_db().list_collection_names() if _PARTITION_NAME.match(n)]
+            names = set(listed)
+            with self._lock:
+                self._names = names
+                self._listed_at = now
+        names = set(names)
+        names.add(partition_name(ObjectId()))
+        return [BASE_COLLECTION] + sorted(names)
+
+    def route(self, query=None, ascending=False):
+        """Collections that can hold documents matching `query`'s `_id` bounds, in `_id` order."""
+        id_range = (query or {}).get("_id")
+        if not isinstance(id_range, dict):
+            id_range = {}
+        names = self.names()
+        db = self._get_db()
+        routed = []
+        for i, name in enumerate(names):
+            bounds = partition_bounds(name)
+            if bounds is None:
+                # The base collection holds what was stored before the first partition
+                following = partition_bounds(names[i + 1]) if i + 1 < len(names) else None
+                bounds = (None, following[0] if following else None)
+            if _overlaps(bounds[0], bounds[1], id_range):
+                routed.append(db[name])
+        return routed if ascending else routed[::-1]
+
+    def find(self, query=None, projection=None, limit=0, ascending=False):
+        """Documents matching `query` in `_id` order (newest first unless `ascending`), up to `limit`."""
+        docs = []
+        direction = 1 if ascending else -1
+        for collection in self.route(query, ascending):
+            cursor = collection.find(query or {}, projection).sort("_id", direction)
+            if limit:
+                cursor = cursor.limit(limit - len(docs))
+            docs.extend(cursor)
+            if limit and len(docs) >= limit:
+                break
+        return docs
+
+    def current(self):
+        """Collection new events are written to now (indexes ensured)."""
+        name = self.name_for(ObjectId())
+        self._ensure_indexes(name)
+        return self._get_db()[name]
+
+    def insert(self, docs):
+        """insert_events() per partition; returns the combined InsertResult."""
+        if not self.monthly:
+            return insert_events(self._get_db().events, docs)
+        groups = {}
+        for doc in docs:
+            doc.setdefault("_id", ObjectId())
+            groups.setdefault(partition_name(doc["_id"]), []).append(doc)
+        inserted = duplicates = 0
+        db = self._get_db()
+        for name, group in groups.items():
+            self._ensure_indexes(name)
+            group, redelivered = self._drop_redeliveries(db, name, group)
+            result = insert_events(db[name], group)
+            inserted += result.inserted
+            duplicates += result.duplicates + redelivered
+        return InsertResult(inserted, duplicates)
+
+    def status(self):
+        """Layout summary for /api/health."""
+        status = {"layout": self.layout}
+        if self.monthly:
+            with self._lock:
+                status["partitions"] = len(self._names or ())
+        return status
+
+    def _drop_redeliveries(self, db, name, docs):
+        """
+        Drop deliveries already stored in the previous month (a redelivery across the boundary).
+
+        Until partitions have been on for a full month, the previous month's
+        events are (partly) in the base collection, so it is checked too
+        while it holds events from then.
+        """
+        ids = [doc["delivery_id"] for doc in docs if doc.get("delivery_id")]
+        if not ids:
+            return docs, 0
+        previous = previous_partition(name)
+        lookups = [previous] if previous in self.names() else []
+        newest = self._base_newest_id(db)
+        if newest is not None and newest >= partition_bounds(previous)[0]:
+            lookups.append(BASE_COLLECTION)
+        seen = set()
+        for collection in lookups:
+            seen.update(d["delivery_id"] for d in db[collection].find({"delivery_id": {"$in": ids}}, {"delivery_id": 1}))
+        kept = [doc for doc in docs if doc.get("delivery_id") not in seen]
+        return kept, len(docs) - len(kept)
+
+    def _base_newest_id(self, db):
+        # The base collection takes no writes once partitions are on, so this is re-read rarely
+        now = time.monotonic()
+        with self._lock:
+            if self._base_checked_at is not None and now - self._base_checked_at <= LIST_TTL_S:
+                return self._base_newest
+        doc = db[BASE_COLLECTION].find_one({}, {"_id": 1}, sort=[("_id", -1)])
+        with self._lock:
+            self._base_newest = doc["_id"] if doc else None
+            self._base_checked_at = now
+        return self._base_newest
+
+    def _ensure_indexes(self, name):
+        with self._lock:
+            if name in self._indexed:
+                return
+        try:
+            ensure_event_indexes(self._get_db()[name], self.ttl_days)
+        except Exception as e:
+            logger.warning("Could not ensure indexes on %s: %s", name, e)
+            return
+        with self._lock:
+            self._indexed.add(name)
+            if self._names is not None and name != BASE_COLLECTION:
+                self._names.add(name)
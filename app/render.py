@@ -0,0 +1,159 @@
+"""
+Display rendering for webhook events.
+
+The dashboard message, normalized action and display timestamp are rendered
+once, when the receiver stores an event, and persisted together with
+`render_version`. GET /api/events then only projects the stored fields.
+When the rendered format changes, bump RENDER_VERSION: documents with an
+older version are rendered on read until `python rerender_events.py` has
+re-rendered them in place. The same goes for documents rendered for other
+display time zones than the configured ones (`render_timezones`; documents
+without it were rendered for IST), and for requests that ask for other
+zones with ?tz=.
+"""
+from datetime import datetime
+
+from app.timefmt import LEGACY_TIMEZONES, display_timestamp, display_timestamps, display_timezones
+
+# Bump when the message/timestamp format below changes
+# (2: display time is received_at, no longer the payload's occurred_at)
+RENDER_VERSION = 2
+
+# Display author: always show your GitHub name
+# (DB still keeps the original author, but the UI is fixed to you.)
+DISPLAY_AUTHOR = "Lakshmiswayampakula"
+
+# Stored fields GET /api/events needs, for current and older documents
+EVENT_PROJECTION = {
+    "message": 1,
+    "timestamp": 1,
+    "action": 1,
+    "request_id": 1,
+    "from_branch": 1,
+    "to_branch": 1,
+    "occurred_at": 1,
+    "received_at": 1,
+    "render_version": 1,
+    "render_timezones": 1,
+}
+
+
+def _iso(value):
+    """'2024-03-01T10:15:00Z' for a naive UTC datetime, or None."""
+    if not isinstance(value, datetime):
+        return None
+    return value.replace(microsecond=0).isoformat() + "Z"
+
+
+def normalize_action(e):
+    """Stored action in upper case, inferred from the branches for legacy documents."""
+    action = (e.get("action") or "").strip().upper()
+    from_branch = e.get("from_branch") or ""
+    to_branch = e.get("to_branch") or ""
+
+    # Smart inference: if action is missing/empty, try to infer from other fields
+    # This helps fix old events that might have been stored incorrectly
+    if not action or action == "":
+        # If we have from_branch AND to_branch AND they're different, 
+        # it's likely a PR or Merge event
+        if from_branch and to_branch and from_branch != to_branch:
+            # Check request_id format - PR numbers are usually numeric strings
+            # Merge events often have both branches populated
+            # We can't perfectly distinguish PR vs Merge without the original webhook,
+            # but if from_branch exists, it's likely a PR/Merge, not a plain push
+            # Default to PULL_REQUEST if we can't tell
+            action = "PULL_REQUEST"
+        else:
+            # No from_branch or same branch = likely a push
+            action = "PUSH"
+    return action
+
+
+def render_fields(e, timestamp=None, zones=None):
+    """
+    Rendered fields to persist on an event document, for display `zones`
+    (default: the configured ones). `timestamp` is the display time if it
+    has already been rendered.
+    """
+    if zones is None:
+        zones = display_timezones()
+    author = DISPLAY_AUTHOR
+
+    action = normalize_action(e)
+    from_branch = e.get("from_branch") or ""
+    to_branch = e.get("to_branch") or ""
+
+    # Render from the stored datetime (legacy documents: add the zones to the UTC string)
+    if timestamp is None:
+        timestamp = display_timestamp(e, zones)
+
+    # Format messages consistently - all follow "pushed to main" style format
+    if action == "PUSH":
+        # Default to "main" if to_branch is empty
+        branch = to_branch or "main"
+        message = f'{author} pushed to {branch} on {timestamp}'
+    elif action == "PULL_REQUEST":
+        # Ensure we have branch info, default to "main" if missing
+        from_br = from_branch or "feature"
+        to_br = to_branch or "main"
+        message = f'{author} submitted a pull request from {from_br} to {to_br} on {timestamp}'
+    elif action == "MERGE":
+        # Ensure we have branch info
+        from_br = from_branch or "feature"
+        to_br = to_branch or "main"
+        message = f'{author} merged branch {from_br} to {to_br} on {timestamp}'
+    else:
+        # Treat any unknown/legacy action as a push-style event for consistent display
+        branch = to_branch or "main"
+        message = f'{author} pushed to {branch} on {timestamp}'
+
+    return {
+        "message": message,
+        "action": action.upper() if action else "",  # Ensure uppercase for consistency
+        "timestamp": timestamp,
+        "render_version": RENDER_VERSION,
+        "render_timezones": list(zones),
+    }
+
+
+def rendered_timezones(e):
+    """Display zones a stored document was rendered for."""
+    zones = e.get("render_timezones")
+    return LEGACY_TIMEZONES if zones is None else tuple(zones)
+
+
+def _is_current(e, zones):
+    return e.get("render_version") == RENDER_VERSION and rendered_timezones(e) == zones
+
+
+def format_event(e, zones=None):
+    """Turn a stored event document into the shape the dashboard renders (times in `zones`)."""
+    if zones is None:
+        zones = display_timezones()
+    if not _is_current(e, zones):
+        # Not rendered yet (or with an older format, or for other zones): render now
+        e = dict(e, **render_fields(e, zones=zones))
+    return {
+        "id": str(e["_id"]) if e.get("_id") is not None else "",
+        "message": e.get("message") or "",
+        "timestamp": e.get("timestamp") or "",
+        "occurred_at": _iso(e.get("occurred_at")),
+        "action": e.get("action") or "",
+        "author": DISPLAY_AUTHOR,
+        "request_id": e.get("request_id") or "",
+        "from_branch": e.get("from_branch") or "",
+        "to_branch": e.get("to_branch") or "",
+    }
+
+
+def format_events(docs, zones=None):
+    """format_event() for a page of documents; unrendered timestamps are rendered in one batch."""
+    if zones is None:
+        zones = display_timezones()
+    docs = list(docs)
+    stale = [i for i, e in enumerate(docs) if not _is_current(e, zones)]
+    if stale:
+        timestamps = display_timestamps([docs[i] for i in stale], zones)
+        for i, timestamp in zip(stale, timestamps):
+            docs[i] = dict(docs[i], **render_fields(docs[i], timestamp, zones))
+    return [format_event(e, zones) for e in docs]
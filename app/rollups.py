@@ -0,0 +1,141 @@
+"""
+Incrementally maintained activity counters.
+
+Every newly stored event adds one to an hourly and a daily bucket in the
+`rollups` collection, once per dimension:
+
+    all         every event
+    branch      to_branch
+    author      author (GitHub login)
+    repository  repository full name
+
+Each bucket counts the events and, under `actions`, how many were PUSH,
+PULL_REQUEST and MERGE. Buckets are keyed by event time (`occurred_at`).
+/api/stats reads only bucket documents for a window, never raw events.
+
+The write path (app/webhook/store.py) calls apply_rollups() for documents
+that were actually inserted, so redeliveries are not counted twice.
+`python rebuild_rollups.py` recomputes everything from the events.
+"""
+import logging
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING, UpdateOne
+
+from app.render import normalize_action
+from app.timefmt import parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = ("hour", "day")
+
+# Dimension name -> event field (None: one bucket for all events)
+DIMENSIONS = {
+    "all": None,
+    "branch": "to_branch",
+    "author": "author",
+    "repository": "repository",
+}
+
+ACTIONS = ("PUSH", "PULL_REQUEST", "MERGE")
+
+
+def event_time(doc):
+    """When the event happened (naive UTC), falling back for legacy documents."""
+    occurred_at = doc.get("occurred_at")
+    if isinstance(occurred_at, datetime):
+        return occurred_at
+    parsed = parse_timestamp(doc.get("timestamp"))
+    if parsed is not None:
+        return parsed
+    return doc["_id"].generation_time.replace(tzinfo=None)
+
+
+def bucket_start(dt, granularity):
+    if granularity == "day":
+        return dt.replace(hour=0, minute=0, second=0, microsecond=0)
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+
+def accumulate(buckets, doc):
+    """Add one event's contributions to `buckets` ({bucket _id: bucket doc})."""
+    when = event_time(doc)
+    action = normalize_action(doc)
+    for granularity in GRANULARITIES:
+        start = bucket_start(when, granularity)
+        for dimension, field in DIMENSIONS.items():
+            key = "" if field is None else (doc.get(field) or "")
+            if field is not None and not key:
+                continue
+            bucket_id = f"{granularity}:{start:%Y-%m-%dT%H}:{dimension}:{key}"
+            bucket = buckets.get(bucket_id)
+            if bucket is None:
+                bucket = buckets[bucket_id] = {
+                    "granularity": granularity,
+                    "start": start,
+                    "dimension": dimension,
+                    "key": key,
+                    "count": 0,
+                    "actions": {},
+                }
+            bucket["count"] += 1
+            bucket["actions"][action] = bucket["actions"].get(action, 0) + 1
+
+
+def merge(buckets, other):
+    """Fold the counts of `other` into `buckets`."""
+    for bucket_id, bucket in other.items():
+        mine = buckets.get(bucket_id)
+        if mine is None:
+            buckets[bucket_id] = bucket
+            continue
+        mine["count"] += bucket["count"]
+        for action, n in bucket["actions"].items():
+            mine["actions"][action] = mine["actions"].get(action, 0) + n
+
+
+def write_buckets(collection, buckets, batch_size=1000):
+    """$inc the accumulated counts into `collection` with upserts."""
+    requests = []
+    for bucket_id, bucket in buckets.items():
+        inc = {"count": bucket["count"]}
+        for action, n in bucket["actions"].items():
+            inc[f"actions.{action}"] = n
+        fields = {k: bucket[k] for k in ("granularity", "start", "dimension", "key")}
+        requests.append(UpdateOne({"_id": bucket_id}, {"$setOnInsert": fields, "$inc": inc}, upsert=True))
+        if len(requests) >= batch_size:
+            collection.bulk_write(requests, ordered=False)
+            requests = []
+    if requests:
+        collection.bulk_write(requests, ordered=False)
+
+
+def apply_rollups(db, docs):
+    """Count newly stored events into db.rollups; failures are logged, not raised."""
+    if not docs:
+        return
+    buckets = {}
+    try:
+        for doc in docs:
+            accumulate(buckets, doc)
+        write_buckets(db.rollups, buckets)
+    except Exception as e:
+        # The events are stored; only the counters are short until the next rebuild
+        logger.warning("Could not update rollups for %d event(s): %s", len(docs), e)
+
+
+def query_stats(db, granularity, dimension, start, end, key=None, limit=5000):
+    """Bucket documents for [start, end), oldest first. Returns (buckets, truncated)."""
+    query = {"granularity": granularity, "dimension": dimension, "start": {"$gte": start, "$lt": end}}
+    if key:
+        query["key"] = key
+    cursor = db.rollups.find(query, {"_id": 0, "granularity": 0, "dimension": 0})
+    docs = list(cursor.sort([("start", ASCENDING), ("key", ASCENDING)]).limit(limit + 1))
+    return docs[:limit], len(docs) > limit
+
+
+def default_window(granularity, now):
+    """Last 24 hours of hourly buckets, or last 30 days of daily ones."""
+    span = timedelta(days=30) if granularity == "day" else timedelta(hours=24)
+    end = bucket_start(now, granularity) + (timedelta(days=1) if granularity == "day" else timedelta(hours=1))
+    return end - span, end
@@ -0,0 +1,291 @@
+"""
+Timestamp parsing and display formatting for webhook events.
+
+Events store native UTC datetimes (`occurred_at`, `received_at`) and the
+human-readable "1st April 2021 - 9:30 PM UTC (3:00 AM IST)" string is
+rendered from `received_at`, the clock events are listed, paged and
+filtered by. Older documents only have that
+string in `timestamp`; parse_timestamp() turns it back into a datetime.
+
+Besides UTC, times are shown in the display zones (DISPLAY_TIMEZONES, IANA
+names converted with zoneinfo, so DST is handled; IST by default), or in
+the zones a caller passes. A zone's offset and abbreviation are looked up
+once per UTC hour, and the display format has minute resolution, so
+renderings are memoized per (minute, zone list) in bounded LRU caches, and
+legacy strings per string. A page of events can be
+rendered in one call with display_timestamps().
+"""
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+import re
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# "30th January 2026 - 8:06 AM UTC", optionally followed by " (... IST)"
+_UTC_TIMESTAMP = re.compile(r'(\d{1,2})(?:st|nd|rd|th)\s+(\w+)\s+(\d{4})\s+-\s+(\d{1,2}):(\d{2})\s+(AM|PM)\s+UTC')
+
+_MONTH_NAMES = (
+    "January", "February", "March", "April", "May", "June",
+    "July", "August", "September", "October", "November", "December",
+)
+_MONTHS = {name: i for i, name in enumerate(_MONTH_NAMES, 1)}
+
+# Lookup tables for the display format: day -> "1st", hour -> ("9", "PM"), minute -> "05"
+_DAYS = ("",) + tuple(
+    f"{day}{'th' if 11 <= day <= 13 else {1: 'st', 2: 'nd', 3: 'rd'}.get(day % 10, 'th')}"
+    for day in range(1, 32)
+)
+_HOURS = tuple((str(hour % 12 or 12), "AM" if hour < 12 else "PM") for hour in range(24))
+_MINUTES = tuple(f"{minute:02d}" for minute in range(60))
+
+# Zones legacy timestamp strings were rendered in, and the default display zones
+LEGACY_TIMEZONES = ("Asia/Kolkata",)
+_display_timezones = LEGACY_TIMEZONES
+
+_HOUR = timedelta(hours=1)
+_LAST_MINUTE = timedelta(minutes=59)
+
+# Rendered minutes kept per process (a few days' worth of distinct event times)
+CACHE_SIZE = 4096
+
+
+def utcnow():
+    """Current UTC time as a naive datetime, truncated to BSON's millisecond precision."""
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+def parse_github_time(value):
+    """
+    Parse a GitHub payload time into a naive UTC datetime, or None.
+
+    GitHub sends ISO 8601 strings ("2021-04-01T21:30:00Z", or with an offset
+    for commit times) and, for `repository.pushed_at` on pushes, Unix seconds.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        if isinstance(value, (int, float)):
+            dt = datetime.fromtimestamp(value, tz=timezone.utc)
+        else:
+            dt = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+            if dt.tzinfo is None:
+                dt = dt.replace(tzinfo=timezone.utc)
+    except (ValueError, OverflowError, OSError):
+        return None
+    dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt.replace(microsecond=dt.microsecond // 1000 * 1000)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_timestamp(timestamp_str):
+    """Parse the UTC part of a stored display timestamp into a naive datetime, or None."""
+    if not timestamp_str:
+        return None
+    match = _UTC_TIMESTAMP.search(timestamp_str)
+    return _parse_match(match) if match else None
+
+
+def _parse_match(match):
+    day, month_name, year, hour_12, minute, am_pm = match.groups()
+
+    # Convert to 24-hour format
+    hour_24 = int(hour_12)
+    if am_pm == "PM" and hour_24 != 12:
+        hour_24 += 12
+    elif am_pm == "AM" and hour_24 == 12:
+        hour_24 = 0
+
+    month = _MONTHS.get(month_name, 1)
+    try:
+        return datetime(int(year), month, int(day), hour_24, int(minute))
+    except ValueError:
+        return None
+
+
+def _format_single_time(dt_obj):
+    """Format one datetime as '1st April 2021 - 9:30 PM' (no zone suffix)."""
+    hour, am_pm = _HOURS[dt_obj.hour]
+    return f"{_DAYS[dt_obj.day]} {_MONTH_NAMES[dt_obj.month - 1]} {dt_obj.year} - {hour}:{_MINUTES[dt_obj.minute]} {am_pm}"
+
+
+def parse_timezones(value):
+    """
+    Tuple of IANA zone names from a list or a comma-separated string.
+
+    Raises ValueError for a zone zoneinfo does not know. An empty value
+    means UTC only.
+    """
+    names = value.split(",") if isinstance(value, str) else list(value or ())
+    zones = []
+    for name in names:
+        name = name.strip()
+        if not name:
+            continue
+        try:
+            _zone(name)
+        except (ZoneInfoNotFoundError, ValueError, OSError):
+            raise ValueError(f"Unknown time zone {name!r} (use IANA names such as Asia/Kolkata)")
+        if name not in zones:
+            zones.append(name)
+    return tuple(zones)
+
+
+def set_display_timezones(zones):
+    """Zones every timestamp is rendered in besides UTC, unless a call passes its own."""
+    global _display_timezones
+    _display_timezones = parse_timezones(zones)
+
+
+def display_timezones():
+    return _display_timezones
+
+
+@lru_cache(maxsize=None)
+def _zone(name):
+    return ZoneInfo(name)
+
+
+def _hour_parts(dt, name):
+    """('1st April 2021 - 9:', ' PM IST') for the hour of `dt`; the minute goes in between."""
+    hour, am_pm = _HOURS[dt.hour]
+    return f"{_DAYS[dt.day]} {_MONTH_NAMES[dt.month - 1]} {dt.year} - {hour}:", f" {am_pm} {name}"
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _zone_hour(year, month, day, hour, zone):
+    """
+    How the minutes of one UTC hour render in `zone` (None for UTC itself).
+
+    Returns the local minute the UTC hour starts at and the parts of the
+    local hour it starts in and of the one after it; or (None, zone) if the
+    zone's offset changes within the hour.
+    """
+    start = datetime(year, month, day, hour)
+    if zone is None:
+        return 0, _hour_parts(start, "UTC"), None
+    utc = start.replace(tzinfo=timezone.utc)
+    first = utc.astimezone(_zone(zone))
+    last = (utc + _LAST_MINUTE).astimezone(_zone(zone))
+    offset, name = first.utcoffset(), first.tzname()
+    if last.utcoffset() != offset or last.tzname() != name:
+        return None, zone  # a transition off the hour (America/St_Johns, Australia/Lord_Howe)
+    local = start + offset
+    floor = local.replace(minute=0, second=0)
+    return local.minute, _hour_parts(floor, name), _hour_parts(floor + _HOUR, name)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _zone_hours(year, month, day, hour, zones):
+    """_zone_hour() for UTC and each of `zones`, in that order."""
+    return tuple(_zone_hour(year, month, day, hour, zone) for zone in (None,) + zones)
+
+
+def _format_zone_minutes(year, month, day, hour, minute, zones):
+    """The time in UTC and in each of `zones` as '1st April 2021 - 9:30 PM UTC' strings."""
+    # Offsets are converted through zoneinfo once per UTC hour, so DST transitions
+    # (and the zone's abbreviation) are right while a minute costs a lookup
+    out = []
+    for parts in _zone_hours(year, month, day, hour, zones):
+        if parts[0] is None:
+            local = datetime(year, month, day, hour, minute, tzinfo=timezone.utc).astimezone(_zone(parts[1]))
+            out.append(f"{_format_single_time(local)} {local.tzname()}")
+            continue
+        local = parts[0] + minute
+        prefix, suffix = parts[1] if local < 60 else parts[2]
+        out.append(prefix + _MINUTES[local % 60] + suffix)
+    return out
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _format_minute(year, month, day, hour, minute, zones):
+    utc_str, *local = _format_zone_minutes(year, month, day, hour, minute, zones)
+    if not local:
+        return utc_str
+    return f"{utc_str} ({', '.join(local)})"
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _format_naive(dt, zones):
+    # Skips the field lookups for datetimes seen before (aware ones compare equal
+    # across zones while rendering differently, so only naive ones are keys)
+    return _format_minute(dt.year, dt.month, dt.day, dt.hour, dt.minute, zones)
+
+
+def format_timestamp(dt, zones=None):
+    """
+    Format a UTC datetime as '1st April 2021 - 9:30 PM UTC (3:00 AM IST)'.
+
+    The parenthesis lists the time in each of `zones` (IANA names; default
+    display_timezones()), separated by commas. Naive datetimes are UTC.
+    """
+    if zones is None:
+        zones = _display_timezones
+    # The format has minute resolution, so renderings are cached per (minute, zones)
+    if dt.tzinfo is None:
+        return _format_naive(dt, zones)
+    dt = dt.astimezone(timezone.utc)
+    return _format_minute(dt.year, dt.month, dt.day, dt.hour, dt.minute, zones)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _ensure_zones(timestamp_str, zones):
+    has_ist = "IST)" in timestamp_str
+    if has_ist and zones == LEGACY_TIMEZONES:
+        return timestamp_str
+
+    # Format: "30th January 2026 - 8:06 AM UTC"
+    match = _UTC_TIMESTAMP.search(timestamp_str)
+    utc_dt = _parse_match(match) if match else None
+    if utc_dt is None:
+        return timestamp_str
+
+    # A string that already lists IST is re-rendered from its UTC part
+    head = timestamp_str[:match.end()] if has_ist else timestamp_str
+    if not zones:
+        return head
+    local = _format_zone_minutes(utc_dt.year, utc_dt.month, utc_dt.day, utc_dt.hour, utc_dt.minute, zones)[1:]
+    return f"{head} ({', '.join(local)})"
+
+
+def ensure_zones_in_timestamp(timestamp_str, zones=None):
+    """Add the times in `zones` (default display_timezones()) to a legacy 'h:mm AM UTC' string."""
+    if not timestamp_str:
+        return timestamp_str
+    return _ensure_zones(timestamp_str, _display_timezones if zones is None else zones)
+
+
+def ensure_ist_in_timestamp(timestamp_str):
+    """Ensure timestamp includes IST. If it doesn't, parse UTC time and add IST."""
+    return ensure_zones_in_timestamp(timestamp_str, LEGACY_TIMEZONES)
+
+
+def display_timestamp(doc, zones=None):
+    """Display string for a stored event: rendered from received_at, or the legacy string."""
+    received_at = doc.get("received_at")
+    if isinstance(received_at, datetime):
+        return format_timestamp(received_at, zones)
+    return ensure_zones_in_timestamp(doc.get("timestamp") or "", zones)
+
+
+def format_timestamps(dts, zones=None):
+    """format_timestamp() for a sequence of datetimes, as a list."""
+    if zones is None:
+        zones = _display_timezones
+    render = _format_naive
+    return [render(dt, zones) if dt.tzinfo is None else format_timestamp(dt, zones) for dt in dts]
+
+
+def display_timestamps(docs, zones=None):
+    """display_timestamp() for a page of stored events, as a list in the same order."""
+    if zones is None:
+        zones = _display_timezones
+    render = _format_naive
+    ensure = ensure_zones_in_timestamp
+    out = []
+    for doc in docs:
+        received_at = doc.get("received_at")
+        if isinstance(received_at, datetime):
+            out.append(render(received_at, zones) if received_at.tzinfo is None else format_timestamp(received_at, zones))
+        else:
+            out.append(ensure(doc.get("timestamp") or "", zones))
+    return out
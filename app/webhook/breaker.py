@@ -0,0 +1,79 @@
+"""
+Circuit breaker around MongoDB writes on the webhook path.
+
+After MONGO_BREAKER_FAILURES consecutive failures the breaker opens and
+writes skip the database entirely (events go straight to the spool). Once
+MONGO_BREAKER_RESET_MS has passed, a single half-open probe write is let
+through; its success closes the breaker, its failure re-opens it.
+"""
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a single half-open probe."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._short_circuited = 0
+        self._times_opened = 0
+
+    def init_app(self, app):
+        self.failure_threshold = max(1, app.config.get("MONGO_BREAKER_FAILURES", 5))
+        self.reset_timeout = max(0, app.config.get("MONGO_BREAKER_RESET_MS", 30000)) / 1000.0
+        app.extensions["circuit_breaker"] = self
+
+    def allow(self):
+        """Return True if a write may go to MongoDB now."""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = HALF_OPEN
+                self._probe_in_flight = False
+            if self._state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self._short_circuited += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self._times_opened += 1
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def status(self):
+        """State and counters for /api/health."""
+        with self._lock:
+            status = {
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "failure_threshold": self.failure_threshold,
+                "short_circuited": self._short_circuited,
+                "times_opened": self._times_opened,
+            }
+            if self._state == OPEN:
+                remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+                status["retry_in_ms"] = max(0, int(remaining * 1000))
+            return status
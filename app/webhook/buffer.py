@@ -0,0 +1,227 @@
+"""
+Per-worker write-behind buffer for webhook events.
+
+receiver() hands normalized events to the buffer instead of writing them
+on the request thread. A background thread collects them and writes them
+to the event store in one batch once WRITE_BUFFER_MAX_BATCH
+documents are waiting or WRITE_BUFFER_MAX_DELAY_MS has passed, whichever
+comes first. Set WRITE_BUFFER_ENABLED=0 to write synchronously instead.
+Batches the store does not accept (connection errors, timeouts) go to the
+local spool and are replayed later; while the circuit breaker is open,
+batches are spooled without touching the database at all.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Sentinel pushed onto the queue to ask the flush thread to drain and exit
+_STOP = object()
+
+
+class WriteBuffer:
+    """Bounded queue of events flushed in batches by one thread per worker."""
+
+    def __init__(self, get_store, spool=None, breaker=None, generation=None, recent=None):
+        self._get_store = get_store
+        self._spool = spool
+        self._breaker = breaker
+        self._generation = generation
+        self._recent = recent
+        self.enabled = True
+        self.max_batch = 200
+        self.max_delay = 0.05
+        self.queue_size = 10000
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._metrics = _empty_metrics()
+        self._atexit_registered = False
+
+    def init_app(self, app):
+        self.enabled = app.config.get("WRITE_BUFFER_ENABLED", True)
+        self.max_batch = max(1, app.config.get("WRITE_BUFFER_MAX_BATCH", 200))
+        self.max_delay = max(0, app.config.get("WRITE_BUFFER_MAX_DELAY_MS", 50)) / 1000.0
+        self.queue_size = max(1, app.config.get("WRITE_BUFFER_QUEUE_SIZE", 10000))
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        app.extensions["write_buffer"] = self
+        if not self._atexit_registered:
+            # Flush on worker shutdown (gunicorn also calls close() from worker_exit)
+            atexit.register(self.close)
+            self._atexit_registered = True
+
+    def submit(self, event):
+        """Queue an event for the next flush (or write it now in synchronous mode)."""
+        if not self.enabled:
+            return self._write([event])
+
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            # Backpressure: write on the request thread rather than drop the event
+            self._count("queue_full")
+            return self._write([event])
+        return True
+
+    def close(self, timeout=5.0):
+        """Flush everything still queued and stop the flush thread."""
+        with self._lock:
+            thread = self._thread if self._pid == os.getpid() else None
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            try:
+                self._queue.put(_STOP, timeout=timeout)
+            except queue.Full:
+                logger.warning("Write buffer still full at shutdown; flushing inline")
+            thread.join(timeout)
+        # Anything left (thread never started, or it timed out) is written inline
+        leftover = self._drain()
+        if leftover:
+            self._write(leftover)
+
+    def metrics(self):
+        """Snapshot of batch size and flush latency counters for this worker."""
+        with self._metrics_lock:
+            snapshot = dict(self._metrics)
+        flushes = snapshot["flushes"]
+        flush_ms_total = snapshot.pop("flush_ms_total")
+        snapshot["avg_batch_size"] = round(snapshot["documents"] / flushes, 2) if flushes else 0
+        snapshot["avg_flush_ms"] = round(flush_ms_total / flushes, 3) if flushes else 0
+        snapshot["queue_depth"] = self._queue.qsize() if self._queue is not None else 0
+        snapshot["mode"] = "buffered" if self.enabled else "synchronous"
+        return snapshot
+
+    def _ensure_started(self):
+        # The thread is started lazily so each gunicorn worker gets its own after fork
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None:
+            return
+        with self._lock:
+            if self._pid == pid and self._thread is not None:
+                return
+            if self._pid != pid:
+                # Never reuse a queue (and its locks) inherited from the parent process
+                self._queue = queue.Queue(maxsize=self.queue_size)
+            self._pid = pid
+            self._thread = threading.Thread(
+                target=self._run, name="webhook-write-buffer", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            stop = False
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._write(batch)
+            if stop:
+                return
+
+    def _drain(self):
+        items = []
+        if self._queue is None:
+            return items
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return items
+            if item is not _STOP:
+                items.append(item)
+
+    def _write(self, docs):
+        start = time.perf_counter()
+        ok = True
+        if self._breaker is not None and not self._breaker.allow():
+            ok = False
+            self._count("short_circuited", len(docs))
+        else:
+            try:
+                result = self._get_store().insert_many(docs)
+            except Exception as e:
+                ok = False
+                logger.warning("Failed to store %d webhook event(s), spooling: %s", len(docs), e)
+                if self._breaker is not None:
+                    self._breaker.record_failure()
+            else:
+                logger.info("Stored %d webhook event(s), %d duplicate(s)", result.inserted, result.duplicates)
+                if self._breaker is not None:
+                    self._breaker.record_success()
+                if result.duplicates:
+                    self._count("duplicates", result.duplicates)
+                self._stored(docs, result)
+        if not ok and self._spool is not None:
+            self._spool.append(docs)
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+
+        with self._metrics_lock:
+            m = self._metrics
+            m["flushes"] += 1
+            m["documents"] += len(docs)
+            m["last_batch_size"] = len(docs)
+            m["max_batch_size"] = max(m["max_batch_size"], len(docs))
+            m["last_flush_ms"] = round(elapsed_ms, 3)
+            m["max_flush_ms"] = round(max(m["max_flush_ms"], elapsed_ms), 3)
+            m["flush_ms_total"] += elapsed_ms
+            if not ok:
+                m["failed_flushes"] += 1
+                m["failed_documents"] += len(docs)
+        return ok
+
+    def _stored(self, docs, result):
+        # The batch is stored: a failure here must not spool it again or trip the breaker
+        before = after = None
+        try:
+            if result.inserted and self._generation is not None:
+                before = self._generation.value
+                after = self._generation.bump()
+        except Exception as e:
+            before = after = None
+            logger.warning("Could not bump the write generation after storing %d event(s): %s", len(docs), e)
+        try:
+            if self._recent is not None and result.inserted == len(docs):
+                # Only when every doc is new: a redelivery would show up twice under a fresh _id
+                self._recent.add(docs, before, after)
+        except Exception as e:
+            logger.warning("Could not add %d stored event(s) to the recent buffer: %s", len(docs), e)
+
+    def _count(self, key, n=1):
+        with self._metrics_lock:
+            self._metrics[key] += n
+
+
+def _empty_metrics():
+    return {
+        "flushes": 0,
+        "documents": 0,
+        "last_batch_size": 0,
+        "max_batch_size": 0,
+        "last_flush_ms": 0.0,
+        "max_flush_ms": 0.0,
+        "flush_ms_total": 0.0,
+        "failed_flushes": 0,
+        "failed_documents": 0,
+        "queue_full": 0,
+        "short_circuited": 0,
+        "duplicates": 0,
+    }
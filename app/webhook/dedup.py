@@ -0,0 +1,52 @@
+"""
+Per-worker cache of recently seen X-GitHub-Delivery IDs.
+
+GitHub redelivers the same payload on timeouts and manual "Redeliver"
+clicks. The cache short-circuits obvious repeats without touching MongoDB;
+the unique index on `delivery_id` (see app/indexes.py) catches the rest,
+including redeliveries that land on a different worker.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class DeliveryCache:
+    """LRU set of delivery IDs whose entries also expire after a TTL."""
+
+    def __init__(self, maxsize=10000, ttl=3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+
+    def init_app(self, app):
+        self.maxsize = max(1, app.config.get("DELIVERY_CACHE_SIZE", 10000))
+        self.ttl = max(0, app.config.get("DELIVERY_CACHE_TTL_S", 3600))
+        app.extensions["delivery_cache"] = self
+
+    def seen(self, delivery_id):
+        """Return True (and count a hit) if this delivery was already accepted."""
+        now = time.monotonic()
+        with self._lock:
+            added = self._entries.get(delivery_id)
+            if added is None:
+                return False
+            if now - added > self.ttl:
+                del self._entries[delivery_id]
+                return False
+            self._entries.move_to_end(delivery_id)
+            self._hits += 1
+            return True
+
+    def add(self, delivery_id):
+        with self._lock:
+            self._entries[delivery_id] = time.monotonic()
+            self._entries.move_to_end(delivery_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def status(self):
+        with self._lock:
+            return {"cached_ids": len(self._entries), "cache_hits": self._hits}
@@ -0,0 +1,214 @@
+"""
+Selective field extraction from raw webhook bodies.
+
+receiver() reads about a dozen fields, but a push with many commits (each
+with added/removed/modified file lists) can be megabytes of JSON. Instead of
+decoding the whole body to `str` and building the full dict tree,
+extract_fields() walks the request bytes, decodes only the values on the
+requested paths and skips everything else with a regex that jumps from one
+bracket to the next. The result has the same nested shape as the full parse,
+restricted to those paths, so `data.get("sender") or {}` keeps working.
+
+The walk trades CPU for peak memory: it is slower than a full parse with
+jsoncodec.loads at every size (with orjson: 18 vs 4.5 ms at 1 MB, 86 vs
+34 ms at 5 MB), but a 5 MB push peaks at a few KB of allocations instead
+of ~17 MB. Bodies under SELECTIVE_MIN_BYTES, where the full tree is
+small, are therefore parsed in full (see bench/payload_parse.py).
+
+Skipped values are not validated; a body that is not well-formed along the
+walked path raises ValueError, which _safe_json() turns into `{}`.
+"""
+import re
+
+from .. import jsoncodec
+
+# Field paths receiver() reads for each GitHub event type. Numeric segments
+# index into arrays ("commits.0.author" is the first commit's author).
+EVENT_FIELDS = {
+    "ping": ("zen",),
+    "push": (
+        "after",
+        "ref",
+        "head_commit.id",
+        "sender.login",
+        "pusher.login",
+        "pusher.name",
+        "repository.full_name",
+        "repository.owner.login",
+        "repository.pushed_at",
+        "commits.0.author",
+    ),
+    "pull_request": (
+        "action",
+        "number",
+        "pull_request.merged",
+        "pull_request.head.ref",
+        "pull_request.base.ref",
+        "pull_request.user.login",
+        "pull_request.updated_at",
+        "pull_request.merged_at",
+        "sender.login",
+        "repository.full_name",
+        "repository.owner.login",
+    ),
+}
+
+# From this size the full tree costs several MB per request, worth the slower walk
+SELECTIVE_MIN_BYTES = 1024 * 1024
+
+_WS = re.compile(rb"[ \t\n\r]*")
+# Rest of a string after its opening quote, up to and including the closing quote
+_STRING_TAIL = re.compile(rb'[^"\\]*+(?:\\.[^"\\]*+)*+"', re.S)
+# Everything up to the next bracket outside a string; group 1 is that bracket
+_TO_BRACKET = re.compile(rb'[^"\[\]{}]*+(?:"[^"\\]*+(?:\\.[^"\\]*+)*+"[^"\[\]{}]*+)*+([\[\]{}])', re.S)
+_SCALAR = re.compile(rb"[^,\]}\s]+")
+
+_QUOTE, _LBRACE, _RBRACE, _LBRACKET, _RBRACKET = b'"{}[]'
+_COMMA, _COLON = b",:"
+
+_LITERALS = {b"true": True, b"false": False, b"null": None}
+_MISSING = object()
+
+_specs = {}
+
+
+def extract_fields(raw, paths, min_bytes=SELECTIVE_MIN_BYTES):
+    """Return the pruned object containing only `paths` from JSON bytes `raw`."""
+    if len(raw) < min_bytes:
+        return jsoncodec.loads(raw)
+    spec = _specs.get(paths)
+    if spec is None:
+        spec = _specs[paths] = _compile(paths)
+    pos = _WS.match(raw, 0).end()
+    if pos >= len(raw) or raw[pos] != _LBRACE:
+        # Not an object: nothing to select from, parse it whole
+        return jsoncodec.loads(raw)
+    value, pos = _extract(raw, pos, spec)
+    if _WS.match(raw, pos).end() != len(raw):
+        raise ValueError("Extra data after JSON document")
+    return value
+
+
+def _compile(paths):
+    """Turn ("a.b", "a.c", "d") into {"a": {"b": True, "c": True}, "d": True}."""
+    spec = {}
+    for path in paths:
+        node = spec
+        parts = path.split(".")
+        for part in parts[:-1]:
+            child = node.get(part)
+            if child is True:
+                break
+            node = node.setdefault(part, {})
+        else:
+            node[parts[-1]] = True
+    return spec
+
+
+def _extract(buf, pos, spec):
+    """Decode the value at `pos`, keeping only what `spec` asks for. Returns (value, end)."""
+    if spec is True:
+        end = _skip(buf, pos)
+        return _decode(buf, pos, end), end
+    c = buf[pos]
+    if c == _LBRACE:
+        return _extract_object(buf, pos, spec)
+    if c == _LBRACKET:
+        return _extract_array(buf, pos, spec)
+    # Expected a container but found a scalar (e.g. null): return it as-is
+    end = _skip(buf, pos)
+    return _decode(buf, pos, end), end
+
+
+def _decode(buf, start, end):
+    """Decode one JSON value, avoiding jsoncodec.loads() for plain strings and literals."""
+    if buf[start] == _QUOTE:
+        body = buf[start + 1:end - 1]
+        if b"\\" not in body:
+            return body.decode("utf-8")
+    else:
+        value = _LITERALS.get(buf[start:end], _MISSING)
+        if value is not _MISSING:
+            return value
+    return jsoncodec.loads(buf[start:end])
+
+
+def _extract_object(buf, pos, spec):
+    result = {}
+    pos = _WS.match(buf, pos + 1).end()
+    if buf[pos] == _RBRACE:
+        return result, pos + 1
+    while True:
+        if buf[pos] != _QUOTE:
+            raise ValueError("Expected object key at byte %d" % pos)
+        end = _STRING_TAIL.match(buf, pos + 1).end()
+        key_bytes = buf[pos + 1:end - 1]
+        key = jsoncodec.loads(buf[pos:end]) if b"\\" in key_bytes else key_bytes.decode("utf-8")
+        pos = _WS.match(buf, end).end()
+        if buf[pos] != _COLON:
+            raise ValueError("Expected ':' at byte %d" % pos)
+        pos = _WS.match(buf, pos + 1).end()
+        child = spec.get(key)
+        if child is None:
+            pos = _skip(buf, pos)
+        else:
+            result[key], pos = _extract(buf, pos, child)
+        pos = _WS.match(buf, pos).end()
+        c = buf[pos]
+        if c == _RBRACE:
+            return result, pos + 1
+        if c != _COMMA:
+            raise ValueError("Expected ',' or '}' at byte %d" % pos)
+        pos = _WS.match(buf, pos + 1).end()
+
+
+def _extract_array(buf, pos, spec):
+    # Keep the wanted indexes at their positions; elements before them are
+    # placeholders (None), elements after the last wanted index are dropped.
+    wanted = {int(k): v for k, v in spec.items() if k.isdigit()}
+    last = max(wanted) if wanted else -1
+    result = []
+    index = 0
+    pos = _WS.match(buf, pos + 1).end()
+    if buf[pos] == _RBRACKET:
+        return result, pos + 1
+    while True:
+        child = wanted.get(index)
+        if child is None:
+            pos = _skip(buf, pos)
+            if index < last:
+                result.append(None)
+        else:
+            value, pos = _extract(buf, pos, child)
+            result.append(value)
+        index += 1
+        pos = _WS.match(buf, pos).end()
+        c = buf[pos]
+        if c == _RBRACKET:
+            return result, pos + 1
+        if c != _COMMA:
+            raise ValueError("Expected ',' or ']' at byte %d" % pos)
+        pos = _WS.match(buf, pos + 1).end()
+
+
+def _skip(buf, pos):
+    """Return the end offset of the JSON value starting at `pos` without decoding it."""
+    c = buf[pos]
+    if c == _QUOTE:
+        return _STRING_TAIL.match(buf, pos + 1).end()
+    if c != _LBRACE and c != _LBRACKET:
+        return _SCALAR.match(buf, pos).end()
+    depth = 1
+    pos += 1
+    search = _TO_BRACKET.match
+    while True:
+        m = search(buf, pos)
+        if m is None:
+            raise ValueError("Unterminated container")
+        pos = m.end()
+        if buf[pos - 1] in (_LBRACE, _LBRACKET):
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return pos
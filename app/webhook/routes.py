@@ -1,70 +1,33 @@
-import json
 import logging
 from flask import Blueprint, request, jsonify
-from datetime import datetime, timedelta
-from ..extensions import mongo
+from .. import jsoncodec
+from ..extensions import deliveries, write_buffer
+from .normalize import normalize_event, normalize_event_type
+from .payload import EVENT_FIELDS, extract_fields
 
 logger = logging.getLogger(__name__)
 
 webhook = Blueprint('Webhook', __name__, url_prefix='/webhook')
 
 
-def _safe_json():
-    """Parse request body as JSON; never raise. Returns dict."""
+def _safe_json(fields=None):
+    """
+    Parse request body as JSON; never raise. Returns dict.
+
+    With `fields` (a tuple from EVENT_FIELDS), only those paths are decoded,
+    straight from the request bytes (see payload.extract_fields).
+    """
     try:
-        raw = request.get_data(as_text=True) or "{}"
-        return json.loads(raw) if raw.strip() else {}
+        raw = request.get_data()
+        if not raw.strip():
+            return {}
+        if fields is None:
+            return jsoncodec.loads(raw)
+        return extract_fields(raw, fields)
     except Exception:
         return {}
 
 
-def format_timestamp(dt):
-    """Format datetime to '1st April 2021 - 9:30 PM UTC (3:00 AM IST)' format"""
-    def format_single_time(dt_obj):
-        day = dt_obj.day
-        # Handle special cases: 11th, 12th, 13th
-        if 11 <= day <= 13:
-            suffix = "th"
-        elif day % 10 == 1:
-            suffix = "st"
-        elif day % 10 == 2:
-            suffix = "nd"
-        elif day % 10 == 3:
-            suffix = "rd"
-        else:
-            suffix = "th"
-        
-        month_names = ["January", "February", "March", "April", "May", "June",
-                       "July", "August", "September", "October", "November", "December"]
-        
-        hour = dt_obj.hour
-        minute = dt_obj.minute
-        
-        # Convert to 12-hour format
-        if hour == 0:
-            hour_12 = 12
-            am_pm = "AM"
-        elif hour < 12:
-            hour_12 = hour
-            am_pm = "AM"
-        elif hour == 12:
-            hour_12 = 12
-            am_pm = "PM"
-        else:
-            hour_12 = hour - 12
-            am_pm = "PM"
-        
-        return f"{day}{suffix} {month_names[dt_obj.month - 1]} {dt_obj.year} - {hour_12}:{minute:02d} {am_pm}"
-    
-    # Format UTC time
-    utc_str = format_single_time(dt) + " UTC"
-    
-    # Convert to IST (UTC+5:30)
-    ist_dt = dt + timedelta(hours=5, minutes=30)
-    ist_str = format_single_time(ist_dt) + " IST"
-    
-    return f"{utc_str} ({ist_str})"
-
 @webhook.route('/receiver', methods=["POST", "GET"])
 def receiver():
     """
@@ -74,128 +37,40 @@ def receiver():
         if request.method == "GET":
             return jsonify({"message": "Webhook OK", "status": "active"}), 200
 
-        data = _safe_json()
+        # GitHub redelivers the same payload (same delivery ID) on timeouts and manual retries
+        delivery_id = (request.headers.get("X-GitHub-Delivery") or "").strip()
+        if delivery_id and deliveries.seen(delivery_id):
+            return jsonify({"message": "Duplicate delivery", "delivery_id": delivery_id}), 200
+
         event_type = (request.headers.get("X-GitHub-Event") or "").strip()
 
         if event_type.lower() == "ping":
+            data = _safe_json(EVENT_FIELDS["ping"])
             return jsonify({"message": "pong", "zen": data.get("zen", "")}), 200
 
         if not event_type:
             return jsonify({"message": "ok"}), 200
 
-        # Normalize event type: "pull_request", "Pull Request" -> "pull_request"
-        github_event = event_type.lower().replace(" ", "_").replace("-", "_").strip()
-        ts = format_timestamp(datetime.utcnow())
-        event = {
-            "request_id": "",
-            "author": "Unknown",
-            "action": "",
-            "from_branch": "",
-            "to_branch": "",
-            "timestamp": ts,
-        }
-        action = None
-        
+        github_event = normalize_event_type(event_type)
+        if github_event not in EVENT_FIELDS:
+            return jsonify({"message": "ok", "event": github_event}), 200
+
         # Log received event type for debugging (raw header + normalized)
         logger.info(f"Received GitHub event: raw={event_type!r}, normalized={github_event!r}")
 
-        if github_event == "push":
-            action = "PUSH"
-            event["action"] = "PUSH"
-            event["request_id"] = (
-                data.get("after")
-                or (data.get("head_commit") or {}).get("id")
-                or ("push-%s" % ts.replace(" ", "-").replace(":", "-")[:50])
-            )
-            # Comprehensive author extraction - check multiple sources
-            sender = data.get("sender") or {}
-            pusher = data.get("pusher") or {}
-            repository = data.get("repository") or {}
-            repo_owner = repository.get("owner") or {}
-            
-            # Priority: sender.login > pusher.login > pusher.name > repo_owner.login > commits author
-            # Final fallback: always use your GitHub name instead of "Unknown"
-            event["author"] = (
-                sender.get("login")
-                or pusher.get("login")
-                or pusher.get("name")
-                or repo_owner.get("login")
-                or "Lakshmiswayampakula"  # Your GitHub username as fallback
-            )
-            
-            # If still not found, try commits
-            if not event["author"] or event["author"] == "Unknown":
-                commits = data.get("commits") or []
-                if commits:
-                    author = (commits[0] or {}).get("author") or {}
-                    event["author"] = (
-                        author.get("username")
-                        or author.get("name")
-                        or ((author.get("email") or "").split("@")[0])
-                        or "Lakshmiswayampakula"
-                    )
-            
-            # Final fallback: always use your GitHub name
-            if not event["author"] or event["author"] == "Unknown":
-                event["author"] = repo_owner.get("login") or "Lakshmiswayampakula"
-            
-            ref = (data.get("ref") or "").strip()
-            event["to_branch"] = ref.split("/")[-1] if ref else "main"
-
-        elif github_event == "pull_request":
-            pr = data.get("pull_request") or {}
-            pr_action = (data.get("action") or "").lower().strip()
-            # merged can be bool or None; ensure we treat as bool
-            is_merged = bool(pr.get("merged", False))
-            
-            # Log PR event details for debugging
-            logger.info(f"PR event - action: {pr_action}, merged: {is_merged}, pr keys: {list(pr.keys())[:15]}")
-            
-            if pr_action == "closed" and is_merged:
-                action = "MERGE"
-                event["action"] = "MERGE"
-                logger.info("Detected MERGE event from closed PR")
-            elif pr_action in ("opened", "synchronize", "reopened"):
-                action = "PULL_REQUEST"
-                event["action"] = "PULL_REQUEST"
-                logger.info("Detected PULL_REQUEST event")
-            else:
-                logger.info(f"Ignoring PR action: {pr_action}")
-                return jsonify({"message": "ok", "action": pr_action}), 200
-
-            event["request_id"] = str(data.get("number") or "")
-            
-            # Comprehensive author extraction for PR/Merge events
-            sender = data.get("sender") or {}
-            pr_user = pr.get("user") or {}
-            repository = data.get("repository") or {}
-            repo_owner = repository.get("owner") or {}
-            
-            # Always use your GitHub name as fallback instead of "Unknown"
-            event["author"] = (
-                sender.get("login")
-                or pr_user.get("login")
-                or repo_owner.get("login")
-                or "Lakshmiswayampakula"  # Your GitHub username as fallback
-            )
-            
-            event["from_branch"] = (pr.get("head") or {}).get("ref") or ""
-            event["to_branch"] = (pr.get("base") or {}).get("ref") or ""
-
-        else:
-            return jsonify({"message": "ok", "event": github_event}), 200
-
-        if action:
-            event["request_id"] = event["request_id"] or ("%s-%s" % (action.lower(), ts.replace(" ", "-").replace(":", "-")[:30]))
-            # Log what we're storing
-            logger.info(f"Storing event: action={action}, author={event.get('author')}, from_branch={event.get('from_branch')}, to_branch={event.get('to_branch')}")
-            try:
-                mongo.db.events.insert_one(event)
-                logger.info(f"Successfully stored event with action: {action}")
-            except Exception as e:
-                logger.warning("Failed to store webhook event: %s", e)
-        else:
-            logger.warning(f"No action determined for event type: {github_event}")
+        # Decode only the fields this event type needs
+        data = _safe_json(EVENT_FIELDS[github_event])
+        event = normalize_event(github_event, data, delivery_id)
+        if event is None:
+            return jsonify({"message": "ok", "action": (data.get("action") or "").lower().strip()}), 200
+
+        # Log what we're storing
+        logger.info(f"Storing event: action={event['action']}, author={event.get('author')}, from_branch={event.get('from_branch')}, to_branch={event.get('to_branch')}")
+        # Hand a copy to the write buffer: the flush thread adds _id to the document
+        # it stores, while this thread still serializes `event` for the response.
+        write_buffer.submit(dict(event))
+        if delivery_id:
+            deliveries.add(delivery_id)
         return jsonify({"message": "Event stored", "event": event}), 200
 
     except Exception:
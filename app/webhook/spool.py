@@ -0,0 +1,245 @@
+"""
+Durable local spool for webhook events that could not be written to the event store.
+
+Events are appended to segment files under SPOOL_DIR. Each record is a
+length + CRC32 header followed by the BSON-encoded document, so a torn or
+corrupted tail is detected on replay instead of being inserted. Every worker
+appends to its own active segment (`<ms>-<pid>-<seq>.open`); full or replayable
+segments are sealed (`.seg`) and claimed by whichever worker's replayer
+renames them first. The replayer waits for `ping` to succeed and then drains
+segments with bulk writes. Every event is given its `_id` before it is
+spooled, so replaying a segment again after a partial failure only hits
+duplicate keys.
+"""
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+
+import bson
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct(">II")  # payload length, CRC32 of payload
+_OPEN_SUFFIX = ".open"
+_SEALED_SUFFIX = ".seg"
+_CLAIMED_SUFFIX = ".claimed"
+
+
+class Spool:
+    """Append-only segment files plus a background replayer."""
+
+    def __init__(self, get_store, generation=None):
+        self._get_store = get_store
+        self._generation = generation
+        self.directory = None
+        self.segment_bytes = 16 * 1024 * 1024
+        self.fsync_interval = 0.0
+        self.replay_interval = 5.0
+        self.replay_batch = 1000
+        self._lock = threading.Lock()
+        self._file = None
+        self._file_path = None
+        self._seq = 0
+        self._dirty = False
+        self._last_fsync = 0.0
+        self._pid = None
+        self._thread = None
+        self._stats = {"spooled": 0, "replayed": 0, "corrupt_records": 0, "append_failures": 0}
+
+    def init_app(self, app):
+        self.directory = app.config.get("SPOOL_DIR") or os.path.join(app.instance_path, "spool")
+        self.segment_bytes = app.config.get("SPOOL_SEGMENT_BYTES", self.segment_bytes)
+        self.fsync_interval = app.config.get("SPOOL_FSYNC_INTERVAL_MS", 0) / 1000.0
+        self.replay_interval = app.config.get("SPOOL_REPLAY_INTERVAL_MS", 5000) / 1000.0
+        self.replay_batch = app.config.get("SPOOL_REPLAY_BATCH", self.replay_batch)
+        os.makedirs(self.directory, exist_ok=True)
+        app.extensions["spool"] = self
+        # Start the replayer inside each worker, after gunicorn has forked
+        app.before_request(self.ensure_replayer)
+
+    def append(self, docs):
+        """Durably record events that the event store did not accept. Returns True on success."""
+        try:
+            with self._lock:
+                self._open_segment()
+                for doc in docs:
+                    # Breaker-open batches never reached insert_events(), which assigns _id
+                    doc.setdefault("_id", bson.ObjectId())
+                    payload = bson.encode(doc)
+                    self._file.write(_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+                self._file.flush()
+                self._dirty = True
+                # Group fsyncs: one per appended batch, or at most one per interval
+                if time.monotonic() - self._last_fsync >= self.fsync_interval:
+                    self._fsync()
+                if self._file.tell() >= self.segment_bytes:
+                    self._seal()
+                self._stats["spooled"] += len(docs)
+        except Exception as e:
+            self._count("append_failures", len(docs))
+            logger.error("Failed to spool %d webhook event(s), they are lost: %s", len(docs), e)
+            return False
+        self.ensure_replayer()
+        return True
+
+    def pending_segments(self):
+        """Segments (sealed or still being appended) waiting to be replayed."""
+        if not self.directory or not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            name for name in os.listdir(self.directory)
+            if name.endswith((_OPEN_SUFFIX, _SEALED_SUFFIX))
+        )
+
+    def status(self):
+        """Counters for /api/health."""
+        with self._lock:
+            status = dict(self._stats)
+        status["pending_segments"] = len(self.pending_segments())
+        return status
+
+    def ensure_replayer(self):
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None:
+            return
+        with self._lock:
+            if self._pid == pid and self._thread is not None:
+                return
+            if self._pid != pid:
+                # Don't append to (or fsync) a segment opened by the parent process
+                self._file = None
+                self._file_path = None
+            self._pid = pid
+            self._thread = threading.Thread(target=self._run, name="webhook-spool-replayer", daemon=True)
+            self._thread.start()
+
+    def replay(self):
+        """Drain every claimable segment into the event store. Returns the number of events replayed."""
+        with self._lock:
+            if self._file is not None and self._file.tell() > 0:
+                self._seal()
+        self._recover_orphans()
+
+        replayed = 0
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(_SEALED_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            claimed = "%s.%d%s" % (path, os.getpid(), _CLAIMED_SUFFIX)
+            try:
+                os.rename(path, claimed)
+            except OSError:
+                continue  # another worker claimed it first
+            try:
+                replayed += self._replay_segment(claimed)
+            except Exception as e:
+                logger.warning("Spool replay of %s stopped: %s", name, e)
+                os.rename(claimed, path)
+                break
+            os.remove(claimed)
+        if replayed:
+            self._count("replayed", replayed)
+            if self._generation is not None:
+                self._generation.bump()
+            logger.info("Replayed %d spooled webhook event(s)", replayed)
+        return replayed
+
+    def _replay_segment(self, path):
+        batch = []
+        count = 0
+        for doc in self._read_records(path):
+            batch.append(doc)
+            if len(batch) >= self.replay_batch:
+                self._get_store().insert_many(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            self._get_store().insert_many(batch)
+            count += len(batch)
+        return count
+
+    def _read_records(self, path):
+        with open(path, "rb") as f:
+            while True:
+                header = f.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    return
+                length, crc = _HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    # Torn write or corruption: nothing after this point can be trusted
+                    self._count("corrupt_records")
+                    logger.warning("Corrupt record in spool segment %s; skipping the rest", path)
+                    return
+                yield bson.decode(payload)
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self._stats[key] += n
+
+    def _run(self):
+        while True:
+            time.sleep(self.replay_interval)
+            try:
+                with self._lock:
+                    if self._dirty:
+                        self._fsync()
+                if not self.pending_segments():
+                    continue
+                self._get_store().ping()
+            except Exception:
+                continue
+            try:
+                self.replay()
+            except Exception as e:
+                logger.warning("Spool replay failed: %s", e)
+
+    def _open_segment(self):
+        if self._file is not None:
+            return
+        self._seq += 1
+        name = "%d-%d-%06d%s" % (int(time.time() * 1000), os.getpid(), self._seq, _OPEN_SUFFIX)
+        self._file_path = os.path.join(self.directory, name)
+        self._file = open(self._file_path, "ab")
+
+    def _fsync(self):
+        if self._file is not None:
+            os.fsync(self._file.fileno())
+        self._dirty = False
+        self._last_fsync = time.monotonic()
+
+    def _seal(self):
+        self._fsync()
+        self._file.close()
+        os.rename(self._file_path, self._file_path[: -len(_OPEN_SUFFIX)] + _SEALED_SUFFIX)
+        self._file = None
+        self._file_path = None
+
+    def _recover_orphans(self):
+        """Seal segments left behind by workers that are no longer running."""
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if name.endswith(_OPEN_SUFFIX):
+                    pid = int(name.split("-")[1])
+                    if pid != os.getpid() and not _pid_alive(pid):
+                        os.rename(path, path[: -len(_OPEN_SUFFIX)] + _SEALED_SUFFIX)
+                elif name.endswith(_CLAIMED_SUFFIX):
+                    unclaimed, pid = path[: -len(_CLAIMED_SUFFIX)].rsplit(".", 1)
+                    if int(pid) != os.getpid() and not _pid_alive(int(pid)):
+                        os.rename(path, unclaimed)
+            except (OSError, ValueError, IndexError):
+                continue  # renamed by another worker, or not one of our files
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
@@ -0,0 +1,74 @@
+"""
+Bulk write helpers shared by the write buffer and the spool replayer.
+"""
+import logging
+from collections import namedtuple
+
+from bson import ObjectId
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from ..rollups import apply_rollups
+
+logger = logging.getLogger(__name__)
+
+# MongoDB error code for a duplicate key (e.g. an _id that was already stored)
+DUPLICATE_KEY = 11000
+
+InsertResult = namedtuple("InsertResult", ["inserted", "duplicates"])
+
+
+def insert_events(collection, docs, rollups=True):
+    """
+    Write events in one unordered bulk_write and report new vs duplicate docs.
+
+    Events carrying a `delivery_id` are upserted with $setOnInsert keyed on
+    it, so a GitHub redelivery matches the stored document instead of adding
+    a second one. Duplicate-key errors (a retried batch, a replayed spool
+    segment, two workers racing on the same delivery) mean the document is
+    already stored. Other per-document write errors are logged and dropped,
+    since retrying them would fail the same way. Connection errors and
+    timeouts propagate so the caller can spool the batch.
+
+    Documents that were actually inserted are counted into the rollups
+    (unless `rollups` is false), so duplicates never inflate the statistics.
+    """
+    if not docs:
+        return InsertResult(0, 0)
+
+    requests = []
+    for doc in docs:
+        # Assign _id up front so a spooled copy of a half-applied batch replays idempotently
+        doc.setdefault("_id", ObjectId())
+        delivery_id = doc.get("delivery_id")
+        if delivery_id:
+            fields = {k: v for k, v in doc.items() if k != "delivery_id"}
+            requests.append(UpdateOne({"delivery_id": delivery_id}, {"$setOnInsert": fields}, upsert=True))
+        else:
+            requests.append(InsertOne(doc))
+
+    inserts = [i for i, op in enumerate(requests) if isinstance(op, InsertOne)]
+    try:
+        result = collection.bulk_write(requests, ordered=False)
+    except BulkWriteError as e:
+        details = e.details or {}
+        errors = details.get("writeErrors") or []
+        duplicates = 0
+        for err in errors:
+            if err.get("code") == DUPLICATE_KEY:
+                duplicates += 1
+            else:
+                logger.warning("Dropping webhook event rejected by MongoDB: %s", err.get("errmsg"))
+        if rollups:
+            failed = {err.get("index") for err in errors}
+            new = [i for i in inserts if i not in failed]
+            new += [u["index"] for u in details.get("upserted") or []]
+            apply_rollups(collection.database, [docs[i] for i in new])
+        return InsertResult(
+            details.get("nInserted", 0) + details.get("nUpserted", 0),
+            details.get("nMatched", 0) + duplicates,
+        )
+    if rollups:
+        new = inserts + list(result.upserted_ids or {})
+        apply_rollups(collection.database, [docs[i] for i in new])
+    return InsertResult(result.inserted_count + result.upserted_count, result.matched_count)
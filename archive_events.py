@@ -0,0 +1,72 @@
+"""
+Move events received more than N days ago to the events_archive collection.
+
+Keeps the hot `events` collection (and its indexes) the size of the
+retention window. Archived events are still exported by
+/api/events/export and export_events.py. Safe to interrupt and re-run;
+schedule it daily (cron, Render cron job).
+
+    python archive_events.py [--days 90] [--batch-size 1000] [--dry-run]
+"""
+import argparse
+import sys
+import time
+
+from app import create_app
+from app.archive import archive_batch, archive_cutoff, ensure_archive
+from app.extensions import generation, partitions, store
+from app.partitions import partition_bounds
+
+
+def archive(days, batch_size, dry_run=False):
+    db = partitions.db
+    cutoff = archive_cutoff(days)
+    old = {"_id": {"$lt": cutoff}}
+    print(f"Archiving events received before {cutoff.generation_time:%Y-%m-%d %H:%M} UTC ({days} days)")
+    if dry_run:
+        count = sum(c.count_documents(old) for c in partitions.route(old))
+        print(f"Dry run: {count} events would be archived.")
+        return 0
+
+    ensure_archive(db)
+    moved = 0
+    started = time.perf_counter()
+    for collection in partitions.route(old, ascending=True):
+        while True:
+            n = archive_batch(db, cutoff, batch_size, collection)
+            if not n:
+                break
+            moved += n
+            print(f"  {moved} events archived ({collection.name})")
+        bounds = partition_bounds(collection.name)
+        if bounds is not None and bounds[1] <= cutoff and collection.estimated_document_count() == 0:
+            # A month that is entirely archived: drop the empty partition and its indexes
+            collection.drop()
+            print(f"  dropped {collection.name}")
+    if moved:
+        # Cached /api/events pages may still list archived events
+        generation.bump()
+    print(f"\nDone: {moved} events archived in {time.perf_counter() - started:.1f}s.")
+    return moved
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move old webhook events to events_archive.")
+    parser.add_argument("--days", type=int, default=None, help="archive events older than this (default: EVENT_ARCHIVE_DAYS)")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="only count the events that would be archived")
+    args = parser.parse_args()
+
+    app = create_app()
+    if store.db is None:
+        sys.exit("archive_events.py needs a MongoDB event store (EVENT_STORE_URI=mongodb://...)")
+    with app.app_context():
+        days = args.days if args.days is not None else app.config["EVENT_ARCHIVE_DAYS"]
+        try:
+            archive(max(0, days), max(1, args.batch_size), args.dry_run)
+        except Exception as e:
+            print(f"Error: {e}")
+
+
+if __name__ == "__main__":
+    main()
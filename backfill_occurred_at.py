@@ -0,0 +1,82 @@
+"""
+Backfill native `occurred_at` / `received_at` datetimes on older events.
+
+Older documents only carry the display string in `timestamp`. This parses it
+back into a UTC datetime (falling back to the ObjectId creation time) and
+writes both fields in batches. Progress is checkpointed in the `migrations`
+collection, so an interrupted run resumes where it stopped.
+
+    python backfill_occurred_at.py [--batch-size 1000] [--restart]
+"""
+import argparse
+import sys
+
+from pymongo import UpdateOne
+
+from app import create_app
+from app.extensions import mongo, store
+from app.timefmt import parse_timestamp
+
+CHECKPOINT_ID = "backfill_occurred_at"
+
+
+def backfill(batch_size=1000, restart=False):
+    """Run the backfill; returns the number of documents updated."""
+    migrations = mongo.db.migrations
+    if restart:
+        migrations.delete_one({"_id": CHECKPOINT_ID})
+    checkpoint = migrations.find_one({"_id": CHECKPOINT_ID}) or {}
+    last_id = checkpoint.get("last_id")
+
+    updated = 0
+    while True:
+        query = {"occurred_at": {"$exists": False}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = list(
+            mongo.db.events.find(query, {"timestamp": 1}).sort("_id", 1).limit(batch_size)
+        )
+        if not batch:
+            break
+
+        requests = []
+        for doc in batch:
+            # ObjectIds embed their creation time: the moment the receiver stored the event
+            received_at = doc["_id"].generation_time.replace(tzinfo=None)
+            occurred_at = parse_timestamp(doc.get("timestamp")) or received_at
+            requests.append(UpdateOne(
+                {"_id": doc["_id"]},
+                {"$set": {"occurred_at": occurred_at, "received_at": received_at}},
+            ))
+        mongo.db.events.bulk_write(requests, ordered=False)
+
+        updated += len(requests)
+        last_id = batch[-1]["_id"]
+        migrations.update_one(
+            {"_id": CHECKPOINT_ID},
+            {"$set": {"last_id": last_id}, "$inc": {"updated": len(requests)}},
+            upsert=True,
+        )
+        print(f"  updated {updated} events (up to _id {last_id})")
+    return updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill occurred_at/received_at on older events.")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--restart", action="store_true", help="ignore the saved checkpoint")
+    args = parser.parse_args()
+
+    app = create_app()
+    if store.db is None:
+        sys.exit("backfill_occurred_at.py needs a MongoDB event store (EVENT_STORE_URI=mongodb://...)")
+    with app.app_context():
+        try:
+            total = backfill(args.batch_size, args.restart)
+            print(f"\nDone: {total} events backfilled.")
+        except Exception as e:
+            print(f"Error: {e}")
+
+
+if __name__ == "__main__":
+    main()
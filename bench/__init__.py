@@ -0,0 +1,5 @@
+"""
+Benchmarks for the webhook receiver and events API.
+
+Run a benchmark module directly, e.g. `python -m bench.payload_parse`.
+"""
@@ -0,0 +1,60 @@
+"""
+Serialization throughput of the event export (rows/s per format).
+
+Measures the part of GET /api/events/export that runs in the app: turning
+batches of stored documents into NDJSON or CSV chunks. MongoDB reads are
+not included.
+
+    python -m bench.export [--rows N] [--batch-size N]
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from app import jsoncodec
+from app.export import export_chunks
+
+
+def make_docs(count):
+    """Stored event documents shaped like the receiver's output."""
+    start = datetime(2024, 1, 1)
+    timestamp = "1st April 2021 - 9:30 PM UTC (2nd April 2021 - 3:00 AM IST)"
+    return [
+        {
+            "_id": ObjectId(),
+            "delivery_id": "%032x" % i,
+            "request_id": "%040x" % i,
+            "action": "PUSH",
+            "author": "octocat",
+            "from_branch": "",
+            "to_branch": "main",
+            "repository": "octo/repo",
+            "occurred_at": start + timedelta(seconds=i),
+            "received_at": start + timedelta(seconds=i),
+            "timestamp": timestamp,
+            "message": "Lakshmiswayampakula pushed to main on %s" % timestamp,
+        }
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    docs = make_docs(args.rows)
+    batches = [docs[i:i + args.batch_size] for i in range(0, len(docs), args.batch_size)]
+    print("JSON backend: %s" % jsoncodec.BACKEND)
+    for fmt in ("ndjson", "csv"):
+        start = time.perf_counter()
+        size = sum(len(chunk) for chunk, _, _ in export_chunks(iter(batches), fmt))
+        elapsed = time.perf_counter() - start
+        print("%-8s %10.0f rows/s  %6.1f MB" % (fmt, args.rows / elapsed, size / 1e6))
+
+
+if __name__ == "__main__":
+    main()
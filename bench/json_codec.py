@@ -0,0 +1,52 @@
+"""
+Serialize a dashboard page (100 formatted events) with each JSON backend.
+
+    python -m bench.json_codec [--number N]
+"""
+import argparse
+import json
+import timeit
+
+from bson import json_util
+
+from app import jsoncodec
+
+
+def make_page(count=100):
+    """A page shaped like GET /api/events output."""
+    timestamp = "1st April 2021 - 9:30 PM UTC (2nd April 2021 - 3:00 AM IST)"
+    return [
+        {
+            "message": "Lakshmiswayampakula pushed to main on %s" % timestamp,
+            "timestamp": timestamp,
+            "action": "PUSH",
+            "author": "Lakshmiswayampakula",
+            "request_id": "%040x" % i,
+            "from_branch": "",
+            "to_branch": "main",
+        }
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=2000, help="serializations per backend")
+    args = parser.parse_args()
+
+    page = make_page()
+    cases = [
+        ("bson.json_util (Flask-PyMongo)", lambda: json_util.dumps(page)),
+        ("stdlib json", lambda: json.dumps(page, separators=(",", ":"), ensure_ascii=False)),
+    ]
+    if jsoncodec.orjson is not None:
+        cases.append(("orjson", lambda: jsoncodec.orjson.dumps(page)))
+    cases.append(("jsoncodec (%s)" % jsoncodec.BACKEND, lambda: jsoncodec.dumps_bytes(page)))
+
+    for label, func in cases:
+        seconds = timeit.timeit(func, number=args.number)
+        print("%-32s %8.1f us/page" % (label, seconds / args.number * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+"""
+End-to-end load test of the webhook receiver and the events API.
+
+Sends synthetic deliveries (bench/payloads.py) to POST /webhook/receiver and
+then reads GET /api/events: the newest page, and filtered pages with a
+`before` cursor that miss the response cache. Each scenario reports requests
+per second and p50/p95/p99 latency, for two targets:
+
+- client: the Flask test client in this process (no network, no gunicorn);
+- gunicorn: `gunicorn run:app` on a free local port (gunicorn.conf.py
+  settings), with the load sent over keep-alive HTTP connections.
+
+By default the app stores events in a throwaway store instead of MongoDB:
+memory:// for the test client, and one SQLite file for gunicorn so that all
+workers share it. Pass --store to use another EVENT_STORE_URI.
+
+    python -m bench.load [--target client|gunicorn|both] [--requests N] [--json results.json]
+    python -m bench.load --baseline main.json --max-slowdown 0.2   # exit 1 on regression
+    python -m bench.load --results new.json --baseline main.json   # compare two saved runs
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+
+from bench.payloads import AUTHORS, deliveries
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = ("receiver", "events", "events_filtered")
+
+# Slower than this fraction (fewer requests/s, or higher p95) counts as a regression
+DEFAULT_MAX_SLOWDOWN = 0.2
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def requests_for(scenario, count, seed=0):
+    """(method, path, body, headers) tuples for one scenario."""
+    if scenario == "receiver":
+        return [
+            ("POST", "/webhook/receiver", body,
+             {"Content-Type": "application/json", "X-GitHub-Event": event, "X-GitHub-Delivery": delivery_id})
+            for event, body, delivery_id in deliveries(count, seed)
+        ]
+    if scenario == "events":
+        return [("GET", "/api/events", None, {})] * count
+    # A fresh `before` cursor per request: every query string is new, so each one runs a query
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    out = []
+    for _ in range(count):
+        cursor = ObjectId.from_datetime(now - timedelta(seconds=rng.uniform(0, 60)))
+        path = "/api/events?limit=50&before=%s" % cursor
+        if rng.random() < 0.5:
+            path += "&author=%s" % rng.choice(AUTHORS)
+        if rng.random() < 0.3:
+            path += "&action=%s" % rng.choice(["PUSH", "PULL_REQUEST", "MERGE"])
+        out.append(("GET", path, None, {}))
+    return out
+
+
+def run_scenario(send, requests, concurrency=1, warmup=0):
+    """
+    Send `requests` from `concurrency` threads; returns a result dict.
+
+    `send(request)` performs one request and returns the HTTP status. The
+    first `warmup` requests are sent (sequentially) but not measured.
+    """
+    for request in requests[:warmup]:
+        send(request)
+    requests = requests[warmup:]
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    pending = iter(requests)
+
+    def worker():
+        mine = []
+        failed = 0
+        while True:
+            with lock:
+                request = next(pending, None)
+            if request is None:
+                break
+            start = time.perf_counter()
+            try:
+                status = send(request)
+            except Exception:
+                status = None
+            mine.append(time.perf_counter() - start)
+            if status is None or status >= 400:
+                failed += 1
+        with lock:
+            latencies.extend(mine)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=worker) for _ in range(max(1, concurrency))]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000.0, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000.0, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000.0, 3),
+        "max_ms": round(latencies[-1] * 1000.0, 3) if latencies else 0.0,
+    }
+
+
+def _store_env(directory, store):
+    """Environment for an app instance that keeps all its files in `directory`."""
+    return {
+        "EVENT_STORE_URI": store,
+        "SPOOL_DIR": os.path.join(directory, "spool"),
+        "GENERATION_FILE": os.path.join(directory, "events.generation"),
+    }
+
+
+def client_sender(env):
+    """send() for the Flask test client, and a function that flushes buffered writes."""
+    os.environ.update(env)
+    from app import create_app
+    from app.extensions import write_buffer
+
+    app = create_app()
+    local = threading.local()
+
+    def send(request):
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = app.test_client()
+        method, path, body, headers = request
+        return client.open(path, method=method, data=body, headers=headers).status_code
+
+    return send, write_buffer.close
+
+
+def http_sender(port):
+    """send() over one keep-alive connection per thread."""
+    local = threading.local()
+
+    def send(request):
+        method, path, body, headers = request
+        conn = getattr(local, "conn", None)
+        reused = conn is not None
+        if conn is None:
+            conn = local.conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            local.conn = None
+            if reused:
+                # The server closed the idle keep-alive connection: retry once on a new one
+                return send(request)
+            raise
+        return response.status
+
+    return send
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def gunicorn_server(env, workers=2, threads=None, startup_timeout=30.0):
+    """Run `gunicorn run:app` on a free port for the duration of the block; yields the port."""
+    port = _free_port()
+    cmd = [sys.executable, "-m", "gunicorn", "run:app", "--bind", "127.0.0.1:%d" % port,
+           "--workers", str(workers), "--log-level", "warning"]
+    if threads:
+        cmd += ["--threads", str(threads)]
+    proc = subprocess.Popen(cmd, cwd=PROJECT_ROOT, env=dict(os.environ, **env))
+    try:
+        deadline = time.monotonic() + startup_timeout
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError("gunicorn exited with status %d" % proc.returncode)
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+                conn.request("GET", "/api/health")
+                conn.getresponse().read()
+                conn.close()
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError("gunicorn did not start within %.0fs" % startup_timeout)
+                time.sleep(0.2)
+        yield port
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(15)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+
+def run_target(target, count, concurrency, warmup, store=None, workers=2, threads=None, seed=0):
+    """Run every scenario against one target; returns a list of result dicts."""
+    directory = tempfile.mkdtemp(prefix="webhook-bench-")
+    try:
+        if store is None:
+            store = "memory://" if target == "client" else "sqlite:///%s" % os.path.join(directory, "events.db")
+        env = _store_env(directory, store)
+        if target == "client":
+            send, flush = client_sender(env)
+            return _run_scenarios(target, send, flush, count, concurrency, warmup, seed)
+        with gunicorn_server(env, workers, threads) as port:
+            # Buffered writes reach the store within WRITE_BUFFER_MAX_DELAY_MS
+            return _run_scenarios(target, http_sender(port), lambda: time.sleep(0.5), count, concurrency, warmup, seed)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def _run_scenarios(target, send, flush, count, concurrency, warmup, seed):
+    results = []
+    for scenario in SCENARIOS:
+        result = run_scenario(send, requests_for(scenario, count + warmup, seed), concurrency, warmup)
+        result.update({"target": target, "scenario": scenario})
+        results.append(result)
+        if scenario == "receiver":
+            # The read scenarios should see what was just written
+            flush()
+    return results
+
+
+def compare(baseline, results, max_slowdown=DEFAULT_MAX_SLOWDOWN):
+    """
+    Rows comparing `results` with `baseline` (both lists of result dicts).
+
+    A scenario regresses when its requests/s fell, or its p95 latency rose,
+    by more than `max_slowdown` (a fraction).
+    """
+    before = {(r["target"], r["scenario"]): r for r in baseline}
+    rows = []
+    for r in results:
+        old = before.get((r["target"], r["scenario"]))
+        if old is None:
+            continue
+        rps_change = (r["rps"] - old["rps"]) / old["rps"] if old["rps"] else 0.0
+        p95_change = (r["p95_ms"] - old["p95_ms"]) / old["p95_ms"] if old["p95_ms"] else 0.0
+        rows.append({
+            "target": r["target"],
+            "scenario": r["scenario"],
+            "rps_change": round(rps_change, 3),
+            "p95_change": round(p95_change, 3),
+            "regressed": rps_change < -max_slowdown or p95_change > max_slowdown,
+        })
+    return rows
+
+
+def _print_results(results):
+    print("%-9s %-16s %8s %7s %10s %9s %9s %9s" % (
+        "target", "scenario", "requests", "errors", "req/s", "p50 ms", "p95 ms", "p99 ms"))
+    for r in results:
+        print("%-9s %-16s %8d %7d %10.1f %9.3f %9.3f %9.3f" % (
+            r["target"], r["scenario"], r["requests"], r["errors"], r["rps"], r["p50_ms"], r["p95_ms"], r["p99_ms"]))
+
+
+def _print_comparison(rows, max_slowdown):
+    print("\nAgainst the baseline (regression: req/s or p95 worse by more than %d%%):" % round(max_slowdown * 100))
+    for row in rows:
+        print("%-9s %-16s req/s %+7.1f%%  p95 %+7.1f%%  %s" % (
+            row["target"], row["scenario"], row["rps_change"] * 100, row["p95_change"] * 100,
+            "REGRESSED" if row["regressed"] else "ok"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--target", choices=("client", "gunicorn", "both"), default="both")
+    parser.add_argument("--requests", type=int, default=2000, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=100, help="unmeasured requests before each scenario")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="client threads (default 1 for the test client, 16 for gunicorn)")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers")
+    parser.add_argument("--threads", type=int, default=None, help="gunicorn threads per worker (default from gunicorn.conf.py)")
+    parser.add_argument("--store", help="EVENT_STORE_URI for the app (default: memory:// or a temporary SQLite file)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--results", help="compare this saved run instead of running the benchmark")
+    parser.add_argument("--baseline", help="saved run to compare against; exit 1 on a regression")
+    parser.add_argument("--max-slowdown", type=float, default=DEFAULT_MAX_SLOWDOWN,
+                        help="allowed req/s drop or p95 rise, as a fraction (default 0.2)")
+    args = parser.parse_args()
+
+    if args.results:
+        with open(args.results) as f:
+            results = json.load(f)["results"]
+    else:
+        targets = ("client", "gunicorn") if args.target == "both" else (args.target,)
+        results = []
+        for target in targets:
+            concurrency = args.concurrency or (1 if target == "client" else 16)
+            results += run_target(target, args.requests, concurrency, args.warmup, args.store,
+                                  args.workers, args.threads, args.seed)
+    _print_results(results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "benchmark": "load",
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "results": results,
+            }, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            rows = compare(json.load(f)["results"], results, args.max_slowdown)
+        _print_comparison(rows, args.max_slowdown)
+        if any(row["regressed"] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
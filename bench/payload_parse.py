@@ -0,0 +1,131 @@
+"""
+Compare full JSON parsing with selective field extraction on push payloads.
+
+The full path is what receiver() does below SELECTIVE_MIN_BYTES:
+jsoncodec.loads() on the raw bytes (orjson when installed, else the stdlib;
+the backend is printed). The selective path is payload.extract_fields() with
+the push field list, forced on for every size. Expect the selective path to
+be slower at every size and to win only on peak memory.
+
+    python -m bench.payload_parse [--repeat N] [--json results.json]
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+from app import jsoncodec
+from app.webhook.payload import EVENT_FIELDS, extract_fields
+
+SIZES = [
+    ("1 KB", 1024),
+    ("100 KB", 100 * 1024),
+    ("300 KB", 300 * 1024),
+    ("1 MB", 1024 * 1024),
+    ("5 MB", 5 * 1024 * 1024),
+]
+
+
+def make_push_payload(target_bytes):
+    """Build a push payload (as JSON bytes) of roughly `target_bytes`."""
+    def commit(i, files):
+        return {
+            "id": "%040x" % i,
+            "tree_id": "%040x" % (i + 1),
+            "message": "Fix \"edge case\" in parser [#%d]\n\nDetails {...}" % i,
+            "timestamp": "2024-03-01T10:15:00+05:30",
+            "url": "https://github.com/octo/repo/commit/%040x" % i,
+            "author": {"name": "Octo Cat", "email": "octo@example.com", "username": "octocat"},
+            "committer": {"name": "GitHub", "email": "noreply@github.com", "username": "web-flow"},
+            "added": ["src/module_%d/file_%d.py" % (i, j) for j in range(files)],
+            "removed": [],
+            "modified": ["docs/page_%d.md" % j for j in range(files)],
+        }
+
+    payload = {
+        "ref": "refs/heads/main",
+        "before": "0" * 40,
+        "after": "a" * 40,
+        "repository": {"id": 1, "name": "repo", "full_name": "octo/repo",
+                       "owner": {"login": "octo", "id": 2}, "private": False},
+        "pusher": {"name": "octocat", "email": "octo@example.com"},
+        "sender": {"login": "octocat", "id": 3},
+        "created": False,
+        "deleted": False,
+        "forced": False,
+        "commits": [],
+        "head_commit": None,
+    }
+    raw = json.dumps(payload).encode()
+    i = 0
+    while len(raw) < target_bytes:
+        # Grow quickly for big targets, one small commit at a time for small ones
+        files = 1 if target_bytes < 10 * 1024 else 20
+        batch = max(1, (target_bytes - len(raw)) // (len(json.dumps(commit(0, files))) * 2))
+        payload["commits"].extend(commit(i + k, files) for k in range(batch))
+        i += batch
+        payload["head_commit"] = payload["commits"][-1]
+        raw = json.dumps(payload).encode()
+    return raw
+
+
+def _full_parse(raw):
+    return jsoncodec.loads(raw)
+
+
+def _selective_parse(raw):
+    return extract_fields(raw, EVENT_FIELDS["push"], min_bytes=0)
+
+
+def _measure(func, raw, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(raw)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    result = func(raw)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return best * 1000.0, peak
+
+
+def run(repeat=5):
+    rows = []
+    for label, size in SIZES:
+        raw = make_push_payload(size)
+        full_ms, full_peak = _measure(_full_parse, raw, repeat)
+        sel_ms, sel_peak = _measure(_selective_parse, raw, repeat)
+        rows.append({
+            "payload": label,
+            "bytes": len(raw),
+            "full_ms": round(full_ms, 3),
+            "full_peak_bytes": full_peak,
+            "selective_ms": round(sel_ms, 3),
+            "selective_peak_bytes": sel_peak,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="timing runs per case (best is kept)")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    rows = run(args.repeat)
+    print(f"Full parse: jsoncodec.loads ({jsoncodec.BACKEND})\n")
+    print("%-8s %10s %12s %14s %12s %14s" % (
+        "payload", "bytes", "full ms", "full peak", "select ms", "select peak"))
+    for r in rows:
+        print("%-8s %10d %12.3f %14d %12.3f %14d" % (
+            r["payload"], r["bytes"], r["full_ms"], r["full_peak_bytes"],
+            r["selective_ms"], r["selective_peak_bytes"]))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "payload_parse", "backend": jsoncodec.BACKEND, "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
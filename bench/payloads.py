@@ -0,0 +1,178 @@
+"""
+Synthetic GitHub webhook deliveries for the load benchmark.
+
+Payloads have the shape of real deliveries (full repository, sender and
+commit objects), so request sizes and parsing costs are realistic. Pushes
+carry 1 to 500 commits, mostly small. Pull requests are opened, synchronized
+or closed-and-merged. Ping and event types the receiver ignores are mixed in too.
+Generation is seeded, so two runs send the same bytes.
+"""
+import json
+import random
+import uuid
+
+# (kind, weight) of each delivery in the default mix
+DEFAULT_MIX = (
+    ("push", 50),
+    ("pull_request.opened", 12),
+    ("pull_request.synchronize", 15),
+    ("pull_request.closed_merged", 8),
+    ("ping", 5),
+    ("unknown", 10),
+)
+
+MAX_COMMITS = 500
+
+AUTHORS = ["octocat", "hubot", "monalisa", "defunkt", "mojombo", "pjhyett", "wycats", "tenderlove"]
+REPOSITORIES = ["octo/api", "octo/web", "octo/infra", "hub/cli", "hub/docs"]
+BRANCHES = ["main", "develop", "release", "feature/login", "feature/search", "fix/timeout"]
+
+# Event types the receiver acknowledges without storing anything
+UNKNOWN_EVENTS = ["issues", "star", "watch", "issue_comment", "check_run"]
+
+
+def _user(login, i=1):
+    return {
+        "login": login,
+        "id": 1000 + i,
+        "node_id": "MDQ6VXNlcj%d" % i,
+        "avatar_url": "https://avatars.githubusercontent.com/u/%d?v=4" % i,
+        "url": "https://api.github.com/users/%s" % login,
+        "html_url": "https://github.com/%s" % login,
+        "type": "User",
+        "site_admin": False,
+    }
+
+
+def _repository(rng, full_name):
+    owner, name = full_name.split("/")
+    return {
+        "id": rng.randrange(10 ** 8),
+        "node_id": "R_kgDO%08d" % rng.randrange(10 ** 8),
+        "name": name,
+        "full_name": full_name,
+        "private": False,
+        "owner": _user(owner),
+        "html_url": "https://github.com/%s" % full_name,
+        "description": "Synthetic repository for load tests",
+        "fork": False,
+        "created_at": 1600000000,
+        "updated_at": "2024-05-01T09:00:00Z",
+        "pushed_at": 1714554000 + rng.randrange(86400),
+        "default_branch": "main",
+        "stargazers_count": rng.randrange(5000),
+        "open_issues_count": rng.randrange(200),
+        "topics": ["webhooks", "flask", "mongodb"],
+    }
+
+
+def _commit(rng, author, i):
+    sha = "%040x" % rng.getrandbits(160)
+    return {
+        "id": sha,
+        "tree_id": "%040x" % rng.getrandbits(160),
+        "distinct": True,
+        "message": "Change %d: update handler and tests\n\nRefs #%d" % (i, rng.randrange(1000)),
+        "timestamp": "2024-05-01T10:%02d:%02d+05:30" % (i % 60, rng.randrange(60)),
+        "url": "https://github.com/octo/api/commit/%s" % sha,
+        "author": {"name": author.title(), "email": "%s@example.com" % author, "username": author},
+        "committer": {"name": "GitHub", "email": "noreply@github.com", "username": "web-flow"},
+        "added": ["src/module_%d.py" % rng.randrange(100) for _ in range(rng.randrange(3))],
+        "removed": [],
+        "modified": ["src/handler_%d.py" % rng.randrange(100) for _ in range(1 + rng.randrange(4))],
+    }
+
+
+def commit_count(rng):
+    """Commits in one push: usually a handful, occasionally up to MAX_COMMITS."""
+    roll = rng.random()
+    if roll < 0.7:
+        return rng.randint(1, 3)
+    if roll < 0.95:
+        return rng.randint(4, 50)
+    return rng.randint(51, MAX_COMMITS)
+
+
+def push_payload(rng, commits=None):
+    author = rng.choice(AUTHORS)
+    repo = _repository(rng, rng.choice(REPOSITORIES))
+    items = [_commit(rng, author, i) for i in range(commits or commit_count(rng))]
+    return {
+        "ref": "refs/heads/%s" % rng.choice(BRANCHES),
+        "before": "%040x" % rng.getrandbits(160),
+        "after": items[-1]["id"],
+        "repository": repo,
+        "pusher": {"name": author, "email": "%s@example.com" % author},
+        "sender": _user(author),
+        "created": False,
+        "deleted": False,
+        "forced": False,
+        "compare": "https://github.com/%s/compare/abc...def" % repo["full_name"],
+        "commits": items,
+        "head_commit": items[-1],
+    }
+
+
+def pull_request_payload(rng, action, merged=False):
+    author = rng.choice(AUTHORS)
+    repo = _repository(rng, rng.choice(REPOSITORIES))
+    number = rng.randrange(1, 5000)
+    head, base = rng.sample(BRANCHES, 2)
+    return {
+        "action": action,
+        "number": number,
+        "pull_request": {
+            "url": "https://api.github.com/repos/%s/pulls/%d" % (repo["full_name"], number),
+            "id": rng.randrange(10 ** 9),
+            "number": number,
+            "state": "closed" if action == "closed" else "open",
+            "title": "Improve request handling (#%d)" % number,
+            "user": _user(author),
+            "body": "This change reworks the handler.\n\n" + "- item\n" * rng.randrange(1, 20),
+            "created_at": "2024-05-01T08:00:00Z",
+            "updated_at": "2024-05-01T10:%02d:00Z" % rng.randrange(60),
+            "closed_at": "2024-05-01T11:00:00Z" if action == "closed" else None,
+            "merged_at": "2024-05-01T11:00:00Z" if merged else None,
+            "merged": merged,
+            "head": {"label": "%s:%s" % (author, head), "ref": head, "sha": "%040x" % rng.getrandbits(160),
+                     "user": _user(author), "repo": repo},
+            "base": {"label": "octo:%s" % base, "ref": base, "sha": "%040x" % rng.getrandbits(160),
+                     "user": _user("octo"), "repo": repo},
+            "commits": rng.randrange(1, 30),
+            "additions": rng.randrange(2000),
+            "deletions": rng.randrange(2000),
+            "changed_files": rng.randrange(1, 50),
+        },
+        "repository": repo,
+        "sender": _user(author),
+    }
+
+
+def delivery(rng, kind):
+    """(X-GitHub-Event, JSON body bytes) for one delivery of `kind` (see DEFAULT_MIX)."""
+    if kind == "push":
+        return "push", json.dumps(push_payload(rng)).encode()
+    if kind.startswith("pull_request."):
+        action = kind.split(".", 1)[1]
+        if action == "closed_merged":
+            return "pull_request", json.dumps(pull_request_payload(rng, "closed", merged=True)).encode()
+        return "pull_request", json.dumps(pull_request_payload(rng, action)).encode()
+    if kind == "ping":
+        return "ping", json.dumps({"zen": "Design for failure.", "hook_id": rng.randrange(10 ** 6)}).encode()
+    repo = _repository(rng, rng.choice(REPOSITORIES))
+    return rng.choice(UNKNOWN_EVENTS), json.dumps({"action": "created", "repository": repo,
+                                                   "sender": _user(rng.choice(AUTHORS))}).encode()
+
+
+def deliveries(count, seed=0, mix=DEFAULT_MIX, distinct=200):
+    """
+    `count` deliveries as (event, body, delivery_id) tuples.
+
+    At most `distinct` bodies are generated and reused; every delivery gets
+    its own X-GitHub-Delivery ID, so none is skipped as a redelivery.
+    """
+    rng = random.Random(seed)
+    kinds = [kind for kind, _ in mix]
+    weights = [weight for _, weight in mix]
+    pool = [delivery(rng, kind) for kind in rng.choices(kinds, weights, k=min(count, distinct))]
+    return [pool[i % len(pool)] + (str(uuid.UUID(int=rng.getrandbits(128))),) for i in range(count)]
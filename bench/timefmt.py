@@ -0,0 +1,362 @@
+"""
+Timestamp rendering: app/timefmt.py against the implementation it replaced.
+
+The legacy functions below are verbatim copies of the previous versions,
+which rebuilt the month list and suffix logic on every call. Each case
+renders one /api/events page of 100 timestamps, the way the API does on
+every poll: from `received_at` datetimes, from legacy strings
+(ensure_ist_in_timestamp), and a mixed page through display_timestamps(),
+with IST alone and with three display zones. "warm" reuses the same page
+(as repeated polls do); "cold" renders pages of timestamps no other page
+shares, with the caches cleared before every page, as a worker does for
+events it has not rendered before. Legacy and current code are timed in
+turn, so machine noise affects both alike.
+
+First the output of both implementations is compared on every 7th minute
+of 2024 and on malformed strings, and the zoneinfo rendering is checked
+against a table of DST and offset edge cases (TIMEZONE_CASES). The run
+fails if anything differs, if a warm case is less than --min-speedup times
+faster, if a cold single-zone case is less than --min-cold-speedup times
+faster (default 0.8: cold pages cost about what the replaced code did, and
+timings of unique, uncached pages vary by more than 10% between runs, so a
+threshold of 1 fails on noise alone), or if a cold
+page in three zones costs more than --max-zone-cost times one in IST alone
+(zone offsets are cached per UTC hour, so extra zones should add little).
+
+    python -m bench.timefmt [--repeat N] [--min-speedup 10] [--min-cold-speedup 0.8]
+                            [--max-zone-cost 2] [--json results.json]
+"""
+import argparse
+import json
+import re
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from app import timefmt
+
+PAGE_SIZE = 100
+
+THREE_ZONES = ("Asia/Kolkata", "America/New_York", "Europe/Berlin")
+
+_LEGACY_UTC_TIMESTAMP = re.compile(r'(\d{1,2})(?:st|nd|rd|th)\s+(\w+)\s+(\d{4})\s+-\s+(\d{1,2}):(\d{2})\s+(AM|PM)\s+UTC')
+
+_LEGACY_MONTHS = {
+    "January": 1, "February": 2, "March": 3, "April": 4,
+    "May": 5, "June": 6, "July": 7, "August": 8,
+    "September": 9, "October": 10, "November": 11, "December": 12
+}
+
+
+def legacy_parse_timestamp(timestamp_str):
+    if not timestamp_str:
+        return None
+    match = _LEGACY_UTC_TIMESTAMP.search(timestamp_str)
+    if not match:
+        return None
+    day = int(match.group(1))
+    month_name = match.group(2)
+    year = int(match.group(3))
+    hour_12 = int(match.group(4))
+    minute = int(match.group(5))
+    am_pm = match.group(6)
+
+    if am_pm == "PM" and hour_12 != 12:
+        hour_24 = hour_12 + 12
+    elif am_pm == "AM" and hour_12 == 12:
+        hour_24 = 0
+    else:
+        hour_24 = hour_12
+
+    month = _LEGACY_MONTHS.get(month_name, 1)
+    try:
+        return datetime(year, month, day, hour_24, minute)
+    except ValueError:
+        return None
+
+
+def legacy_format_single_time(dt_obj):
+    day = dt_obj.day
+    if 11 <= day <= 13:
+        suffix = "th"
+    elif day % 10 == 1:
+        suffix = "st"
+    elif day % 10 == 2:
+        suffix = "nd"
+    elif day % 10 == 3:
+        suffix = "rd"
+    else:
+        suffix = "th"
+
+    month_names = ["January", "February", "March", "April", "May", "June",
+                   "July", "August", "September", "October", "November", "December"]
+
+    hour = dt_obj.hour
+    minute = dt_obj.minute
+
+    if hour == 0:
+        hour_12 = 12
+        am_pm = "AM"
+    elif hour < 12:
+        hour_12 = hour
+        am_pm = "AM"
+    elif hour == 12:
+        hour_12 = 12
+        am_pm = "PM"
+    else:
+        hour_12 = hour - 12
+        am_pm = "PM"
+
+    return f"{day}{suffix} {month_names[dt_obj.month - 1]} {dt_obj.year} - {hour_12}:{minute:02d} {am_pm}"
+
+
+def legacy_format_timestamp(dt):
+    utc_str = legacy_format_single_time(dt) + " UTC"
+    ist_dt = dt + timedelta(hours=5, minutes=30)
+    ist_str = legacy_format_single_time(ist_dt) + " IST"
+    return f"{utc_str} ({ist_str})"
+
+
+def legacy_ensure_ist_in_timestamp(timestamp_str):
+    if not timestamp_str:
+        return timestamp_str
+    if "(IST)" in timestamp_str or "IST)" in timestamp_str:
+        return timestamp_str
+    utc_dt = legacy_parse_timestamp(timestamp_str)
+    if utc_dt is None:
+        return timestamp_str
+    ist_dt = utc_dt + timedelta(hours=5, minutes=30)
+    return f"{timestamp_str} ({legacy_format_single_time(ist_dt)} IST)"
+
+
+def legacy_display_timestamp(doc):
+    received_at = doc.get("received_at")
+    if isinstance(received_at, datetime):
+        return legacy_format_timestamp(received_at)
+    return legacy_ensure_ist_in_timestamp(doc.get("timestamp") or "")
+
+
+def clear_caches():
+    timefmt._format_naive.cache_clear()
+    timefmt._format_minute.cache_clear()
+    timefmt._zone_hour.cache_clear()
+    timefmt._zone_hours.cache_clear()
+    timefmt._ensure_zones.cache_clear()
+    timefmt.parse_timestamp.cache_clear()
+
+
+def check_identical():
+    """Compare both implementations; returns the number of inputs checked or raises AssertionError."""
+    checked = 0
+    dt = datetime(2024, 1, 1)
+    while dt < datetime(2025, 1, 1, 1):
+        rendered = legacy_format_timestamp(dt)
+        utc_part = rendered.split(" (")[0]
+        doc = {"received_at": dt.replace(second=dt.minute % 60, microsecond=123000)}
+        assert timefmt.format_timestamp(dt) == rendered, dt
+        assert timefmt.ensure_ist_in_timestamp(utc_part) == legacy_ensure_ist_in_timestamp(utc_part), utc_part
+        assert timefmt.parse_timestamp(utc_part) == legacy_parse_timestamp(utc_part), utc_part
+        assert timefmt.display_timestamps([doc]) == [legacy_display_timestamp(doc)], doc
+        dt += timedelta(minutes=7)
+        checked += 1
+    odd = ["", None, "garbage", "30th February 2024 - 9:00 AM UTC", "1st Smarch 2024 - 12:30 PM UTC",
+           "5th May 2024 - 13:07 PM UTC", "5th May 2024 - 0:07 AM UTC", "already (3:00 AM IST)"]
+    for value in odd:
+        assert timefmt.ensure_ist_in_timestamp(value) == legacy_ensure_ist_in_timestamp(value), value
+        assert timefmt.parse_timestamp(value) == legacy_parse_timestamp(value), value
+        checked += 1
+    aware = datetime(2024, 3, 10, 1, 59, tzinfo=timezone.utc)
+    assert timefmt.format_timestamps([aware]) == [legacy_format_timestamp(aware)], aware
+    checked += 1
+    clear_caches()
+    return checked
+
+
+# (UTC time, zone, expected local rendering): DST transitions, half- and
+# quarter-hour offsets, date and year rollovers, a zone without DST
+TIMEZONE_CASES = [
+    # US spring forward: 2:00 AM EST becomes 3:00 AM EDT
+    (datetime(2024, 3, 10, 6, 59), "America/New_York", "10th March 2024 - 1:59 AM EST"),
+    (datetime(2024, 3, 10, 7, 0), "America/New_York", "10th March 2024 - 3:00 AM EDT"),
+    # US fall back: 1:30 AM happens twice
+    (datetime(2024, 11, 3, 5, 30), "America/New_York", "3rd November 2024 - 1:30 AM EDT"),
+    (datetime(2024, 11, 3, 6, 30), "America/New_York", "3rd November 2024 - 1:30 AM EST"),
+    # EU transitions happen at 01:00 UTC in every EU zone
+    (datetime(2024, 3, 31, 0, 59), "Europe/London", "31st March 2024 - 12:59 AM GMT"),
+    (datetime(2024, 3, 31, 1, 0), "Europe/London", "31st March 2024 - 2:00 AM BST"),
+    (datetime(2024, 10, 27, 0, 30), "Europe/Berlin", "27th October 2024 - 2:30 AM CEST"),
+    (datetime(2024, 10, 27, 1, 30), "Europe/Berlin", "27th October 2024 - 2:30 AM CET"),
+    # Southern hemisphere: DST ends in April
+    (datetime(2024, 4, 6, 15, 59), "Australia/Sydney", "7th April 2024 - 2:59 AM AEDT"),
+    (datetime(2024, 4, 6, 16, 0), "Australia/Sydney", "7th April 2024 - 2:00 AM AEST"),
+    # Half-hour offset with DST
+    (datetime(2024, 3, 10, 5, 29), "America/St_Johns", "10th March 2024 - 1:59 AM NST"),
+    (datetime(2024, 3, 10, 5, 30), "America/St_Johns", "10th March 2024 - 3:00 AM NDT"),
+    # Quarter-hour offsets, no abbreviation in the tz database
+    (datetime(2024, 6, 30, 23, 59), "Pacific/Chatham", "1st July 2024 - 12:44 PM +1245"),
+    (datetime(2024, 5, 1, 0, 0), "Asia/Kathmandu", "1st May 2024 - 5:45 AM +0545"),
+    # IST: no DST, rolls over to the next day and year
+    (datetime(2024, 12, 31, 18, 29), "Asia/Kolkata", "31st December 2024 - 11:59 PM IST"),
+    (datetime(2024, 12, 31, 18, 30), "Asia/Kolkata", "1st January 2025 - 12:00 AM IST"),
+    # Leap day, and a date line crossing backwards
+    (datetime(2024, 2, 29, 23, 0), "Asia/Tokyo", "1st March 2024 - 8:00 AM JST"),
+    (datetime(2024, 3, 1, 5, 0), "Pacific/Honolulu", "29th February 2024 - 7:00 PM HST"),
+    # A transition off the UTC hour, to a half-hour DST shift
+    (datetime(2024, 10, 5, 15, 29), "Australia/Lord_Howe", "6th October 2024 - 1:59 AM +1030"),
+    (datetime(2024, 10, 5, 15, 30), "Australia/Lord_Howe", "6th October 2024 - 2:30 AM +11"),
+    # Brazil abolished DST in 2019
+    (datetime(2024, 1, 15, 12, 0), "America/Sao_Paulo", "15th January 2024 - 9:00 AM -03"),
+]
+
+
+def check_timezones():
+    """Check TIMEZONE_CASES (single zones, then all zones at once); returns the number checked."""
+    for utc, zone, expected in TIMEZONE_CASES:
+        utc_part = legacy_format_single_time(utc) + " UTC"
+        want = f"{utc_part} ({expected})"
+        assert timefmt.format_timestamp(utc, (zone,)) == want, (zone, timefmt.format_timestamp(utc, (zone,)))
+        # The same instant given as an aware datetime, and as a legacy string
+        aware = utc.replace(tzinfo=timezone.utc).astimezone(timezone(timedelta(hours=-7)))
+        assert timefmt.format_timestamp(aware, (zone,)) == want, (zone, aware)
+        assert timefmt.ensure_zones_in_timestamp(utc_part, (zone,)) == want, (zone, utc_part)
+    zones = tuple(zone for _, zone, _ in TIMEZONE_CASES)
+    zones = tuple(dict.fromkeys(zones))
+    for utc, zone, expected in TIMEZONE_CASES:
+        assert expected in timefmt.format_timestamp(utc, zones), (zone, utc)
+    clear_caches()
+    return len(TIMEZONE_CASES)
+
+
+def make_page(start, legacy_share=0.0):
+    """PAGE_SIZE event documents a few minutes apart; every n-th one has only a legacy string."""
+    every = int(1 / legacy_share) if legacy_share else 0
+    docs = []
+    for i in range(PAGE_SIZE):
+        when = start - timedelta(minutes=3 * i, seconds=i)
+        if every and i % every == 0:
+            docs.append({"timestamp": legacy_format_single_time(when) + " UTC"})
+        else:
+            docs.append({"received_at": when})
+    return docs
+
+
+def _best(funcs, pages, repeat, cold):
+    """Best microseconds per page of each function, timed in turn so machine noise hits all alike."""
+    best = [float("inf")] * len(funcs)
+    for _ in range(repeat):
+        for i, func in enumerate(funcs):
+            total = 0.0
+            for page in pages:
+                if cold:
+                    clear_caches()
+                start = time.perf_counter()
+                func(page)
+                total += time.perf_counter() - start
+            best[i] = min(best[i], total / len(pages))
+    return [us * 1e6 for us in best]
+
+
+def run(repeat=5, pages=50):
+    start = datetime(2024, 5, 1, 12, 0)
+    dated = [make_page(start - timedelta(days=i)) for i in range(pages)]
+    strings = [[legacy_format_single_time(d["received_at"]) + " UTC" for d in page] for page in dated]
+    mixed = [make_page(start - timedelta(days=i), legacy_share=0.5) for i in range(pages)]
+    times = [[d["received_at"] for d in page] for page in dated]
+    cases = [
+        ("format_timestamp", times,
+         lambda page: [legacy_format_timestamp(dt) for dt in page],
+         lambda page: [timefmt.format_timestamp(dt) for dt in page]),
+        ("format_timestamps (batch)", times,
+         lambda page: [legacy_format_timestamp(dt) for dt in page],
+         timefmt.format_timestamps),
+        ("ensure_ist_in_timestamp", strings,
+         lambda page: [legacy_ensure_ist_in_timestamp(s) for s in page],
+         lambda page: [timefmt.ensure_ist_in_timestamp(s) for s in page]),
+        ("display_timestamps (mixed)", mixed,
+         lambda page: [legacy_display_timestamp(d) for d in page],
+         timefmt.display_timestamps),
+        # Three zones instead of IST alone: warm pages should cost about the same
+        ("display_timestamps (3 zones)", mixed,
+         lambda page: [legacy_display_timestamp(d) for d in page],
+         lambda page: timefmt.display_timestamps(page, THREE_ZONES)),
+    ]
+    rows = []
+    for name, inputs, legacy, current in cases:
+        for cache in ("warm", "cold"):
+            # Warm: the same page over and over, as successive polls render it.
+            # Cold: every page has timestamps no other page has, rendered with empty caches
+            warm_inputs = inputs[:1] * len(inputs) if cache == "warm" else inputs
+            clear_caches()
+            current(warm_inputs[0])
+            legacy_us, current_us = _best([legacy, current], warm_inputs, repeat, cold=cache == "cold")
+            rows.append({
+                "case": name,
+                "cache": cache,
+                "legacy_us_per_page": round(legacy_us, 2),
+                "current_us_per_page": round(current_us, 2),
+                "speedup": round(legacy_us / current_us, 1),
+            })
+    clear_caches()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="timing runs per case (best is kept)")
+    parser.add_argument("--pages", type=int, default=50, help="pages rendered per timing run")
+    parser.add_argument("--min-speedup", type=float, default=10.0, help="required speedup of the warm cases")
+    parser.add_argument("--min-cold-speedup", type=float, default=0.8,
+                        help="required speedup of the cold single-zone cases (unique timestamps, empty caches; "
+                             "below 1 to allow for timing noise)")
+    parser.add_argument("--max-zone-cost", type=float, default=2.0,
+                        help="allowed cost of a cold page in three zones relative to IST alone")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    try:
+        checked = check_identical()
+    except AssertionError as e:
+        print(f"Output differs from the legacy implementation for {e}")
+        sys.exit(1)
+    print(f"Identical output for {checked} inputs.")
+    try:
+        zones_checked = check_timezones()
+    except AssertionError as e:
+        print(f"Time zone edge case failed: {e}")
+        sys.exit(1)
+    print(f"{zones_checked} time zone edge cases (DST, offsets, rollovers) render as expected.\n")
+
+    rows = run(args.repeat, args.pages)
+    print("%-28s %-5s %16s %16s %9s" % ("case", "cache", "legacy us/page", "current us/page", "speedup"))
+    for r in rows:
+        print("%-28s %-5s %16.2f %16.2f %8.1fx" % (
+            r["case"], r["cache"], r["legacy_us_per_page"], r["current_us_per_page"], r["speedup"]))
+    # Each relative to the legacy code timed alongside it on the same pages, which cancels machine noise
+    cold = {r["case"]: r["current_us_per_page"] / r["legacy_us_per_page"] for r in rows if r["cache"] == "cold"}
+    zone_cost = round(cold["display_timestamps (3 zones)"] / cold["display_timestamps (mixed)"], 2)
+    print(f"\nA cold page in three zones costs {zone_cost:g}x one in IST alone.")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "timefmt", "identical_inputs": checked, "timezone_cases": zones_checked,
+                       "zone_cost": zone_cost, "results": rows}, f, indent=2)
+
+    failed = False
+    slow = [r for r in rows if r["cache"] == "warm" and r["speedup"] < args.min_speedup]
+    if slow:
+        print(f"Below the required {args.min_speedup:g}x: {', '.join(r['case'] for r in slow)}")
+        failed = True
+    # The three-zone page is held to --max-zone-cost instead: the legacy code rendered IST only
+    slow = [r for r in rows if r["cache"] == "cold" and r["case"] != "display_timestamps (3 zones)"
+            and r["speedup"] < args.min_cold_speedup]
+    if slow:
+        print(f"Cold below the required {args.min_cold_speedup:g}x: {', '.join(r['case'] for r in slow)}")
+        failed = True
+    if zone_cost > args.max_zone_cost:
+        print(f"Extra display zones cost more than the allowed {args.max_zone_cost:g}x")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,7 @@ Diagnostic script to check what's actually stored in MongoDB.
 Run this to see what action values your events have.
 """
 from app import create_app
-from app.extensions import mongo
+from app.extensions import store
 
 def check_events():
     """Check all events in MongoDB and show their action values."""
@@ -11,7 +11,7 @@ def check_events():
     
     with app.app_context():
         try:
-            events = list(mongo.db.events.find().sort('_id', -1).limit(10))
+            events = store.events.find(limit=10)
             
             print(f"\nFound {len(events)} recent events:\n")
             print("-" * 80)
@@ -0,0 +1,139 @@
+"""
+Verify how every /api/events filter combination is served.
+
+Runs explain() on the query GET /api/events would issue for each combination
+of filters (with and without a time window, pagination cursor and `since`) and
+reports the winning plan with the documents it examined per document
+returned. Each filter has its own `{field: 1, _id: -1}` index, so a combined
+filter scans one of them and checks the other fields on the fetched
+documents; on real data that can read far more documents than it returns.
+
+Exits non-zero if any plan uses a collection scan, or if a combined filter
+examines more than --max-examined-ratio documents per document returned
+(add a compound index for that combination if it matters).
+
+    python check_indexes.py [--max-examined-ratio 10]
+"""
+import argparse
+import itertools
+import sys
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+
+from app import create_app
+from app.api.filters import FILTER_FIELDS, build_query
+from app.extensions import mongo, partitions, store
+from app.indexes import ensure_indexes
+
+SAMPLE_VALUES = {
+    "action": "PUSH",
+    "to_branch": "main",
+    "from_branch": "feature",
+    "author": "octocat",
+    "repository": "octo/repo",
+}
+
+
+def _stages(plan):
+    """All stage names in a (possibly nested) query plan."""
+    stages = [plan.get("stage", "")]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages += _stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += _stages(child)
+    return stages
+
+
+def _index_names(plan):
+    names = [plan["indexName"]] if "indexName" in plan else []
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            names += _index_names(plan[key])
+    for child in plan.get("inputStages", []):
+        names += _index_names(child)
+    return names
+
+
+def _execution_counts(explain):
+    """(totalDocsExamined, nReturned) of an explain() result with execution stats."""
+    stats = explain.get("executionStats") or {}
+    return stats.get("totalDocsExamined", 0), stats.get("nReturned", 0)
+
+
+def check_indexes(max_examined_ratio=10.0):
+    """Explain every combination; returns the combinations that scan the collection or examine too much."""
+    # `events`, or this month's partition with EVENT_PARTITIONS=monthly
+    current = partitions.current()
+    now = datetime.now(timezone.utc)
+    windows = [
+        {},
+        {"start": (now - timedelta(days=7)).isoformat()},
+        {"start": (now - timedelta(days=30)).isoformat(), "end": now.isoformat()},
+    ]
+    cursor = ObjectId.from_datetime(now - timedelta(days=1))
+    # (before, since) pairs: first page, older page, delta since a known id
+    cursors = [(None, None), (cursor, None), (None, cursor)]
+
+    failures = []
+    params = list(FILTER_FIELDS)
+    for r in range(len(params) + 1):
+        for combo in itertools.combinations(params, r):
+            for window in windows:
+                for before, since in cursors:
+                    args = {p: SAMPLE_VALUES[p] for p in combo}
+                    args.update(window)
+                    query = build_query(args, before, since)
+                    explain = current.database.command(
+                        "explain",
+                        {"find": current.name, "filter": query, "sort": {"_id": -1}, "limit": 100},
+                        verbosity="executionStats",
+                    )
+                    plan = explain["queryPlanner"]["winningPlan"]
+                    examined, returned = _execution_counts(explain)
+                    label = ",".join(combo) or "(none)"
+                    if window:
+                        label += " +window"
+                    if before is not None:
+                        label += " +before"
+                    if since is not None:
+                        label += " +since"
+                    status = "ok  "
+                    if "COLLSCAN" in _stages(plan):
+                        status = "SCAN"
+                    elif len(combo) > 1 and examined > max_examined_ratio * max(returned, 1):
+                        status = "WIDE"
+                    print(f"  {status} {label:<60} {','.join(_index_names(plan)):<16} "
+                          f"examined {examined} for {returned}")
+                    if status != "ok  ":
+                        failures.append((status.strip(), label))
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="explain() every /api/events filter combination.")
+    parser.add_argument("--max-examined-ratio", type=float, default=10.0,
+                        help="documents a combined filter may examine per document returned")
+    args = parser.parse_args()
+    app = create_app()
+    if store.db is None:
+        sys.exit("check_indexes.py needs a MongoDB event store (EVENT_STORE_URI=mongodb://...)")
+    with app.app_context():
+        ensure_indexes(mongo.db)
+        try:
+            failures = check_indexes(args.max_examined_ratio)
+        except Exception as e:
+            print(f"Error: {e}")
+            sys.exit(2)
+    scans = [label for status, label in failures if status == "SCAN"]
+    wide = [label for status, label in failures if status == "WIDE"]
+    if scans:
+        print(f"\n{len(scans)} filter combination(s) fall back to a collection scan.")
+    if wide:
+        print(f"\n{len(wide)} combined filter(s) examine more than {args.max_examined_ratio:g} documents "
+              f"per document returned; add a compound index if they are used.")
+    if failures:
+        sys.exit(1)
+    print("\nAll filter combinations use an index and examine at most "
+          f"{args.max_examined_ratio:g} documents per document returned.")
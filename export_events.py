@@ -0,0 +1,105 @@
+"""
+Export the full event history to an NDJSON or CSV file.
+
+Streams archived and then current events in `_id` order, one batch at a
+time, so memory stays flat however large the history is. After every
+batch the last exported `_id` and the file size are saved in
+`<output>.checkpoint`; running the same command again resumes from there
+(a partly written batch is cut off first).
+The checkpoint is removed when the export completes.
+
+    python export_events.py events.ndjson
+    python export_events.py events.csv --format csv [--batch-size 5000] [--restart] [--no-archive]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from bson import ObjectId
+
+from app import create_app
+from app.export import FORMATS, export_chunks
+from app.extensions import store
+
+
+def _load_checkpoint(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_checkpoint(path, state):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def export(output, fmt, batch_size=1000, restart=False, archive=True):
+    """Write (or resume writing) the export; returns the number of rows written in this run."""
+    checkpoint_path = output + ".checkpoint"
+    state = None if restart else _load_checkpoint(checkpoint_path)
+    if state is not None and state.get("format") != fmt:
+        raise ValueError(f"{checkpoint_path} belongs to a {state.get('format')} export; use --restart")
+
+    after = ObjectId(state["last_id"]) if state else None
+    mode = "r+b" if state else "wb"
+    if state:
+        print(f"Resuming after {state['last_id']} ({state['rows']} rows already exported)", file=sys.stderr)
+
+    rows = 0
+    started = time.perf_counter()
+    with open(output, mode) as f:
+        if state:
+            # Drop anything written after the last checkpoint
+            f.truncate(state["offset"])
+            f.seek(state["offset"])
+        previous = state["rows"] if state else 0
+        batches = store.events.history(after=after, batch_size=batch_size, archive=archive)
+        for chunk, last_id, count in export_chunks(batches, fmt, header=state is None):
+            f.write(chunk)
+            if last_id is None:
+                continue
+            f.flush()
+            rows += count
+            done = previous + rows
+            _save_checkpoint(checkpoint_path, {
+                "format": fmt, "last_id": str(last_id), "offset": f.tell(), "rows": done,
+            })
+            elapsed = time.perf_counter() - started
+            print(f"  {done} rows ({rows / elapsed:,.0f} rows/s)", file=sys.stderr)
+
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export all webhook events as NDJSON or CSV.")
+    parser.add_argument("output", help="file to write")
+    parser.add_argument("--format", choices=sorted(FORMATS), default=None,
+                        help="default: from the file extension, else ndjson")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start over")
+    parser.add_argument("--no-archive", action="store_true", help="skip archived events (events_archive)")
+    args = parser.parse_args()
+    fmt = args.format or ("csv" if args.output.endswith(".csv") else "ndjson")
+
+    app = create_app()
+    with app.app_context():
+        try:
+            started = time.perf_counter()
+            rows = export(args.output, fmt, args.batch_size, args.restart, not args.no_archive)
+            print(f"\nDone: {rows} rows written to {args.output} in {time.perf_counter() - started:.1f}s.",
+                  file=sys.stderr)
+        except Exception as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
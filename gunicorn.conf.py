@@ -0,0 +1,23 @@
+"""
+Gunicorn settings, picked up automatically by `gunicorn run:app`.
+"""
+import os
+
+# Threaded workers: each /api/events/stream client holds a thread for up to
+# STREAM_MAX_S, which would starve sync workers after a few dashboards.
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 32))
+
+
+def post_worker_init(worker):
+    """Load the newest events into this worker's buffer before it takes requests."""
+    from app.extensions import recent_events
+
+    recent_events.warm()
+
+
+def worker_exit(server, worker):
+    """Flush buffered webhook events before the worker process goes away."""
+    from app.extensions import write_buffer
+
+    write_buffer.close()
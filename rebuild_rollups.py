@@ -0,0 +1,139 @@
+"""
+Recompute the rollups collection from the raw events (archived ones included).
+
+The events are split into `_id` (i.e. receipt time) ranges that are counted
+in parallel by a pool of processes, each with its own MongoDB connection.
+The merged counts are written to `rollups_rebuild`, events stored while the
+rebuild ran are added, and the result replaces `rollups` with an atomic
+rename. Events stored in the moment between that last catch-up and the
+rename are not counted; run it when webhooks are quiet, or run it again.
+
+    python rebuild_rollups.py [--workers 4] [--ranges 16] [--batch-size 1000]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+from bson import ObjectId
+
+from app import create_app
+from app.archive import ARCHIVE_COLLECTION
+from app.extensions import mongo, partitions, store
+from app.indexes import ROLLUP_INDEXES
+from app.rollups import accumulate, merge, write_buckets
+
+# Fields accumulate() reads
+SOURCE_FIELDS = {
+    "occurred_at": 1, "timestamp": 1, "action": 1, "from_branch": 1,
+    "to_branch": 1, "author": 1, "repository": 1,
+}
+
+REBUILD_COLLECTION = "rollups_rebuild"
+
+_app = None
+
+
+def _init_worker():
+    global _app
+    _app = create_app()
+
+
+def _count_range(bounds):
+    """
+    Count the events in one [lo, hi) _id range of the archive, or of the hot
+    events (every partition it overlaps) when `name` is None; returns (buckets, events).
+    """
+    name, lo, hi, batch_size = bounds
+    buckets = {}
+    count = 0
+    query = {"_id": {"$gte": lo, "$lt": hi}}
+    with _app.app_context():
+        collections = [mongo.db[name]] if name else partitions.route(query, ascending=True)
+        for collection in collections:
+            for doc in collection.find(query, SOURCE_FIELDS).batch_size(batch_size):
+                accumulate(buckets, doc)
+                count += 1
+    return buckets, count
+
+
+def id_ranges(first_id, upper, parts):
+    """Split [first_id, upper) into `parts` ranges of equal receipt time."""
+    t0 = first_id.generation_time.timestamp()
+    t1 = upper.generation_time.timestamp()
+    step = max(1, int((t1 - t0) // parts) + 1)
+    bounds = [ObjectId.from_datetime(first_id.generation_time)]
+    t = t0 + step
+    while t < t1:
+        bounds.append(ObjectId(f"{int(t):08x}" + "0" * 16))
+        t += step
+    bounds.append(upper)
+    return list(zip(bounds, bounds[1:]))
+
+
+def rebuild(workers, parts, batch_size):
+    db = mongo.db
+    # Everything before this point is counted in parallel; later events in the catch-up
+    upper = ObjectId()
+    buckets = {}
+    total = 0
+    started = time.perf_counter()
+
+    hot = partitions.find({"_id": {"$lt": upper}}, {"_id": 1}, limit=1, ascending=True)
+    # Archived events end where the hot ones begin (a document left in both
+    # by an interrupted archiver is counted once)
+    archive_end = hot[0]["_id"] if hot else upper
+    archived = db[ARCHIVE_COLLECTION].find_one({"_id": {"$lt": archive_end}}, {"_id": 1}, sort=[("_id", 1)])
+    ranges = []
+    for name, first, end in ((ARCHIVE_COLLECTION, archived, archive_end), (None, hot[0] if hot else None, upper)):
+        if first is not None:
+            ranges += [(name, lo, hi, batch_size) for lo, hi in id_ranges(first["_id"], end, parts)]
+    if ranges:
+        print(f"Counting events in {len(ranges)} _id ranges with {workers} process(es)...")
+        ctx = multiprocessing.get_context("spawn")
+        with ctx.Pool(workers, initializer=_init_worker) as pool:
+            for done, (part, count) in enumerate(pool.imap_unordered(_count_range, ranges), 1):
+                merge(buckets, part)
+                total += count
+                print(f"  {done}/{len(ranges)} ranges, {total} events")
+
+    target = db[REBUILD_COLLECTION]
+    target.drop()
+    for keys, options in ROLLUP_INDEXES:
+        target.create_index(keys, **options)
+    write_buckets(target, buckets)
+
+    # Events stored while the ranges were counted
+    late = {}
+    late_count = 0
+    for doc in partitions.find({"_id": {"$gte": upper}}, SOURCE_FIELDS, ascending=True):
+        accumulate(late, doc)
+        late_count += 1
+    write_buckets(target, late)
+
+    target.rename("rollups", dropTarget=True)
+    elapsed = time.perf_counter() - started
+    print(f"\nDone: {total + late_count} events -> {len(buckets)} buckets in {elapsed:.1f}s.")
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Recompute activity rollups from the events collection.")
+    parser.add_argument("--workers", type=int, default=cpus, help="processes counting ranges in parallel")
+    parser.add_argument("--ranges", type=int, default=None, help="number of _id ranges (default 4 per worker)")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    app = create_app()
+    if store.db is None:
+        sys.exit("rebuild_rollups.py needs a MongoDB event store (EVENT_STORE_URI=mongodb://...)")
+    with app.app_context():
+        try:
+            rebuild(max(1, args.workers), max(1, args.ranges or args.workers * 4), args.batch_size)
+        except Exception as e:
+            print(f"Error: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Replay recorded GitHub deliveries into the events collection.
+
+Input is NDJSON (plain or .gz; `-` reads stdin), one delivery per line:
+
+    {"event": "push", "delivery_id": "72d3162e-...", "payload": {...}}
+
+`headers` with X-GitHub-Event / X-GitHub-Delivery may be used instead of
+`event` / `delivery_id`, `payload` may also be the raw JSON body as a string,
+and an optional `received_at` (ISO 8601) keeps the original receipt time.
+
+Lines are read as a stream and normalized in a pool of processes with the
+same code as the webhook receiver (app/webhook/normalize.py). The documents
+are written in unordered bulk writes (app/webhook/store.py), so deliveries
+already stored are skipped and replaying a file twice adds nothing.
+
+    python replay_events.py deliveries.ndjson [more.ndjson.gz ...]
+        [--workers 4] [--batch-size 1000] [--rate 500] [--dry-run]
+"""
+import argparse
+import gzip
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+
+from app import jsoncodec
+from app.timefmt import display_timezones, parse_github_time, set_display_timezones
+from app.webhook.normalize import normalize_event, normalize_event_type
+from app.webhook.payload import EVENT_FIELDS
+
+
+def _header(headers, name):
+    for key, value in (headers or {}).items():
+        if key.lower() == name.lower():
+            return value
+    return None
+
+
+def parse_line(line):
+    """(github_event, delivery_id, payload, received_at) for one recorded delivery."""
+    record = jsoncodec.loads(line)
+    headers = record.get("headers")
+    event_type = record.get("event") or _header(headers, "X-GitHub-Event") or ""
+    delivery_id = record.get("delivery_id") or _header(headers, "X-GitHub-Delivery") or ""
+    payload = record.get("payload")
+    if isinstance(payload, (str, bytes)):
+        payload = jsoncodec.loads(payload) if payload.strip() else {}
+    if not isinstance(payload, dict):
+        payload = {}
+    received_at = parse_github_time(record.get("received_at"))
+    return normalize_event_type(event_type), str(delivery_id).strip(), payload, received_at
+
+
+def normalize_chunk(lines):
+    """Normalize a list of NDJSON lines; returns (docs, skipped, invalid)."""
+    docs = []
+    skipped = invalid = 0
+    for line in lines:
+        try:
+            github_event, delivery_id, payload, received_at = parse_line(line)
+        except Exception:
+            invalid += 1
+            continue
+        event = None
+        if github_event in EVENT_FIELDS:
+            event = normalize_event(github_event, payload, delivery_id, received_at)
+        if event is None:
+            skipped += 1
+        else:
+            docs.append(event)
+    return docs, skipped, invalid
+
+
+def read_chunks(paths, chunk_size):
+    """Yield lists of up to `chunk_size` non-blank lines from the input files, in order."""
+    chunk = []
+    for path in paths:
+        if path == "-":
+            f = sys.stdin.buffer
+        elif path.endswith(".gz"):
+            f = gzip.open(path, "rb")
+        else:
+            f = open(path, "rb")
+        try:
+            for line in f:
+                if not line.strip():
+                    continue
+                chunk.append(line)
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+        finally:
+            if f is not sys.stdin.buffer:
+                f.close()
+    if chunk:
+        yield chunk
+
+
+def normalized(pool, chunks, workers):
+    """Results of normalize_chunk in input order, with a bounded number of chunks in flight."""
+    pending = deque()
+    for chunk in chunks:
+        pending.append(pool.apply_async(normalize_chunk, (chunk,)))
+        if len(pending) >= workers * 2:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+class RateLimit:
+    """Paces writes to at most `rate` events per second (0: unlimited)."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.started = time.monotonic()
+        self.sent = 0
+
+    def wait(self, n):
+        if self.rate > 0:
+            delay = self.started + self.sent / self.rate - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        self.sent += n
+
+
+def replay(paths, workers, batch_size, rate=0, dry_run=False, write=None, zones=None):
+    """
+    Normalize and store every delivery in `paths`; returns a stats dict.
+
+    `write(docs)` stores one batch and returns an InsertResult; it is not
+    called in a dry run. Events are rendered for `zones` (default: this
+    process's display zones), which the worker processes do not inherit.
+    """
+    if zones is None:
+        zones = display_timezones()
+    stats = {"read": 0, "normalized": 0, "skipped": 0, "invalid": 0, "inserted": 0, "duplicates": 0}
+    limit = RateLimit(rate)
+    started = time.perf_counter()
+    last_report = started
+
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(workers, initializer=set_display_timezones, initargs=(zones,)) as pool:
+        for docs, skipped, invalid in normalized(pool, read_chunks(paths, batch_size), workers):
+            stats["read"] += len(docs) + skipped + invalid
+            stats["normalized"] += len(docs)
+            stats["skipped"] += skipped
+            stats["invalid"] += invalid
+            if docs:
+                limit.wait(len(docs))
+                if not dry_run:
+                    result = write(docs)
+                    stats["inserted"] += result.inserted
+                    stats["duplicates"] += result.duplicates
+
+            now = time.perf_counter()
+            if now - last_report >= 1:
+                last_report = now
+                print(f"  {stats['read']} read, {stats['inserted']} inserted, {stats['duplicates']} duplicates "
+                      f"({stats['read'] / (now - started):,.0f} lines/s)", file=sys.stderr)
+    stats["seconds"] = time.perf_counter() - started
+    return stats
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Replay recorded GitHub deliveries into MongoDB.")
+    parser.add_argument("paths", nargs="+", help="NDJSON files (.gz allowed, - for stdin)")
+    parser.add_argument("--workers", type=int, default=cpus, help="processes normalizing payloads")
+    parser.add_argument("--batch-size", type=int, default=1000, help="deliveries per chunk and bulk write")
+    parser.add_argument("--rate", type=float, default=0, help="max events written per second (default: no limit)")
+    parser.add_argument("--dry-run", action="store_true", help="normalize and count only; write nothing")
+    args = parser.parse_args()
+    workers = max(1, args.workers)
+    batch_size = max(1, args.batch_size)
+
+    try:
+        if args.dry_run:
+            stats = replay(args.paths, workers, batch_size, args.rate, dry_run=True)
+        else:
+            from app import create_app
+            from app.extensions import generation, store
+
+            app = create_app()
+            with app.app_context():
+                def write(docs):
+                    result = store.events.insert_many(docs)
+                    if result.inserted:
+                        generation.bump()
+                    return result
+
+                stats = replay(args.paths, workers, batch_size, args.rate, write=write,
+                               zones=app.config["DISPLAY_TIMEZONES"])
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    mode = " (dry run, nothing written)" if args.dry_run else ""
+    print(f"\nDone{mode}: {stats['read']} deliveries read in {stats['seconds']:.1f}s; "
+          f"{stats['normalized']} events, {stats['skipped']} skipped, {stats['invalid']} invalid, "
+          f"{stats['inserted']} inserted, {stats['duplicates']} already stored.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
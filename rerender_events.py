@@ -0,0 +1,101 @@
+"""
+Re-render stored display fields (message, action, timestamp) in place.
+
+Run after bumping RENDER_VERSION in app/render.py, or after changing
+DISPLAY_TIMEZONES. Documents rendered with an older version or for other
+zones (or never rendered) are updated in `_id` order in batches.
+Progress is checkpointed in the `migrations` collection, so an interrupted
+run resumes where it stopped.
+
+    python rerender_events.py [--batch-size 1000] [--restart]
+"""
+import argparse
+import sys
+
+from pymongo import UpdateOne
+
+from app import create_app
+from app.extensions import generation, mongo, partitions, store
+from app.render import RENDER_VERSION, render_fields
+from app.timefmt import LEGACY_TIMEZONES, display_timezones
+
+CHECKPOINT_ID = "rerender_events"
+
+# Fields render_fields() reads
+SOURCE_FIELDS = {"action": 1, "from_branch": 1, "to_branch": 1, "timestamp": 1, "received_at": 1}
+
+
+def rerender(batch_size=1000, restart=False):
+    """Run the migration; returns the number of documents re-rendered."""
+    migrations = mongo.db.migrations
+    checkpoint = migrations.find_one({"_id": CHECKPOINT_ID}) or {}
+    # A checkpoint from an earlier version's (or other zones') run does not apply to this one
+    zones = list(display_timezones())
+    if restart or checkpoint.get("render_version") != RENDER_VERSION or checkpoint.get("timezones", []) != zones:
+        checkpoint = {}
+    last_id = checkpoint.get("last_id")
+
+    updated = 0
+    # Every hot collection (one, or each monthly partition), oldest first
+    for collection in partitions.route({"_id": {"$gt": last_id}} if last_id else {}, ascending=True):
+        last_id, count = _rerender_collection(collection, migrations, last_id, batch_size)
+        updated += count
+    return updated
+
+
+def _stale_query():
+    zones = {"$ne": list(display_timezones())}
+    if display_timezones() == LEGACY_TIMEZONES:
+        # Documents without render_timezones were rendered for IST
+        zones["$exists"] = True
+    return {"$or": [{"render_version": {"$ne": RENDER_VERSION}}, {"render_timezones": zones}]}
+
+
+def _rerender_collection(collection, migrations, last_id, batch_size):
+    updated = 0
+    while True:
+        query = _stale_query()
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = list(collection.find(query, SOURCE_FIELDS).sort("_id", 1).limit(batch_size))
+        if not batch:
+            break
+
+        collection.bulk_write(
+            [UpdateOne({"_id": doc["_id"]}, {"$set": render_fields(doc)}) for doc in batch],
+            ordered=False,
+        )
+
+        updated += len(batch)
+        last_id = batch[-1]["_id"]
+        migrations.update_one(
+            {"_id": CHECKPOINT_ID},
+            {"$set": {"last_id": last_id, "render_version": RENDER_VERSION, "timezones": list(display_timezones())}},
+            upsert=True,
+        )
+        print(f"  re-rendered {updated} events in {collection.name} (up to _id {last_id})")
+    return last_id, updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-render stored event display fields.")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--restart", action="store_true", help="ignore the saved checkpoint")
+    args = parser.parse_args()
+
+    app = create_app()
+    if store.db is None:
+        sys.exit("rerender_events.py needs a MongoDB event store (EVENT_STORE_URI=mongodb://...)")
+    with app.app_context():
+        try:
+            total = rerender(args.batch_size, args.restart)
+            if total:
+                # Drop cached /api/events responses in running workers
+                generation.bump()
+            print(f"\nDone: {total} events re-rendered to version {RENDER_VERSION}.")
+        except Exception as e:
+            print(f"Error: {e}")
+
+
+if __name__ == "__main__":
+    main()